@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+import cryptography
+import crypto_utils
+import hash_utils
+from utils import get_data_dir
+
+BENCHMARK_VERSION = 1
+BENCHMARK_DIR_NAME = "benchmarks"
+MB = 1024 * 1024
+
+# 默认参数之外再测一组较轻的参数，便于对比
+KDF_PARAM_SETS = {
+    'pbkdf2': [{'iterations': crypto_utils.PBKDF2_ITERATIONS}, crypto_utils.DEFAULT_KDF_PARAMS['pbkdf2']],
+    'scrypt': [{'log_n': 14, 'r': 8, 'p': 1}, crypto_utils.DEFAULT_KDF_PARAMS['scrypt']],
+    'argon2id': [{'iterations': 2, 'memory_kib': 19456, 'lanes': 1}, crypto_utils.DEFAULT_KDF_PARAMS['argon2id']]
+}
+HASH_BUFFER_SIZES = (hash_utils.MIN_BUFFER_SIZE, hash_utils.DEFAULT_BUFFER_SIZE, hash_utils.MAX_BUFFER_SIZE)
+CIPHER_CHUNK_SIZES = (64 * 1024, crypto_utils.DEFAULT_CHUNK_SIZE, 4 * MB)
+
+class BenchmarkCancelled(Exception):
+    pass
+
+class _Progress:
+    """按测试项计数的进度，progress_callback 接收 {'done', 'total', 'case'}"""
+    def __init__(self, callback, total, cancel_event):
+        self.callback = callback
+        self.total = total
+        self.done = 0
+        self.cancel_event = cancel_event
+
+    def start(self, case):
+        if self.cancel_event and self.cancel_event.is_set():
+            raise BenchmarkCancelled()
+        if self.callback:
+            self.callback({'done': self.done, 'total': self.total, 'case': case})
+
+    def finish(self):
+        self.done += 1
+        if self.callback:
+            self.callback({'done': self.done, 'total': self.total, 'case': None})
+
+def _time_runs(func, warmup, repeat):
+    """预热 warmup 次后计时 repeat 次，返回每次耗时（秒）"""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def get_system_info():
+    """记录结果时附带的环境信息，用于跨版本、跨机器对比"""
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'cryptography': cryptography.__version__,
+        'available_kdfs': crypto_utils.get_available_kdfs()
+    }
+
+def _kdf_cases(kdfs):
+    available = crypto_utils.get_available_kdfs()
+    return [(kdf, params) for kdf in kdfs if kdf in available for params in KDF_PARAM_SETS[kdf]]
+
+def _hash_cases(algorithms, buffer_sizes):
+    cases = [(algorithm, buffer_size) for algorithm in algorithms for buffer_size in buffer_sizes]
+    if len(algorithms) > 1:
+        # 一次读取同时计算全部算法（hash_file_multi）
+        cases.append((tuple(algorithms), hash_utils.DEFAULT_BUFFER_SIZE))
+    return cases
+
+def _cipher_cases(ciphers, chunk_sizes):
+    return [(cipher, chunk_size) for cipher in ciphers for chunk_size in chunk_sizes]
+
+def benchmark_kdfs(cases, warmup, repeat, progress):
+    """每组KDF参数派生一次密钥的耗时（毫秒），不使用派生密钥缓存"""
+    results = []
+    salt = os.urandom(16)
+    for kdf, params in cases:
+        progress.start(f"{kdf} {params}")
+        kdf_id, params = crypto_utils.resolve_kdf(kdf, params)
+        times = _time_runs(lambda: crypto_utils.derive_key_bytes("benchmark", salt, kdf_id, params,
+                                                                  use_cache=False), warmup, repeat)
+        results.append({
+            'kdf': kdf,
+            'params': params,
+            'ms_min': round(min(times) * 1000, 2),
+            'ms_median': round(statistics.median(times) * 1000, 2),
+            'ms_max': round(max(times) * 1000, 2)
+        })
+        progress.finish()
+    return results
+
+def benchmark_hashes(cases, size_mb, warmup, repeat, progress):
+    """对临时文件计算哈希的吞吐量（MB/s），预热后文件位于页缓存中，主要反映计算速度和缓冲区开销"""
+    results = []
+    fd, path = tempfile.mkstemp(prefix="hash_benchmark_")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(MB))
+        for algorithm, buffer_size in cases:
+            if isinstance(algorithm, tuple):
+                name = "+".join(algorithm)
+                run = lambda: hash_utils.hash_file_multi(path, algorithm, buffer_size)
+            else:
+                name = algorithm
+                run = lambda: hash_utils.hash_file(path, algorithm, buffer_size)
+            progress.start(f"{name} {buffer_size // 1024} KB")
+            times = _time_runs(run, warmup, repeat)
+            results.append({
+                'algorithm': name,
+                'buffer_size': buffer_size,
+                'mb_s_median': round(size_mb / statistics.median(times), 1),
+                'mb_s_best': round(size_mb / min(times), 1)
+            })
+            progress.finish()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return results
+
+def benchmark_ciphers(cases, worker_counts, size_mb, warmup, repeat, progress):
+    """流式加解密在内存中的吞吐量（MB/s），按加密算法、块大小和线程数组合"""
+    results = []
+    plaintext = os.urandom(size_mb * MB)
+    for cipher, chunk_size in cases:
+        progress.start(f"{cipher} {chunk_size // 1024} KB")
+        for row in crypto_utils.benchmark_file_encryption(worker_counts=worker_counts, cipher=cipher,
+                                                          chunk_size=chunk_size, warmup=warmup,
+                                                          repeat=repeat, plaintext=plaintext):
+            results.append(dict(row, cipher=cipher, chunk_size=chunk_size))
+        progress.finish()
+    return results
+
+def run_crypto_benchmarks(sections=('kdf', 'hash', 'cipher'), size_mb=64, warmup=1, repeat=3,
+                          kdfs=None, hash_algorithms=None, hash_buffer_sizes=HASH_BUFFER_SIZES,
+                          ciphers=None, chunk_sizes=CIPHER_CHUNK_SIZES, worker_counts=None,
+                          progress_callback=None, cancel_event=None):
+    """运行加密相关的性能测试，返回可直接保存为JSON的结果字典
+
+    sections 选择要测试的部分：kdf（密钥派生延迟）、hash（各算法和缓冲区大小的哈希吞吐量）、
+    cipher（各加密算法、块大小、线程数的加解密吞吐量）。每项先预热 warmup 次再测 repeat 次。
+    cancel_event 被设置时在当前测试项结束后抛出 BenchmarkCancelled。
+    """
+    kdfs = kdfs or list(crypto_utils.KDFS)
+    hash_algorithms = hash_algorithms or list(crypto_utils.SUPPORTED_HASH_ALGORITHMS)
+    ciphers = ciphers or list(crypto_utils.CIPHERS)
+    worker_counts = worker_counts or sorted({1, 2, 4, crypto_utils.default_crypto_workers()})
+
+    kdf_cases = _kdf_cases(kdfs) if 'kdf' in sections else []
+    hash_cases = _hash_cases(hash_algorithms, hash_buffer_sizes) if 'hash' in sections else []
+    cipher_cases = _cipher_cases(ciphers, chunk_sizes) if 'cipher' in sections else []
+    progress = _Progress(progress_callback, len(kdf_cases) + len(hash_cases) + len(cipher_cases),
+                         cancel_event)
+
+    start_time = time.time()
+    results = {
+        'version': BENCHMARK_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'system': get_system_info(),
+        'settings': {'size_mb': size_mb, 'warmup': warmup, 'repeat': repeat,
+                     'worker_counts': list(worker_counts)}
+    }
+    if kdf_cases:
+        results['kdf'] = benchmark_kdfs(kdf_cases, warmup, repeat, progress)
+    if hash_cases:
+        results['hash'] = benchmark_hashes(hash_cases, size_mb, warmup, repeat, progress)
+    if cipher_cases:
+        results['cipher'] = benchmark_ciphers(cipher_cases, worker_counts, size_mb, warmup, repeat, progress)
+    results['elapsed'] = round(time.time() - start_time, 2)
+    return results
+
+def save_benchmark_results(results, output_path=None):
+    """保存为JSON，默认写入 data/benchmarks，返回文件路径"""
+    if not output_path:
+        output_dir = os.path.join(get_data_dir(), BENCHMARK_DIR_NAME)
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir,
+                                   f"crypto_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return output_path
+
+def format_benchmark_results(results):
+    """把结果格式化为便于阅读的文本"""
+    lines = [f"{results['system']['platform']}, {results['system']['cpu_count']} 核, "
+             f"Python {results['system']['python']}, cryptography {results['system']['cryptography']}"]
+    if results.get('kdf'):
+        lines.append("\n密钥派生（毫秒，中位数 / 最小 / 最大）:")
+        for row in results['kdf']:
+            lines.append(f"  {row['kdf']:<9} {row['params']}: "
+                         f"{row['ms_median']} / {row['ms_min']} / {row['ms_max']}")
+    if results.get('hash'):
+        lines.append("\n哈希吞吐量（MB/s，中位数 / 最佳）:")
+        for row in results['hash']:
+            lines.append(f"  {row['algorithm']:<22} 缓冲区 {row['buffer_size'] // 1024:>5} KB: "
+                         f"{row['mb_s_median']} / {row['mb_s_best']}")
+    if results.get('cipher'):
+        lines.append("\n加解密吞吐量（MB/s，加密 / 解密）:")
+        for row in results['cipher']:
+            lines.append(f"  {row['cipher']:<18} 块 {row['chunk_size'] // 1024:>5} KB, "
+                         f"{row['workers']} 线程: {row['encrypt_mb_s']} / {row['decrypt_mb_s']}")
+    return "\n".join(lines)
@@ -2,11 +2,83 @@ import os
 import hashlib
 import secrets
 import string
+import struct
+import io
+import codecs
+import json
+import re
+import time
+import threading
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
+from cryptography.exceptions import InvalidTag
 import base64
+import hmac
+import csv
+import math
+from collections import OrderedDict
+import numpy as np
+import hash_utils
+import scan_utils
+
+# Argon2id：优先使用 cryptography 自带的实现，其次是 argon2-cffi
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:
+    Argon2id = None
+
+try:
+    from argon2.low_level import hash_secret_raw as argon2_hash_secret_raw, Type as Argon2Type
+except ImportError:
+    argon2_hash_secret_raw = None
+
+# 流式加密文件格式（版本1）
+# 文件头: MAGIC | 版本(1) | 算法(1) | KDF(1) | KDF参数长度(2) | KDF参数 | 盐长度(1) | 盐 | 块大小(4) | nonce前缀(8)
+# 数据块: 明文按块大小切分（最后一块可以更短或为空），每块密文 = 明文 + 16字节认证标签
+# 每块的 nonce = nonce前缀 + 块序号；附加认证数据 = 文件头 + 块序号 + 是否最后一块，
+# 因此文件头被修改、数据块被调换、删除或截断都无法通过认证
+STREAM_MAGIC = b"PCTENC"
+STREAM_VERSION = 1
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+AEAD_TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 8
+
+CIPHERS = {
+    'aes-256-gcm': (1, AESGCM),
+    'chacha20-poly1305': (2, ChaCha20Poly1305)
+}
+CIPHER_BY_ID = {cipher_id: (name, cls) for name, (cipher_id, cls) in CIPHERS.items()}
+DEFAULT_CIPHER = 'aes-256-gcm'
+
+KDF_PBKDF2_SHA256 = 1
+KDF_SCRYPT = 2
+KDF_ARGON2ID = 3
+# 批量加密：整批只用主KDF派生一次主密钥，每个文件再用HKDF和各自的盐派生文件密钥
+KDF_HKDF_SHA256 = 0x80
+PBKDF2_ITERATIONS = 100000
+HKDF_INFO = b"PCTENC file key"
+
+KDFS = {
+    'pbkdf2': KDF_PBKDF2_SHA256,
+    'scrypt': KDF_SCRYPT,
+    'argon2id': KDF_ARGON2ID
+}
+# 各KDF的默认参数，可以用 calibrate_kdf 按本机速度重新计算
+DEFAULT_KDF = 'scrypt'
+DEFAULT_KDF_PARAMS = {
+    'pbkdf2': {'iterations': 600000},
+    'scrypt': {'log_n': 15, 'r': 8, 'p': 1},
+    'argon2id': {'iterations': 3, 'memory_kib': 65536, 'lanes': 4}
+}
 
 def generate_key_from_password(password: str, salt: bytes) -> bytes:
     """从密码生成加密密钥"""
@@ -20,34 +92,926 @@ def generate_key_from_password(password: str, salt: bytes) -> bytes:
     key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
     return key
 
-def encrypt_file(file_path: str, password: str, output_path: str = None):
-    """加密文件"""
+def get_available_kdfs():
+    """当前环境可用的密钥派生算法"""
+    kdfs = ['pbkdf2', 'scrypt']
+    if Argon2id is not None or argon2_hash_secret_raw is not None:
+        kdfs.append('argon2id')
+    return kdfs
+
+def _derive_base_key(password_bytes, salt, kdf_id, kdf_params):
+    if kdf_id == KDF_PBKDF2_SHA256:
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=kdf_params['iterations'],
+            backend=default_backend()
+        )
+        return kdf.derive(password_bytes)
+    if kdf_id == KDF_SCRYPT:
+        return Scrypt(salt=salt, length=32, n=1 << kdf_params['log_n'], r=kdf_params['r'],
+                      p=kdf_params['p'], backend=default_backend()).derive(password_bytes)
+    if kdf_id == KDF_ARGON2ID:
+        if Argon2id is not None:
+            return Argon2id(salt=salt, length=32, iterations=kdf_params['iterations'],
+                            lanes=kdf_params['lanes'], memory_cost=kdf_params['memory_kib']
+                            ).derive(password_bytes)
+        if argon2_hash_secret_raw is not None:
+            return argon2_hash_secret_raw(password_bytes, salt, time_cost=kdf_params['iterations'],
+                                          memory_cost=kdf_params['memory_kib'],
+                                          parallelism=kdf_params['lanes'], hash_len=32,
+                                          type=Argon2Type.ID)
+        raise ValueError("Argon2id 需要 cryptography 44 以上版本或安装 argon2-cffi")
+    raise ValueError(f"不支持的密钥派生算法: {kdf_id}")
+
+class DerivedKeyCache:
+    """会话内的派生密钥缓存，按最近使用淘汰，只保存在内存中
+    
+    键为 (密码的HMAC, 盐, KDF, 编码后的参数)，HMAC使用本次进程随机生成的密钥，缓存中不保存密码本身。
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self._session_key = os.urandom(32)
+
+    def make_key(self, password_bytes, salt, kdf_id, kdf_params):
+        password_tag = hmac.new(self._session_key, password_bytes, hashlib.sha256).digest()
+        return (password_tag, bytes(salt), kdf_id, _encode_kdf_params(kdf_id, kdf_params))
+
+    def get(self, cache_key):
+        with self.lock:
+            key = self.entries.get(cache_key)
+            if key is not None:
+                self.entries.move_to_end(cache_key)
+            return key
+
+    def put(self, cache_key, key):
+        with self.lock:
+            self.entries[cache_key] = key
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+derived_key_cache = DerivedKeyCache()
+
+def clear_derived_key_cache():
+    """清除会话内缓存的派生密钥"""
+    derived_key_cache.clear()
+
+def derive_key_bytes(password: str, salt: bytes, kdf_id: int = KDF_PBKDF2_SHA256,
+                     kdf_params: dict = None, master_keys: dict = None, use_cache: bool = True) -> bytes:
+    """按文件头记录的KDF和参数从密码派生32字节原始密钥
+    
+    KDF_HKDF_SHA256 的参数中包含主KDF、主KDF参数和主盐；传入 master_keys 字典时，
+    同一批文件共用的主密钥只派生一次。use_cache 为True时使用会话内的派生密钥缓存，
+    同一个文件在本次运行中再次解密不需要重新计算KDF。
+    """
+    kdf_params = kdf_params or {'iterations': PBKDF2_ITERATIONS}
+    if kdf_id == KDF_HKDF_SHA256:
+        master_id = (kdf_params['master_kdf'], _encode_kdf_params(kdf_params['master_kdf'],
+                                                                 kdf_params['master_params']),
+                     kdf_params['master_salt'])
+        master_key = master_keys.get(master_id) if master_keys is not None else None
+        if master_key is None:
+            master_key = derive_key_bytes(password, kdf_params['master_salt'], kdf_params['master_kdf'],
+                                          kdf_params['master_params'], use_cache=use_cache)
+            if master_keys is not None:
+                master_keys[master_id] = master_key
+        return derive_file_key(master_key, salt)
+    
+    password_bytes = password.encode()
+    cache_key = derived_key_cache.make_key(password_bytes, salt, kdf_id, kdf_params) if use_cache else None
+    if cache_key is not None:
+        key = derived_key_cache.get(cache_key)
+        if key is not None:
+            return key
+    key = _derive_base_key(password_bytes, salt, kdf_id, kdf_params)
+    if cache_key is not None:
+        derived_key_cache.put(cache_key, key)
+    return key
+
+def resolve_kdf(kdf: str = None, kdf_params: dict = None):
+    """把KDF名称和参数转换为 (KDF编号, 参数)，未指定参数时使用默认参数"""
+    kdf = kdf or DEFAULT_KDF
+    if kdf not in KDFS:
+        raise ValueError(f"不支持的密钥派生算法: {kdf}")
+    if kdf not in get_available_kdfs():
+        raise ValueError(f"当前环境不支持 {kdf}")
+    params = dict(kdf_params or DEFAULT_KDF_PARAMS[kdf])
+    _encode_kdf_params(KDFS[kdf], params)  # 校验参数
+    return KDFS[kdf], params
+
+def calibrate_kdf(kdf: str = DEFAULT_KDF, target_ms: float = 500, max_memory_kib: int = 256 * 1024):
+    """按本机速度为KDF选择参数，使一次派生的耗时接近 target_ms
+    
+    PBKDF2 按比例调整迭代次数；scrypt 固定 r=8、p=1，逐步加倍N；Argon2id 在内存上限内
+    先加倍内存，再增加迭代次数。返回 (参数, 实测毫秒数)。
+    """
+    password = b"calibration"
+    salt = os.urandom(16)
+    
+    def measure(kdf_id, params):
+        start = time.perf_counter()
+        _derive_base_key(password, salt, kdf_id, params)
+        return (time.perf_counter() - start) * 1000
+    
+    if kdf == 'pbkdf2':
+        probe = {'iterations': 20000}
+        elapsed = measure(KDF_PBKDF2_SHA256, probe)
+        iterations = int(probe['iterations'] * target_ms / max(elapsed, 1e-3))
+        params = {'iterations': max(100000, min(10000000, iterations // 1000 * 1000))}
+        return params, measure(KDF_PBKDF2_SHA256, params)
+    
+    if kdf == 'scrypt':
+        params = {'log_n': 14, 'r': 8, 'p': 1}
+        elapsed = measure(KDF_SCRYPT, params)
+        while elapsed * 2 <= target_ms * 1.4 and params['log_n'] < 22 and \
+                (128 * params['r'] << (params['log_n'] + 1)) // 1024 <= max_memory_kib:
+            params['log_n'] += 1
+            elapsed = measure(KDF_SCRYPT, params)
+        return params, elapsed
+    
+    if kdf == 'argon2id':
+        if 'argon2id' not in get_available_kdfs():
+            raise ValueError("当前环境不支持 argon2id")
+        params = {'iterations': 1, 'memory_kib': 16 * 1024, 'lanes': min(4, os.cpu_count() or 1)}
+        elapsed = measure(KDF_ARGON2ID, params)
+        while elapsed * 2 <= target_ms * 1.4 and params['memory_kib'] * 2 <= max_memory_kib:
+            params['memory_kib'] *= 2
+            elapsed = measure(KDF_ARGON2ID, params)
+        if elapsed < target_ms:
+            params['iterations'] = max(1, round(target_ms / max(elapsed, 1e-3)))
+            elapsed = measure(KDF_ARGON2ID, params)
+        return params, elapsed
+    
+    raise ValueError(f"不支持的密钥派生算法: {kdf}")
+
+def derive_file_key(master_key: bytes, salt: bytes) -> bytes:
+    """用HKDF-SHA256从主密钥和文件盐派生文件密钥，开销可以忽略"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=HKDF_INFO,
+                backend=default_backend()).derive(master_key)
+
+def _encode_kdf_params(kdf_id, kdf_params):
+    if kdf_id == KDF_PBKDF2_SHA256:
+        return struct.pack(">I", kdf_params['iterations'])
+    if kdf_id == KDF_SCRYPT:
+        return struct.pack(">BHH", kdf_params['log_n'], kdf_params['r'], kdf_params['p'])
+    if kdf_id == KDF_ARGON2ID:
+        return struct.pack(">IIH", kdf_params['iterations'], kdf_params['memory_kib'], kdf_params['lanes'])
+    if kdf_id == KDF_HKDF_SHA256:
+        master_data = _encode_kdf_params(kdf_params['master_kdf'], kdf_params['master_params'])
+        return (struct.pack(">BH", kdf_params['master_kdf'], len(master_data)) + master_data
+                + struct.pack(">B", len(kdf_params['master_salt'])) + kdf_params['master_salt'])
+    raise ValueError(f"不支持的密钥派生算法: {kdf_id}")
+
+def _decode_kdf_params(kdf_id, data):
+    """解析文件头中的KDF参数，并限制参数范围，避免被构造的文件头耗尽CPU或内存"""
+    if kdf_id == KDF_PBKDF2_SHA256 and len(data) == 4:
+        iterations, = struct.unpack(">I", data)
+        if 1 <= iterations <= 10000000:
+            return {'iterations': iterations}
+    if kdf_id == KDF_SCRYPT and len(data) == 5:
+        log_n, r, p = struct.unpack(">BHH", data)
+        if 1 <= log_n <= 22 and 1 <= r <= 32 and 1 <= p <= 16 and (128 * r << log_n) <= 1 << 31:
+            return {'log_n': log_n, 'r': r, 'p': p}
+    if kdf_id == KDF_ARGON2ID and len(data) == 10:
+        iterations, memory_kib, lanes = struct.unpack(">IIH", data)
+        if 1 <= iterations <= 100 and 8 * lanes <= memory_kib <= 4 * 1024 * 1024 and 1 <= lanes <= 64:
+            return {'iterations': iterations, 'memory_kib': memory_kib, 'lanes': lanes}
+    if kdf_id == KDF_HKDF_SHA256 and len(data) >= 4:
+        master_kdf, master_len = struct.unpack(">BH", data[:3])
+        if master_kdf != KDF_HKDF_SHA256 and len(data) >= 4 + master_len:
+            master_params = _decode_kdf_params(master_kdf, data[3:3 + master_len])
+            salt_len = data[3 + master_len]
+            master_salt = data[4 + master_len:]
+            if salt_len and len(master_salt) == salt_len:
+                return {'master_kdf': master_kdf, 'master_params': master_params,
+                        'master_salt': master_salt}
+    raise ValueError("加密文件头中的密钥派生参数无效")
+
+class StreamHeader:
+    """流式加密文件头，raw 为文件头原始字节，参与每个数据块的认证"""
+    def __init__(self, cipher, kdf_id, kdf_params, salt, chunk_size, nonce_prefix):
+        self.cipher = cipher
+        self.kdf_id = kdf_id
+        self.kdf_params = kdf_params
+        self.salt = salt
+        self.chunk_size = chunk_size
+        self.nonce_prefix = nonce_prefix
+        kdf_data = _encode_kdf_params(kdf_id, kdf_params)
+        self.raw = (STREAM_MAGIC + struct.pack(">BBBH", STREAM_VERSION, CIPHERS[cipher][0], kdf_id, len(kdf_data))
+                    + kdf_data + struct.pack(">B", len(salt)) + salt
+                    + struct.pack(">I", chunk_size) + nonce_prefix)
+
+    def new_aead(self, key):
+        return CIPHERS[self.cipher][1](key)
+
+    def chunk_nonce(self, index):
+        return self.nonce_prefix + struct.pack(">I", index)
+
+    def chunk_aad(self, index, final):
+        return self.raw + struct.pack(">QB", index, 1 if final else 0)
+
+def read_stream_header(f):
+    """从文件开头读取流式加密文件头，不是该格式（旧版Fernet文件）时返回None并把位置移回开头"""
+    start = f.tell()
+    fixed = f.read(len(STREAM_MAGIC) + 5)
+    if len(fixed) < len(STREAM_MAGIC) + 5 or not fixed.startswith(STREAM_MAGIC):
+        f.seek(start)
+        return None
+    
+    version, cipher_id, kdf_id, kdf_len = struct.unpack(">BBBH", fixed[len(STREAM_MAGIC):])
+    if version != STREAM_VERSION:
+        raise ValueError(f"不支持的加密文件版本: {version}")
+    if cipher_id not in CIPHER_BY_ID:
+        raise ValueError(f"不支持的加密算法: {cipher_id}")
+    kdf_params = _decode_kdf_params(kdf_id, f.read(kdf_len))
+    salt_len = f.read(1)
+    salt = f.read(salt_len[0]) if salt_len else b""
+    rest = f.read(4 + NONCE_PREFIX_SIZE)
+    if not salt or len(rest) != 4 + NONCE_PREFIX_SIZE:
+        raise ValueError("加密文件头不完整")
+    chunk_size, = struct.unpack(">I", rest[:4])
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError("加密文件头中的块大小无效")
+    return StreamHeader(CIPHER_BY_ID[cipher_id][0], kdf_id, kdf_params, salt, chunk_size,
+                        rest[4:])
+
+class _ProgressReporter:
+    """按百分比变化节流的进度回调"""
+    def __init__(self, callback, total):
+        self.callback = callback
+        self.total = max(total, 1)
+        self.done = 0
+        self.last_percent = -1
+
+    def advance(self, count):
+        self.done += count
+        percent = min(100, self.done * 100 // self.total)
+        if self.callback and percent != self.last_percent:
+            self.last_percent = percent
+            self.callback(percent)
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def default_crypto_workers():
+    """默认并行加密线程数，cryptography 在加解密时会释放GIL"""
+    return max(1, min(8, os.cpu_count() or 1))
+
+def _iter_chunks(f, chunk_size):
+    """按块读取，产出 (块序号, 数据, 是否最后一块)；预读下一块才能确定当前块是否为最后一块"""
+    index = 0
+    chunk = f.read(chunk_size)
+    while True:
+        next_chunk = f.read(chunk_size) if len(chunk) == chunk_size else b""
+        final = not next_chunk
+        yield index, chunk, final
+        if final:
+            return
+        chunk = next_chunk
+        index += 1
+
+def _run_chunks(chunks, transform, dst, workers, progress):
+    """对每个块执行transform并按顺序写入dst
+    
+    workers大于1时在线程池中并行处理，提交顺序即写入顺序；在途块数不超过 workers*2，
+    队首完成后才写出并提交新块，相当于有界的重排序缓冲区，内存占用与文件大小无关。
+    """
+    if workers <= 1:
+        for index, data, final in chunks:
+            dst.write(transform(index, data, final))
+            progress.advance(len(data))
+        return
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for index, data, final in chunks:
+                pending.append((executor.submit(transform, index, data, final), len(data)))
+                if len(pending) >= workers * 2:
+                    future, size = pending.popleft()
+                    dst.write(future.result())
+                    progress.advance(size)
+            while pending:
+                future, size = pending.popleft()
+                dst.write(future.result())
+                progress.advance(size)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
+def _resolve_workers(workers, total_size, chunk_size):
+    if workers:
+        return workers
+    # 小文件不值得启动线程池
+    return default_crypto_workers() if total_size > chunk_size * 4 else 1
+
+def encrypt_stream(src, dst, header, key, total_size=0, workers=1, progress_callback=None):
+    """把src按header的参数加密写入dst（包括文件头）"""
+    aead = header.new_aead(key)
+    progress = _ProgressReporter(progress_callback, total_size)
+    
+    def encrypt_chunk(index, data, final):
+        return aead.encrypt(header.chunk_nonce(index), data, header.chunk_aad(index, final))
+    
+    dst.write(header.raw)
+    _run_chunks(_iter_chunks(src, header.chunk_size), encrypt_chunk, dst, workers, progress)
+
+def decrypt_stream(src, dst, header, key, total_size=0, workers=1, progress_callback=None):
+    """从已读过文件头的src解密数据块写入dst，认证失败时抛出ValueError"""
+    aead = header.new_aead(key)
+    progress = _ProgressReporter(progress_callback, total_size)
+    
+    def decrypt_chunk(index, data, final):
+        try:
+            return aead.decrypt(header.chunk_nonce(index), data, header.chunk_aad(index, final))
+        except InvalidTag:
+            if index == 0:
+                raise ValueError("解密失败，密码可能不正确")
+            raise ValueError("解密失败，文件已损坏或被篡改")
+    
+    chunks = _iter_chunks(src, header.chunk_size + AEAD_TAG_SIZE)
+    _run_chunks(chunks, decrypt_chunk, dst, workers, progress)
+
+def encrypt_file(file_path: str, password: str, output_path: str = None, cipher: str = DEFAULT_CIPHER,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, progress_callback=None, workers: int = None,
+                 kdf: str = None, kdf_params: dict = None):
+    """加密文件
+    
+    按块流式加密，内存占用与文件大小无关；workers 为并行线程数，None 时按文件大小自动选择。
+    kdf 为 'pbkdf2'/'scrypt'/'argon2id'，参数写入文件头。progress_callback 接收 0-100 的进度。
+    """
     if not output_path:
         output_path = file_path + '.encrypted'
+    if cipher not in CIPHERS:
+        raise ValueError(f"不支持的加密算法: {cipher}")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError("块大小无效")
     
     # 生成随机盐
     salt = os.urandom(16)
-    key = generate_key_from_password(password, salt)
-    f = Fernet(key)
+    kdf_id, kdf_params = resolve_kdf(kdf, kdf_params)
+    header = StreamHeader(cipher, kdf_id, kdf_params, salt, chunk_size, os.urandom(NONCE_PREFIX_SIZE))
+    key = derive_key_bytes(password, salt, kdf_id, kdf_params)
+    total_size = os.path.getsize(file_path)
+    workers = _resolve_workers(workers, total_size, chunk_size)
     
-    with open(file_path, 'rb') as file:
-        file_data = file.read()
+    # 先写入临时文件，完成后再替换，避免留下不完整的输出
+    temp_path = output_path + '.tmp'
+    try:
+        with open(file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+            encrypt_stream(src, dst, header, key, total_size, workers, progress_callback)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
     
-    encrypted_data = f.encrypt(file_data)
+    return output_path
+
+def _default_decrypt_path(file_path):
+    output_path = file_path.replace('.encrypted', '')
+    if output_path == file_path:
+        output_path = file_path + '.decrypted'
+    return output_path
+
+def decrypt_file(file_path: str, password: str, output_path: str = None, progress_callback=None,
+                 workers: int = None):
+    """解密文件，同时支持流式格式和旧版Fernet格式"""
+    if not output_path:
+        output_path = _default_decrypt_path(file_path)
     
-    # 将盐和加密数据一起保存
-    with open(output_path, 'wb') as file:
-        file.write(salt + encrypted_data)
+    with open(file_path, 'rb') as src:
+        header = read_stream_header(src)
+        if header is None:
+            return _decrypt_file_legacy(file_path, password, output_path)
+        
+        key = derive_key_bytes(password, header.salt, header.kdf_id, header.kdf_params)
+        total_size = os.path.getsize(file_path) - src.tell()
+        workers = _resolve_workers(workers, total_size, header.chunk_size)
+        
+        # 认证全部通过后才替换输出文件，失败时不留下部分明文
+        temp_path = output_path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as dst:
+                decrypt_stream(src, dst, header, key, total_size, workers, progress_callback)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            _remove_quietly(temp_path)
+            raise
     
     return output_path
 
-def decrypt_file(file_path: str, password: str, output_path: str = None):
-    """解密文件"""
-    if not output_path:
-        output_path = file_path.replace('.encrypted', '')
-        if output_path == file_path:
-            output_path = file_path + '.decrypted'
+class _HashingWriter:
+    """写入时同时计算SHA-256"""
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.f.write(data)
+
+class _HashingReader:
+    """读取时同时计算SHA-256"""
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.hasher.update(data)
+        return data
+
+    def tell(self):
+        return self.f.tell()
+
+    def seek(self, offset):
+        return self.f.seek(offset)
+
+class _BatchProgress:
+    """多个线程共享的总进度，按已处理字节数计算百分比"""
+    def __init__(self, callback, total):
+        self.lock = threading.Lock()
+        self.reporter = _ProgressReporter(callback, total)
+
+    def advance(self, count):
+        with self.lock:
+            self.reporter.advance(count)
+
+def _batch_output_path(file_path, output_dir, base_dir, suffix):
+    if not output_dir:
+        return file_path + suffix if suffix else _default_decrypt_path(file_path)
+    relative = os.path.relpath(file_path, base_dir) if base_dir else os.path.basename(file_path)
+    if suffix:
+        relative += suffix
+    elif relative.endswith('.encrypted'):
+        relative = relative[:-len('.encrypted')]
+    output_path = os.path.join(output_dir, relative)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    return output_path
+
+def _plan_batch_outputs(file_paths, output_dir, base_dir, suffix):
+    """为整批文件确定输出路径，返回 (去重后的文件列表, {文件: 输出路径})
+    
+    只给 output_dir 不给 base_dir 时按文件名输出，不同目录下的同名文件会冲突，
+    冲突的输出名依次追加 _1、_2...，避免互相覆盖。
+    """
+    file_paths = list(dict.fromkeys(file_paths))
+    outputs = {}
+    taken = set()
+    for file_path in file_paths:
+        output_path = _batch_output_path(file_path, output_dir, base_dir, suffix)
+        if os.path.normcase(os.path.abspath(output_path)) in taken:
+            stem = output_path[:-len(suffix)] if suffix else output_path
+            base, ext = os.path.splitext(stem)
+            counter = 1
+            while True:
+                output_path = f"{base}_{counter}{ext}{suffix}"
+                if os.path.normcase(os.path.abspath(output_path)) not in taken:
+                    break
+                counter += 1
+        taken.add(os.path.normcase(os.path.abspath(output_path)))
+        outputs[file_path] = output_path
+    return file_paths, outputs
+
+def _run_file_batch(file_paths, process_file, workers, progress_callback):
+    """在线程池中逐个处理文件，返回 (成功结果列表, [(文件, 错误)])，无法读取的文件记入失败列表"""
+    succeeded = []
+    failed = []
+    readable = []
+    total_size = 0
+    for path in file_paths:
+        try:
+            total_size += os.path.getsize(path)
+        except OSError as e:
+            failed.append((path, str(e)))
+            continue
+        readable.append(path)
+    progress = _BatchProgress(progress_callback, total_size)
+    with ThreadPoolExecutor(max_workers=workers or default_crypto_workers()) as executor:
+        futures = [(path, executor.submit(process_file, path, progress)) for path in readable]
+        for path, future in futures:
+            try:
+                succeeded.append(future.result())
+            except Exception as e:
+                failed.append((path, str(e)))
+    return succeeded, failed
+
+def encrypt_files_batch(file_paths, password: str, output_dir: str = None, base_dir: str = None,
+                        cipher: str = DEFAULT_CIPHER, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        workers: int = None, progress_callback=None, manifest_path: str = None,
+                        kdf: str = None, kdf_params: dict = None):
+    """批量加密文件
+    
+    整批只执行一次主KDF得到主密钥，每个文件用随机盐经HKDF派生自己的密钥，文件头中记录
+    主KDF参数和主盐，因此单个文件也能用 decrypt_file 单独解密。文件在线程池中并行处理，
+    结束后写出校验清单（明文和密文的SHA-256），返回汇总字典。
+    """
+    if cipher not in CIPHERS:
+        raise ValueError(f"不支持的加密算法: {cipher}")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError("块大小无效")
+    file_paths, output_paths = _plan_batch_outputs(file_paths, output_dir, base_dir, '.encrypted')
+    start_time = time.time()
+    master_salt = os.urandom(16)
+    master_kdf, master_params = resolve_kdf(kdf, kdf_params)
+    master_key = derive_key_bytes(password, master_salt, master_kdf, master_params)
+    kdf_params = {'master_kdf': master_kdf, 'master_params': master_params,
+                  'master_salt': master_salt}
+    
+    def process_file(file_path, progress):
+        salt = os.urandom(16)
+        header = StreamHeader(cipher, KDF_HKDF_SHA256, kdf_params, salt, chunk_size,
+                              os.urandom(NONCE_PREFIX_SIZE))
+        output_path = output_paths[file_path]
+        temp_path = output_path + '.tmp'
+        try:
+            with open(file_path, 'rb') as f, open(temp_path, 'wb') as out:
+                src = _HashingReader(f)
+                dst = _HashingWriter(out)
+                encrypt_stream(src, dst, header, derive_file_key(master_key, salt), 0, 1,
+                               None)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            _remove_quietly(temp_path)
+            raise
+        size = os.path.getsize(file_path)
+        progress.advance(size)
+        return {'source': file_path, 'output': output_path, 'size': size,
+                'plain_sha256': src.hasher.hexdigest(), 'cipher_sha256': dst.hasher.hexdigest()}
+    
+    succeeded, failed = _run_file_batch(file_paths, process_file, workers, progress_callback)
+    
+    if manifest_path is None and succeeded:
+        manifest_dir = output_dir or os.path.dirname(os.path.abspath(succeeded[0]['output']))
+        manifest_path = os.path.join(manifest_dir,
+                                     f"encrypt_manifest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    if manifest_path:
+        manifest = {
+            'created_at': datetime.now().isoformat(),
+            'cipher': cipher,
+            'files': succeeded,
+            'failed': [{'source': path, 'error': error} for path, error in failed]
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
     
+    return {
+        'succeeded': succeeded,
+        'failed': failed,
+        'manifest_path': manifest_path,
+        'total_bytes': sum(item['size'] for item in succeeded),
+        'elapsed': time.time() - start_time
+    }
+
+def decrypt_files_batch(file_paths, password: str, output_dir: str = None, base_dir: str = None,
+                        workers: int = None, progress_callback=None):
+    """批量解密文件，同一批加密的文件共用的主密钥只派生一次"""
+    file_paths, output_paths = _plan_batch_outputs(file_paths, output_dir, base_dir, '')
+    start_time = time.time()
+    master_keys = {}
+    master_lock = threading.Lock()
+    
+    def process_file(file_path, progress):
+        output_path = output_paths[file_path]
+        with open(file_path, 'rb') as src:
+            header = read_stream_header(src)
+            if header is None:
+                decrypt_file(file_path, password, output_path)
+            else:
+                # 加锁避免多个线程同时为同一批文件重复派生主密钥
+                with master_lock:
+                    key = derive_key_bytes(password, header.salt, header.kdf_id, header.kdf_params,
+                                           master_keys)
+                temp_path = output_path + '.tmp'
+                try:
+                    with open(temp_path, 'wb') as dst:
+                        decrypt_stream(src, dst, header, key)
+                    os.replace(temp_path, output_path)
+                except BaseException:
+                    _remove_quietly(temp_path)
+                    raise
+        progress.advance(os.path.getsize(file_path))
+        return {'source': file_path, 'output': output_path}
+    
+    succeeded, failed = _run_file_batch(file_paths, process_file, workers, progress_callback)
+    return {'succeeded': succeeded, 'failed': failed, 'elapsed': time.time() - start_time}
+
+def verify_batch_manifest(manifest_path: str, password: str = None, workers: int = None):
+    """按校验清单检查加密文件
+    
+    不提供密码时只比对密文的SHA-256；提供密码时还会在内存中解密并比对明文的SHA-256，不写出任何文件。
+    返回 {'ok': [...], 'failed': [(文件, 原因)]}。
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    master_keys = {}
+    master_lock = threading.Lock()
+    
+    def verify_entry(entry):
+        path = entry['output']
+        with open(path, 'rb') as f:
+            reader = _HashingReader(f)
+            header = read_stream_header(reader)
+            if header is None:
+                raise ValueError("不是批量加密生成的文件")
+            if password is None:
+                while reader.read(hash_utils.DEFAULT_BUFFER_SIZE):
+                    pass
+            else:
+                with master_lock:
+                    key = derive_key_bytes(password, header.salt, header.kdf_id, header.kdf_params,
+                                           master_keys)
+                plain = _HashingWriter(_NullWriter())
+                decrypt_stream(reader, plain, header, key)
+                if plain.hasher.hexdigest() != entry['plain_sha256']:
+                    raise ValueError("明文校验值不一致")
+        if reader.hasher.hexdigest() != entry['cipher_sha256']:
+            raise ValueError("密文校验值不一致")
+        return path
+    
+    ok = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers or default_crypto_workers()) as executor:
+        futures = [(entry['output'], executor.submit(verify_entry, entry)) for entry in manifest['files']]
+        for path, future in futures:
+            try:
+                ok.append(future.result())
+            except Exception as e:
+                failed.append((path, str(e)))
+    return {'ok': ok, 'failed': failed}
+
+CHECKSUM_FILE_NAMES = {'md5': 'MD5SUMS', 'sha1': 'SHA1SUMS', 'sha256': 'SHA256SUMS', 'sha512': 'SHA512SUMS'}
+_CHECKSUM_ALGORITHM_BY_LENGTH = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}
+_BSD_CHECKSUM_LINE = re.compile(r'([A-Za-z0-9-]+) \((.*)\) = ([0-9A-Fa-f]+)$')
+
+def _escape_checksum_name(name):
+    """按 sha256sum 的规则转义文件名：含反斜杠或换行时整行以反斜杠开头"""
+    if '\\' not in name and '\n' not in name and '\r' not in name:
+        return '', name
+    return '\\', name.replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r')
+
+def _unescape_checksum_name(name):
+    result = []
+    i = 0
+    while i < len(name):
+        char = name[i]
+        if char == '\\' and i + 1 < len(name):
+            result.append({'n': '\n', 'r': '\r', '\\': '\\'}.get(name[i + 1], name[i + 1]))
+            i += 2
+        else:
+            result.append(char)
+            i += 1
+    return ''.join(result)
+
+def parse_checksum_manifest(manifest_path: str):
+    """读取 sha256sum/md5sum 格式（也接受 --tag 的BSD格式）的校验清单
+    
+    返回 (算法, [(哈希值, 相对路径)])，算法由哈希值长度推断。
+    """
+    entries = []
+    algorithms = set()
+    with open(manifest_path, 'r', encoding='utf-8', newline='') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            escaped = line.startswith('\\')
+            if escaped:
+                line = line[1:]
+            bsd = _BSD_CHECKSUM_LINE.match(line)
+            if bsd:
+                # BSD格式: SHA256 (文件名) = 哈希值
+                tag, name, digest = bsd.groups()
+                algorithm = tag.lower().replace('-', '')
+            else:
+                digest, sep, name = line.partition(' ')
+                if not sep or not name or name[0] not in ' *':
+                    raise ValueError(f"第 {line_number} 行格式错误")
+                name = name[1:]
+                algorithm = _CHECKSUM_ALGORITHM_BY_LENGTH.get(len(digest))
+            digest = digest.lower()
+            if algorithm not in SUPPORTED_HASH_ALGORITHMS or len(digest) != len(hash_utils.new_hasher(algorithm).hexdigest()):
+                raise ValueError(f"第 {line_number} 行无法识别哈希算法")
+            if escaped:
+                name = _unescape_checksum_name(name)
+            algorithms.add(algorithm)
+            entries.append((digest, name))
+    if len(algorithms) > 1:
+        raise ValueError("校验清单中混用了多种哈希算法")
+    return (algorithms.pop() if algorithms else None), entries
+
+def create_checksum_manifest(directory: str, manifest_path: str = None, algorithm: str = 'sha256',
+                             hash_cache=None, workers: int = None, progress_callback=None,
+                             cancel_event=None):
+    """为目录树生成 sha256sum/md5sum 兼容的校验清单
+    
+    文件在 HashPool 中并行计算哈希（机械硬盘按设备限制并发），传入hash_cache时未变化的文件
+    直接使用缓存。清单按相对路径排序，路径使用 / 分隔，可直接用 sha256sum -c 校验。
+    返回包含文件数、字节数、耗时和吞吐量的汇总字典。
+    """
+    algorithm = algorithm.lower()
+    if algorithm not in SUPPORTED_HASH_ALGORITHMS:
+        raise ValueError(f"不支持的哈希算法: {algorithm}")
+    if not os.path.isdir(directory):
+        raise ValueError("目录不存在")
+    start_time = time.time()
+    manifest_path = manifest_path or os.path.join(directory, CHECKSUM_FILE_NAMES[algorithm])
+    manifest_abs = os.path.abspath(manifest_path)
+    
+    files = [entry for entry in scan_utils.iter_files(directory, cancel_event=cancel_event)
+             if os.path.abspath(entry.path) != manifest_abs]
+    sizes = {entry.path: entry.size for entry in files}
+    progress = _BatchProgress(progress_callback, sum(sizes.values()))
+    pool = hash_utils.HashPool(algorithm, max_workers=workers, cache=hash_cache)
+    
+    digests = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=pool.max_workers) as executor:
+        futures = {executor.submit(pool.hash_file, path): path for path in sizes}
+        for future in as_completed(futures):
+            path = futures[future]
+            if cancel_event and cancel_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                break
+            digest = future.result()
+            if digest is None:
+                failed.append((path, "无法读取文件"))
+            else:
+                digests[path] = digest
+            progress.advance(sizes[path])
+    if hash_cache is not None:
+        hash_cache.flush()
+    if cancel_event and cancel_event.is_set():
+        raise RuntimeError("操作已取消")
+    
+    lines = []
+    for path, digest in digests.items():
+        prefix, name = _escape_checksum_name(os.path.relpath(path, directory).replace(os.sep, '/'))
+        lines.append((name, f"{prefix}{digest}  {name}\n"))
+    lines.sort()
+    temp_path = manifest_path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.writelines(line for _, line in lines)
+        os.replace(temp_path, manifest_path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    
+    elapsed = time.time() - start_time
+    total_bytes = sum(sizes[path] for path in digests)
+    return {
+        'manifest_path': manifest_path,
+        'algorithm': algorithm,
+        'file_count': len(digests),
+        'failed': failed,
+        'total_bytes': total_bytes,
+        'elapsed': elapsed,
+        'throughput_mb_s': total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    }
+
+def iter_verify_checksum_manifest(manifest_path: str, base_dir: str = None, hash_cache=None,
+                                  workers: int = None, fail_fast: bool = False, cancel_event=None,
+                                  progress_callback=None):
+    """并行校验清单中的文件，按完成顺序逐个产出结果
+    
+    每个结果为 {'path', 'status', 'expected', 'actual', 'size'}，status 为 ok/mismatch/missing/error。
+    fail_fast 为True时遇到第一个失败即取消尚未开始的任务并停止。
+    """
+    algorithm, entries = parse_checksum_manifest(manifest_path)
+    base_dir = base_dir or os.path.dirname(os.path.abspath(manifest_path))
+    if not entries:
+        return
+    pool = hash_utils.HashPool(algorithm, max_workers=workers, cache=hash_cache)
+    
+    def check(entry):
+        expected, name = entry
+        path = os.path.join(base_dir, *name.split('/'))
+        result = {'path': name, 'status': 'ok', 'expected': expected, 'actual': None, 'size': 0}
+        try:
+            result['size'] = os.stat(path).st_size
+        except OSError:
+            result['status'] = 'missing'
+            return result
+        result['actual'] = pool.hash_file(path)
+        if result['actual'] is None:
+            result['status'] = 'error'
+        elif result['actual'] != expected:
+            result['status'] = 'mismatch'
+        return result
+    
+    progress = _ProgressReporter(progress_callback, len(entries))
+    executor = ThreadPoolExecutor(max_workers=pool.max_workers)
+    futures = [executor.submit(check, entry) for entry in entries]
+    try:
+        for future in as_completed(futures):
+            result = future.result()
+            progress.advance(1)
+            yield result
+            if (fail_fast and result['status'] != 'ok') or (cancel_event and cancel_event.is_set()):
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        if hash_cache is not None:
+            hash_cache.flush()
+
+def verify_checksum_manifest(manifest_path: str, base_dir: str = None, hash_cache=None,
+                             workers: int = None, fail_fast: bool = False, cancel_event=None,
+                             progress_callback=None, result_callback=None):
+    """校验清单并汇总结果，result_callback(结果) 在每个文件校验完成后调用
+    
+    返回 {'ok', 'failed': [(路径, 状态)], 'checked', 'total', 'stopped_early', 'total_bytes',
+    'elapsed', 'throughput_mb_s'}。
+    """
+    start_time = time.time()
+    total = len(parse_checksum_manifest(manifest_path)[1])
+    ok = []
+    failed = []
+    total_bytes = 0
+    for result in iter_verify_checksum_manifest(manifest_path, base_dir, hash_cache, workers,
+                                                fail_fast, cancel_event, progress_callback):
+        total_bytes += result['size']
+        if result['status'] == 'ok':
+            ok.append(result['path'])
+        else:
+            failed.append((result['path'], result['status']))
+        if result_callback:
+            result_callback(result)
+    elapsed = time.time() - start_time
+    checked = len(ok) + len(failed)
+    return {
+        'ok': ok,
+        'failed': failed,
+        'checked': checked,
+        'total': total,
+        'stopped_early': checked < total,
+        'total_bytes': total_bytes,
+        'elapsed': elapsed,
+        'throughput_mb_s': total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    }
+
+class _NullWriter:
+    """丢弃写入的数据，基准测试时排除磁盘写入的影响"""
+    def write(self, data):
+        return len(data)
+
+def benchmark_file_encryption(size_mb: int = 256, worker_counts=(1, 2, 4, 8), cipher: str = DEFAULT_CIPHER,
+                              chunk_size: int = DEFAULT_CHUNK_SIZE, warmup: int = 0, repeat: int = 1,
+                              plaintext: bytes = None):
+    """测试不同线程数下的流式加解密吞吐量，数据在内存中，不含密钥派生和磁盘I/O
+    
+    每种线程数先预热 warmup 次，再测 repeat 次取中位数；传入 plaintext 时使用该数据，
+    多组测试可以共用同一份明文。返回 [{'workers', 'encrypt_mb_s', 'decrypt_mb_s'}]。
+    """
+    if plaintext is None:
+        plaintext = os.urandom(size_mb * 1024 * 1024)
+    size_mb = len(plaintext) / (1024 * 1024)
+    key = AESGCM.generate_key(bit_length=256)
+    results = []
+    for workers in worker_counts:
+        header = StreamHeader(cipher, KDF_PBKDF2_SHA256, {'iterations': PBKDF2_ITERATIONS},
+                              os.urandom(16), chunk_size, os.urandom(NONCE_PREFIX_SIZE))
+        encrypt_times = []
+        decrypt_times = []
+        for run in range(warmup + max(1, repeat)):
+            encrypted = io.BytesIO()
+            start = time.perf_counter()
+            encrypt_stream(io.BytesIO(plaintext), encrypted, header, key, len(plaintext), workers)
+            encrypt_time = time.perf_counter() - start
+            
+            encrypted.seek(len(header.raw))
+            start = time.perf_counter()
+            decrypt_stream(encrypted, _NullWriter(), header, key, len(plaintext), workers)
+            decrypt_time = time.perf_counter() - start
+            if run >= warmup:
+                encrypt_times.append(encrypt_time)
+                decrypt_times.append(decrypt_time)
+        
+        encrypt_times.sort()
+        decrypt_times.sort()
+        results.append({
+            'workers': workers,
+            'encrypt_mb_s': round(size_mb / encrypt_times[len(encrypt_times) // 2], 1),
+            'decrypt_mb_s': round(size_mb / decrypt_times[len(decrypt_times) // 2], 1)
+        })
+    return results
+
+def _decrypt_file_legacy(file_path, password, output_path):
+    """解密旧版文件格式：16字节盐 + Fernet令牌"""
     with open(file_path, 'rb') as file:
         file_data = file.read()
     
@@ -66,25 +1030,37 @@ def decrypt_file(file_path: str, password: str, output_path: str = None):
     except:
         raise ValueError("解密失败，密码可能不正确")
 
-def calculate_file_hash(file_path: str, algorithm: str = 'md5') -> str:
-    """计算文件哈希值"""
-    hash_algorithms = {
-        'md5': hashlib.md5(),
-        'sha1': hashlib.sha1(),
-        'sha256': hashlib.sha256(),
-        'sha512': hashlib.sha512()
-    }
+SUPPORTED_HASH_ALGORITHMS = ('md5', 'sha1', 'sha256', 'sha512')
+
+def calculate_file_hashes(file_path: str, algorithms, hash_cache=None, progress_callback=None) -> dict:
+    """只读取一遍文件同时计算多个哈希，返回 {算法: 哈希值}
     
-    if algorithm.lower() not in hash_algorithms:
-        raise ValueError(f"不支持的哈希算法: {algorithm}")
+    大文件上各算法在独立线程中计算，总耗时接近最慢的单个算法；progress_callback 接收 0-100 的进度。
+    """
+    algorithms = [algorithm.lower() for algorithm in algorithms]
+    for algorithm in algorithms:
+        if algorithm not in SUPPORTED_HASH_ALGORITHMS:
+            raise ValueError(f"不支持的哈希算法: {algorithm}")
     
-    hash_obj = hash_algorithms[algorithm.lower()]
+    progress = _ProgressReporter(progress_callback, os.path.getsize(file_path))
+    digests = hash_utils.hash_file_multi_cached(file_path, algorithms, hash_cache,
+                                                progress_callback=progress.advance)
+    if hash_cache is not None:
+        hash_cache.flush()
+    return digests
+
+def calculate_file_hash(file_path: str, algorithm: str = 'md5', hash_cache=None) -> str:
+    """计算文件哈希值，传入hash_cache时未变化的文件直接使用缓存结果"""
+    algorithm = algorithm.lower()
+    if algorithm not in SUPPORTED_HASH_ALGORITHMS:
+        raise ValueError(f"不支持的哈希算法: {algorithm}")
     
-    with open(file_path, 'rb') as file:
-        for chunk in iter(lambda: file.read(4096), b""):
-            hash_obj.update(chunk)
+    if hash_cache is not None:
+        digest = hash_utils.hash_file_cached(file_path, algorithm, hash_cache)
+        hash_cache.flush()
+        return digest
     
-    return hash_obj.hexdigest()
+    return hash_utils.hash_file(file_path, algorithm)
 
 def calculate_text_hash(text: str, algorithm: str = 'md5') -> str:
     """计算文本哈希值"""
@@ -102,6 +1078,115 @@ def calculate_text_hash(text: str, algorithm: str = 'md5') -> str:
     hash_obj.update(text.encode('utf-8'))
     return hash_obj.hexdigest()
 
+PASSWORD_SYMBOLS = "!@#$%^&*()_+-=[]{}|;:,.<>?"
+PASSWORD_BLOCK_ROWS = 65536  # 批量生成时每轮最多采样的密码数，限制临时数组大小
+
+def _secure_random_indices(count, n):
+    """用 secrets.token_bytes 批量取随机字节，拒绝采样得到 count 个 [0, n) 内均匀分布的整数"""
+    if not 0 < n <= 256:
+        raise ValueError("字符集大小必须在 1-256 之间")
+    # 大于等于 limit 的字节直接丢弃，保证取模后每个值的概率相同
+    limit = 256 - 256 % n
+    result = np.empty(count, dtype=np.uint8)
+    filled = 0
+    while filled < count:
+        need = count - filled
+        draw = np.frombuffer(secrets.token_bytes(need * 256 // limit + 16), dtype=np.uint8)
+        accepted = draw[draw < limit][:need]
+        result[filled:filled + len(accepted)] = accepted % n
+        filled += len(accepted)
+    return result
+
+def _password_classes(use_uppercase, use_lowercase, use_digits, use_symbols, symbols):
+    classes = []
+    if use_uppercase:
+        classes.append(string.ascii_uppercase)
+    if use_lowercase:
+        classes.append(string.ascii_lowercase)
+    if use_digits:
+        classes.append(string.digits)
+    if use_symbols:
+        classes.append(symbols)
+    if not classes:
+        raise ValueError("至少选择一种字符类型")
+    return classes
+
+def password_entropy_bits(length: int, class_sizes, min_per_class: int = 1) -> float:
+    """满足“每类字符至少 min_per_class 个”的密码在均匀分布下的熵（比特）
+    
+    按类别逐个做组合计数：ways[l] 为长度 l、只用已处理类别且满足下限的字符串数。
+    """
+    ways = [1] + [0] * length
+    for size in class_sizes:
+        combined = [0] * (length + 1)
+        for total in range(length + 1):
+            combined[total] = sum(math.comb(total, j) * size ** j * ways[total - j]
+                                  for j in range(min_per_class, total + 1))
+        ways = combined
+    return math.log2(ways[length]) if ways[length] else 0.0
+
+def generate_passwords(count: int, length: int = 16, use_uppercase: bool = True, use_lowercase: bool = True,
+                       use_digits: bool = True, use_symbols: bool = True, min_per_class: int = 1,
+                       symbols: str = PASSWORD_SYMBOLS):
+    """批量生成密码，返回 (密码列表, 每个密码的熵比特数)
+    
+    随机字节一次性从 secrets.token_bytes 取出，在 NumPy 中按拒绝采样映射到字符集；
+    不满足“每类字符至少 min_per_class 个”的密码整条丢弃重新采样，而不是往里插入指定字符，
+    因此结果在所有合格密码中均匀分布，熵可以精确计算。
+    """
+    if count < 1:
+        raise ValueError("生成数量必须大于0")
+    classes = _password_classes(use_uppercase, use_lowercase, use_digits, use_symbols, symbols)
+    if length < 1 or min_per_class * len(classes) > length:
+        raise ValueError("密码长度不足以包含每类字符")
+    
+    alphabet = np.frombuffer("".join(classes).encode('ascii'), dtype=np.uint8)
+    class_of = np.repeat(np.arange(len(classes)), [len(chars) for chars in classes])
+    entropy = password_entropy_bits(length, [len(chars) for chars in classes], min_per_class)
+    # 按合格率估计每轮需要采样的行数
+    acceptance = 2 ** (entropy - length * math.log2(len(alphabet))) if min_per_class else 1.0
+    
+    passwords = []
+    while len(passwords) < count:
+        rows = min(PASSWORD_BLOCK_ROWS, int((count - len(passwords)) / acceptance * 1.1) + 16)
+        indices = _secure_random_indices(rows * length, len(alphabet)).reshape(rows, length)
+        if min_per_class:
+            classes_used = class_of[indices]
+            valid = np.ones(rows, dtype=bool)
+            for class_id in range(len(classes)):
+                valid &= (classes_used == class_id).sum(axis=1) >= min_per_class
+            indices = indices[valid]
+        data = alphabet[indices[:count - len(passwords)]].tobytes().decode('ascii')
+        passwords.extend(data[i:i + length] for i in range(0, len(data), length))
+    return passwords, entropy
+
+def generate_keys(count: int, key_bytes: int = 32, encoding: str = 'hex'):
+    """批量生成随机密钥，一次调用 secrets.token_bytes 后切分；encoding 为 hex 或 base64url"""
+    if count < 1 or key_bytes < 1:
+        raise ValueError("数量和密钥长度必须大于0")
+    data = secrets.token_bytes(count * key_bytes)
+    keys = [data[i:i + key_bytes] for i in range(0, len(data), key_bytes)]
+    if encoding == 'hex':
+        return [key.hex() for key in keys]
+    if encoding == 'base64url':
+        return [base64.urlsafe_b64encode(key).rstrip(b'=').decode('ascii') for key in keys]
+    raise ValueError(f"不支持的编码: {encoding}")
+
+def export_secrets(values, output_path: str, entropy_bits: float = None, label: str = 'password'):
+    """把生成的密码或密钥导出为CSV或JSON（按扩展名判断），返回输出路径"""
+    created_at = datetime.now().isoformat()
+    if output_path.lower().endswith('.json'):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': created_at, 'count': len(values), 'entropy_bits': entropy_bits,
+                       f'{label}s': values}, f, ensure_ascii=False, indent=2)
+    else:
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['index', label, 'entropy_bits'])
+            entropy = round(entropy_bits, 2) if entropy_bits is not None else ''
+            writer.writerows((i, value, entropy) for i, value in enumerate(values, 1))
+    return output_path
+
 def generate_password(length: int = 12, use_uppercase: bool = True, use_lowercase: bool = True, 
                      use_digits: bool = True, use_symbols: bool = True) -> str:
     """生成随机密码"""
@@ -116,7 +1201,7 @@ def generate_password(length: int = 12, use_uppercase: bool = True, use_lowercas
     if use_digits:
         characters += string.digits
     if use_symbols:
-        characters += "!@#$%^&*()_+-=[]{}|;:,.<>?"
+        characters += PASSWORD_SYMBOLS
     
     if not characters:
         raise ValueError("至少选择一种字符类型")
@@ -124,18 +1209,174 @@ def generate_password(length: int = 12, use_uppercase: bool = True, use_lowercas
     password = ''.join(secrets.choice(characters) for _ in range(length))
     return password
 
-def encrypt_text(text: str, password: str) -> str:
-    """加密文本"""
-    salt = os.urandom(16)
-    key = generate_key_from_password(password, salt)
-    f = Fernet(key)
+# 文本密文：流式加密格式（文件头 + 认证数据块）外面只包一层 base64url，
+# 不再是 Fernet 令牌（本身已是base64）再整体 base64 一次
+STREAM_MAGIC_B64 = base64.urlsafe_b64encode(STREAM_MAGIC).decode('ascii')
+
+def _stream_header_length(data):
+    """根据已有数据计算流式文件头的总长度，数据不足以确定时返回None"""
+    fixed = len(STREAM_MAGIC) + 5
+    if len(data) < fixed + 1:
+        return None
+    kdf_len, = struct.unpack(">H", bytes(data[fixed - 2:fixed]))
+    salt_offset = fixed + kdf_len
+    if len(data) < salt_offset + 1:
+        return None
+    return salt_offset + 1 + data[salt_offset] + 4 + NONCE_PREFIX_SIZE
+
+class TextEncryptor:
+    """增量加密文本
     
-    encrypted_data = f.encrypt(text.encode('utf-8'))
-    # 返回base64编码的盐+加密数据
-    return base64.b64encode(salt + encrypted_data).decode('utf-8')
+    update(文本片段) 和 finalize() 返回 base64url 密文片段，依次拼接即为完整密文，
+    内存中只保留不足一块的明文和不足3字节的密文，可用于分段加密很大的文本。
+    """
+    def __init__(self, password: str, cipher: str = DEFAULT_CIPHER, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 kdf: str = None, kdf_params: dict = None):
+        if cipher not in CIPHERS:
+            raise ValueError(f"不支持的加密算法: {cipher}")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError("块大小无效")
+        salt = os.urandom(16)
+        kdf_id, kdf_params = resolve_kdf(kdf, kdf_params)
+        self.header = StreamHeader(cipher, kdf_id, kdf_params, salt, chunk_size, os.urandom(NONCE_PREFIX_SIZE))
+        self.aead = self.header.new_aead(derive_key_bytes(password, salt, kdf_id, kdf_params))
+        self.encoder = codecs.getincrementalencoder('utf-8')()
+        self.pending = bytearray()
+        self.carry = self.header.raw
+        self.index = 0
+        self.finished = False
+
+    def _seal(self, data, final):
+        sealed = self.aead.encrypt(self.header.chunk_nonce(self.index), data,
+                                   self.header.chunk_aad(self.index, final))
+        self.index += 1
+        return sealed
+
+    def _encode(self, data, final=False):
+        data = self.carry + data
+        cut = len(data) if final else len(data) - len(data) % 3
+        self.carry = data[cut:]
+        return base64.urlsafe_b64encode(data[:cut]).decode('ascii')
+
+    def update(self, text: str) -> str:
+        if self.finished:
+            raise ValueError("加密已结束")
+        self.pending += self.encoder.encode(text)
+        chunk_size = self.header.chunk_size
+        sealed = []
+        # 至少留下一部分明文：只有 finalize 时才能确定哪一块是最后一块
+        while len(self.pending) > chunk_size:
+            sealed.append(self._seal(bytes(self.pending[:chunk_size]), False))
+            del self.pending[:chunk_size]
+        return self._encode(b"".join(sealed))
+
+    def finalize(self) -> str:
+        if self.finished:
+            raise ValueError("加密已结束")
+        self.pending += self.encoder.encode("", final=True)
+        self.finished = True
+        sealed = self._seal(bytes(self.pending), True)
+        self.pending = bytearray()
+        return self._encode(sealed, final=True)
+
+class TextDecryptor:
+    """增量解密 TextEncryptor 生成的密文，片段可以在任意位置切分，空白字符会被忽略
+    
+    不是新格式的密文（旧版 Fernet 格式）会缓存到 finalize 时再整体解密。
+    """
+    def __init__(self, password: str):
+        self.password = password
+        self.text_carry = ""
+        self.buffer = bytearray()
+        self.header = None
+        self.aead = None
+        self.legacy = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.index = 0
+        self.finished = False
+
+    def _decode_base64(self, text):
+        try:
+            return base64.b64decode(text, altchars=b'-_', validate=True)
+        except ValueError:
+            raise ValueError("解密失败，密文格式错误")
+
+    def _open(self, data, final):
+        try:
+            plain = self.aead.decrypt(self.header.chunk_nonce(self.index), data,
+                                      self.header.chunk_aad(self.index, final))
+        except InvalidTag:
+            if self.index == 0:
+                raise ValueError("解密失败，密码可能不正确")
+            raise ValueError("解密失败，数据已损坏或被篡改")
+        self.index += 1
+        return self.decoder.decode(plain, final)
+
+    def _process(self, final=False):
+        if self.header is None:
+            header_length = _stream_header_length(self.buffer)
+            if header_length is None or len(self.buffer) < header_length:
+                if final:
+                    raise ValueError("解密失败，密文不完整")
+                return ""
+            self.header = read_stream_header(io.BytesIO(bytes(self.buffer[:header_length])))
+            del self.buffer[:header_length]
+            key = derive_key_bytes(self.password, self.header.salt, self.header.kdf_id, self.header.kdf_params)
+            self.aead = self.header.new_aead(key)
+        
+        sealed_size = self.header.chunk_size + AEAD_TAG_SIZE
+        output = []
+        while len(self.buffer) > sealed_size:
+            output.append(self._open(bytes(self.buffer[:sealed_size]), False))
+            del self.buffer[:sealed_size]
+        if final:
+            if len(self.buffer) < AEAD_TAG_SIZE:
+                raise ValueError("解密失败，密文不完整")
+            output.append(self._open(bytes(self.buffer), True))
+            self.buffer = bytearray()
+        return "".join(output)
+
+    def update(self, text: str) -> str:
+        if self.finished:
+            raise ValueError("解密已结束")
+        text = self.text_carry + "".join(text.split())
+        if self.legacy is None:
+            if len(text) < len(STREAM_MAGIC_B64):
+                self.text_carry = text
+                return ""
+            self.legacy = not text.startswith(STREAM_MAGIC_B64)
+        if self.legacy:
+            self.text_carry = text
+            return ""
+        cut = len(text) - len(text) % 4
+        self.text_carry = text[cut:]
+        self.buffer += self._decode_base64(text[:cut])
+        return self._process()
+
+    def finalize(self) -> str:
+        if self.finished:
+            raise ValueError("解密已结束")
+        self.finished = True
+        if self.legacy or self.legacy is None:
+            return _decrypt_text_legacy(self.text_carry, self.password)
+        if self.text_carry:
+            self.buffer += self._decode_base64(self.text_carry)
+            self.text_carry = ""
+        return self._process(final=True)
+
+def encrypt_text(text: str, password: str, cipher: str = DEFAULT_CIPHER, kdf: str = None,
+                 kdf_params: dict = None) -> str:
+    """加密文本，返回 base64url 编码的流式加密数据"""
+    encryptor = TextEncryptor(password, cipher, kdf=kdf, kdf_params=kdf_params)
+    return encryptor.update(text) + encryptor.finalize()
 
 def decrypt_text(encrypted_text: str, password: str) -> str:
-    """解密文本"""
+    """解密文本，同时支持新格式和旧版 Fernet 格式"""
+    decryptor = TextDecryptor(password)
+    return decryptor.update(encrypted_text) + decryptor.finalize()
+
+def _decrypt_text_legacy(encrypted_text, password):
+    """解密旧版文本格式：base64(16字节盐 + Fernet令牌)"""
     try:
         # 解码base64
         data = base64.b64decode(encrypted_text.encode('utf-8'))
@@ -150,4 +1391,4 @@ def decrypt_text(encrypted_text: str, password: str) -> str:
         decrypted_data = f.decrypt(encrypted_data)
         return decrypted_data.decode('utf-8')
     except:
-        raise ValueError("解密失败，密码可能不正确或数据已损坏")
\ No newline at end of file
+        raise ValueError("解密失败，密码可能不正确或数据已损坏")
@@ -4,14 +4,20 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QCheckBox, QSpinBox, QGroupBox, QGridLayout)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QIcon
-from utils import resource_path
+from utils import resource_path, get_data_dir
 import crypto_utils
+import hash_utils
+import benchmark_utils
 import os
+import threading
 
 class CryptoWorker(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
+    calibrated = pyqtSignal(str, dict)
+    item_result = pyqtSignal(str)
+    benchmarked = pyqtSignal(dict)
     
     def __init__(self, operation, **kwargs):
         super().__init__()
@@ -24,25 +30,131 @@ class CryptoWorker(QThread):
                 result = crypto_utils.encrypt_file(
                     self.kwargs['file_path'],
                     self.kwargs['password'],
-                    self.kwargs.get('output_path')
+                    self.kwargs.get('output_path'),
+                    cipher=self.kwargs.get('cipher', crypto_utils.DEFAULT_CIPHER),
+                    progress_callback=self.progress.emit,
+                    workers=self.kwargs.get('workers'),
+                    kdf=self.kwargs.get('kdf'),
+                    kdf_params=self.kwargs.get('kdf_params')
                 )
                 self.finished.emit(f"文件加密完成: {result}")
             elif self.operation == "decrypt_file":
                 result = crypto_utils.decrypt_file(
                     self.kwargs['file_path'],
                     self.kwargs['password'],
-                    self.kwargs.get('output_path')
+                    self.kwargs.get('output_path'),
+                    progress_callback=self.progress.emit,
+                    workers=self.kwargs.get('workers')
                 )
                 self.finished.emit(f"文件解密完成: {result}")
+            elif self.operation == "encrypt_batch":
+                result = crypto_utils.encrypt_files_batch(
+                    self.kwargs['file_paths'],
+                    self.kwargs['password'],
+                    output_dir=self.kwargs.get('output_dir'),
+                    base_dir=self.kwargs.get('base_dir'),
+                    cipher=self.kwargs.get('cipher', crypto_utils.DEFAULT_CIPHER),
+                    progress_callback=self.progress.emit,
+                    kdf=self.kwargs.get('kdf'),
+                    kdf_params=self.kwargs.get('kdf_params')
+                )
+                message = (f"批量加密完成: 成功 {len(result['succeeded'])} 个, 失败 {len(result['failed'])} 个, "
+                           f"耗时 {result['elapsed']:.1f} 秒")
+                if result['manifest_path']:
+                    message += f"\n校验清单: {result['manifest_path']}"
+                self.finished.emit(message + self.format_failures(result['failed']))
+            elif self.operation == "decrypt_batch":
+                result = crypto_utils.decrypt_files_batch(
+                    self.kwargs['file_paths'],
+                    self.kwargs['password'],
+                    output_dir=self.kwargs.get('output_dir'),
+                    base_dir=self.kwargs.get('base_dir'),
+                    progress_callback=self.progress.emit
+                )
+                message = (f"批量解密完成: 成功 {len(result['succeeded'])} 个, 失败 {len(result['failed'])} 个, "
+                           f"耗时 {result['elapsed']:.1f} 秒")
+                self.finished.emit(message + self.format_failures(result['failed']))
+            elif self.operation == "verify_manifest":
+                result = crypto_utils.verify_batch_manifest(
+                    self.kwargs['manifest_path'],
+                    self.kwargs.get('password')
+                )
+                message = f"校验完成: 通过 {len(result['ok'])} 个, 失败 {len(result['failed'])} 个"
+                self.finished.emit(message + self.format_failures(result['failed']))
+            elif self.operation == "calibrate_kdf":
+                params, elapsed = crypto_utils.calibrate_kdf(self.kwargs['kdf'], self.kwargs['target_ms'])
+                self.calibrated.emit(self.kwargs['kdf'], params)
+                self.finished.emit(f"{self.kwargs['kdf']} 校准完成: {params}，实测 {elapsed:.0f} 毫秒")
+            elif self.operation == "create_checksums":
+                result = crypto_utils.create_checksum_manifest(
+                    self.kwargs['directory'],
+                    algorithm=self.kwargs['algorithm'],
+                    hash_cache=self.kwargs.get('hash_cache'),
+                    progress_callback=self.progress.emit
+                )
+                message = (f"校验清单已生成: {result['manifest_path']}\n"
+                           f"文件 {result['file_count']} 个, {result['total_bytes'] / (1024 * 1024):.1f} MB, "
+                           f"耗时 {result['elapsed']:.1f} 秒, {result['throughput_mb_s']:.1f} MB/s")
+                self.finished.emit(message + self.format_failures(result['failed']))
+            elif self.operation == "verify_checksums":
+                # 失败的文件在校验过程中逐条显示
+                result = crypto_utils.verify_checksum_manifest(
+                    self.kwargs['manifest_path'],
+                    hash_cache=self.kwargs.get('hash_cache'),
+                    fail_fast=self.kwargs.get('fail_fast', False),
+                    progress_callback=self.progress.emit,
+                    result_callback=self.emit_checksum_failure
+                )
+                message = (f"校验完成: 通过 {len(result['ok'])} 个, 失败 {len(result['failed'])} 个, "
+                           f"共 {result['total']} 个")
+                if result['stopped_early']:
+                    message += f"（遇到失败已停止，校验了 {result['checked']} 个）"
+                message += f"\n{result['total_bytes'] / (1024 * 1024):.1f} MB, {result['throughput_mb_s']:.1f} MB/s"
+                self.finished.emit(message)
+            elif self.operation == "benchmark":
+                results = benchmark_utils.run_crypto_benchmarks(
+                    sections=self.kwargs['sections'],
+                    size_mb=self.kwargs['size_mb'],
+                    repeat=self.kwargs['repeat'],
+                    progress_callback=self.emit_benchmark_progress,
+                    cancel_event=self.kwargs['cancel_event']
+                )
+                self.benchmarked.emit(results)
+                self.finished.emit(f"性能测试完成，耗时 {results['elapsed']:.1f} 秒")
             elif self.operation == "calculate_hash":
-                result = crypto_utils.calculate_file_hash(
+                result = crypto_utils.calculate_file_hashes(
                     self.kwargs['file_path'],
-                    self.kwargs['algorithm']
+                    self.kwargs['algorithms'],
+                    hash_cache=self.kwargs.get('hash_cache'),
+                    progress_callback=self.progress.emit
                 )
-                self.finished.emit(result)
+                self.finished.emit("\n".join(f"{algorithm.upper()}: {digest}"
+                                              for algorithm, digest in result.items()))
+        except benchmark_utils.BenchmarkCancelled:
+            self.error.emit("性能测试已取消")
         except Exception as e:
             self.error.emit(str(e))
 
+    CHECKSUM_STATUS = {'mismatch': "校验值不一致", 'missing': "文件不存在", 'error': "无法读取"}
+
+    def emit_benchmark_progress(self, progress):
+        self.progress.emit(progress['done'] * 100 // max(progress['total'], 1))
+        if progress['case']:
+            self.item_result.emit(progress['case'])
+
+    def emit_checksum_failure(self, item):
+        if item['status'] != 'ok':
+            self.item_result.emit(f"{item['path']}: {self.CHECKSUM_STATUS[item['status']]}")
+
+    @staticmethod
+    def format_failures(failed, limit=10):
+        if not failed:
+            return ""
+        lines = [f"{path}: {error}" for path, error in failed[:limit]]
+        if len(failed) > limit:
+            lines.append(f"... 还有 {len(failed) - limit} 个")
+        return "\n\n" + "\n".join(lines)
+
 class CryptoWindow(QMainWindow):
     operation_successful = pyqtSignal()
     
@@ -79,6 +191,10 @@ class CryptoWindow(QMainWindow):
         self.password_tab = self.create_password_tab()
         self.tab_widget.addTab(self.password_tab, "密码生成器")
         
+        # 性能测试选项卡
+        self.benchmark_tab = self.create_benchmark_tab()
+        self.tab_widget.addTab(self.benchmark_tab, "性能测试")
+        
     def create_file_crypto_tab(self):
         widget = QWidget()
         layout = QVBoxLayout(widget)
@@ -109,6 +225,42 @@ class CryptoWindow(QMainWindow):
         self.file_password_input.setPlaceholderText("输入加密/解密密码...")
         password_layout.addWidget(self.file_password_input)
         
+        cipher_layout = QHBoxLayout()
+        cipher_layout.addWidget(QLabel("加密算法:"))
+        self.file_cipher_combo = QComboBox()
+        self.file_cipher_combo.addItem("AES-256-GCM", "aes-256-gcm")
+        self.file_cipher_combo.addItem("ChaCha20-Poly1305", "chacha20-poly1305")
+        cipher_layout.addWidget(self.file_cipher_combo)
+        cipher_layout.addWidget(QLabel("并行线程数:"))
+        self.file_workers_spin = QSpinBox()
+        self.file_workers_spin.setRange(0, 64)
+        self.file_workers_spin.setSpecialValueText("自动")
+        self.file_workers_spin.setValue(0)
+        cipher_layout.addWidget(self.file_workers_spin)
+        cipher_layout.addStretch()
+        password_layout.addLayout(cipher_layout)
+        
+        kdf_layout = QHBoxLayout()
+        kdf_layout.addWidget(QLabel("密钥派生:"))
+        self.kdf_combo = QComboBox()
+        self.kdf_combo.addItems(crypto_utils.get_available_kdfs())
+        self.kdf_combo.setCurrentText(crypto_utils.DEFAULT_KDF)
+        kdf_layout.addWidget(self.kdf_combo)
+        kdf_layout.addWidget(QLabel("目标耗时:"))
+        self.kdf_target_spin = QSpinBox()
+        self.kdf_target_spin.setRange(50, 5000)
+        self.kdf_target_spin.setSingleStep(50)
+        self.kdf_target_spin.setValue(500)
+        self.kdf_target_spin.setSuffix(" 毫秒")
+        kdf_layout.addWidget(self.kdf_target_spin)
+        calibrate_btn = QPushButton("按本机校准")
+        calibrate_btn.clicked.connect(self.calibrate_kdf)
+        kdf_layout.addWidget(calibrate_btn)
+        kdf_layout.addStretch()
+        password_layout.addLayout(kdf_layout)
+        # 本次会话中校准得到的参数，按KDF名称保存
+        self.calibrated_kdf_params = {}
+        
         layout.addWidget(password_group)
         
         # 操作按钮
@@ -122,6 +274,39 @@ class CryptoWindow(QMainWindow):
         btn_layout.addWidget(self.decrypt_file_btn)
         layout.addLayout(btn_layout)
         
+        # 批量加密解密
+        batch_group = QGroupBox("批量加密解密")
+        batch_layout = QGridLayout(batch_group)
+        
+        self.batch_source_label = QLabel("未选择文件")
+        select_batch_files_btn = QPushButton("选择多个文件")
+        select_batch_files_btn.clicked.connect(self.select_batch_files)
+        select_batch_dir_btn = QPushButton("选择文件夹")
+        select_batch_dir_btn.clicked.connect(self.select_batch_directory)
+        
+        self.batch_output_input = QLineEdit()
+        self.batch_output_input.setPlaceholderText("输出目录（留空则输出到原文件旁）")
+        select_batch_output_btn = QPushButton("选择输出目录")
+        select_batch_output_btn.clicked.connect(self.select_batch_output)
+        
+        batch_layout.addWidget(self.batch_source_label, 0, 0)
+        batch_layout.addWidget(select_batch_files_btn, 0, 1)
+        batch_layout.addWidget(select_batch_dir_btn, 0, 2)
+        batch_layout.addWidget(self.batch_output_input, 1, 0)
+        batch_layout.addWidget(select_batch_output_btn, 1, 1, 1, 2)
+        
+        batch_encrypt_btn = QPushButton("批量加密")
+        batch_encrypt_btn.clicked.connect(lambda: self.run_batch("encrypt_batch"))
+        batch_decrypt_btn = QPushButton("批量解密")
+        batch_decrypt_btn.clicked.connect(lambda: self.run_batch("decrypt_batch"))
+        verify_manifest_btn = QPushButton("校验清单")
+        verify_manifest_btn.clicked.connect(self.verify_manifest)
+        batch_layout.addWidget(batch_encrypt_btn, 2, 0)
+        batch_layout.addWidget(batch_decrypt_btn, 2, 1)
+        batch_layout.addWidget(verify_manifest_btn, 2, 2)
+        
+        layout.addWidget(batch_group)
+        
         # 进度条
         self.file_progress = QProgressBar()
         self.file_progress.setVisible(False)
@@ -210,15 +395,23 @@ class CryptoWindow(QMainWindow):
         algorithm_group = QGroupBox("哈希算法")
         algorithm_layout = QHBoxLayout(algorithm_group)
         
-        self.hash_algorithm = QComboBox()
-        self.hash_algorithm.addItems(["MD5", "SHA1", "SHA256", "SHA512"])
-        self.hash_algorithm.setCurrentText("MD5")
+        # 可同时勾选多个算法，文件只读取一遍
+        self.hash_algorithm_checks = {}
+        for algorithm in ["MD5", "SHA1", "SHA256", "SHA512"]:
+            check = QCheckBox(algorithm)
+            check.setChecked(algorithm == "MD5")
+            self.hash_algorithm_checks[algorithm] = check
         
         self.calculate_hash_btn = QPushButton("计算哈希")
         self.calculate_hash_btn.clicked.connect(self.calculate_hash)
         
+        self.use_hash_cache = QCheckBox("使用哈希缓存")
+        self.use_hash_cache.setChecked(True)
+        
         algorithm_layout.addWidget(QLabel("算法:"))
-        algorithm_layout.addWidget(self.hash_algorithm)
+        for check in self.hash_algorithm_checks.values():
+            algorithm_layout.addWidget(check)
+        algorithm_layout.addWidget(self.use_hash_cache)
         algorithm_layout.addWidget(self.calculate_hash_btn)
         algorithm_layout.addStretch()
         
@@ -236,6 +429,39 @@ class CryptoWindow(QMainWindow):
         
         layout.addWidget(result_group)
         
+        # 校验清单（与 sha256sum/md5sum 格式兼容）
+        checksum_group = QGroupBox("校验清单")
+        checksum_layout = QVBoxLayout(checksum_group)
+        
+        checksum_options = QHBoxLayout()
+        self.checksum_algorithm = QComboBox()
+        self.checksum_algorithm.addItems(["SHA256", "SHA512", "SHA1", "MD5"])
+        self.checksum_fail_fast = QCheckBox("遇到失败立即停止")
+        create_checksums_btn = QPushButton("为文件夹生成清单")
+        create_checksums_btn.clicked.connect(self.create_checksums)
+        verify_checksums_btn = QPushButton("校验清单文件")
+        verify_checksums_btn.clicked.connect(self.verify_checksums)
+        checksum_options.addWidget(QLabel("算法:"))
+        checksum_options.addWidget(self.checksum_algorithm)
+        checksum_options.addWidget(self.checksum_fail_fast)
+        checksum_options.addWidget(create_checksums_btn)
+        checksum_options.addWidget(verify_checksums_btn)
+        checksum_options.addStretch()
+        checksum_layout.addLayout(checksum_options)
+        
+        self.checksum_progress = QProgressBar()
+        self.checksum_progress.setRange(0, 100)
+        self.checksum_progress.setVisible(False)
+        checksum_layout.addWidget(self.checksum_progress)
+        
+        self.checksum_output = QTextEdit()
+        self.checksum_output.setReadOnly(True)
+        self.checksum_output.setPlaceholderText("校验结果将显示在这里...")
+        self.checksum_output.setMaximumHeight(150)
+        checksum_layout.addWidget(self.checksum_output)
+        
+        layout.addWidget(checksum_group)
+        
         layout.addStretch()
         return widget
     
@@ -271,6 +497,16 @@ class CryptoWindow(QMainWindow):
         self.use_symbols.setChecked(True)
         settings_layout.addWidget(self.use_symbols, 4, 0, 1, 2)
         
+        self.require_each_class = QCheckBox("每类已选字符至少出现一次")
+        self.require_each_class.setChecked(True)
+        settings_layout.addWidget(self.require_each_class, 5, 0, 1, 2)
+        
+        settings_layout.addWidget(QLabel("生成数量:"), 6, 0)
+        self.password_count = QSpinBox()
+        self.password_count.setRange(1, 100000)
+        self.password_count.setValue(1)
+        settings_layout.addWidget(self.password_count, 6, 1)
+        
         layout.addWidget(settings_group)
         
         # 生成按钮
@@ -278,6 +514,11 @@ class CryptoWindow(QMainWindow):
         self.generate_password_btn = QPushButton("生成密码")
         self.generate_password_btn.clicked.connect(self.generate_password)
         generate_layout.addWidget(self.generate_password_btn)
+        self.export_passwords_btn = QPushButton("导出CSV/JSON")
+        self.export_passwords_btn.clicked.connect(self.export_passwords)
+        generate_layout.addWidget(self.export_passwords_btn)
+        self.password_entropy_label = QLabel("")
+        generate_layout.addWidget(self.password_entropy_label)
         generate_layout.addStretch()
         layout.addLayout(generate_layout)
         
@@ -294,11 +535,153 @@ class CryptoWindow(QMainWindow):
         
         return widget
     
+    def create_benchmark_tab(self):
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        
+        settings_group = QGroupBox("测试设置")
+        settings_layout = QGridLayout(settings_group)
+        
+        self.benchmark_sections = {
+            'kdf': QCheckBox("密钥派生延迟"),
+            'hash': QCheckBox("哈希吞吐量"),
+            'cipher': QCheckBox("加解密吞吐量")
+        }
+        for column, check in enumerate(self.benchmark_sections.values()):
+            check.setChecked(True)
+            settings_layout.addWidget(check, 0, column)
+        
+        settings_layout.addWidget(QLabel("测试数据大小 (MB):"), 1, 0)
+        self.benchmark_size_spin = QSpinBox()
+        self.benchmark_size_spin.setRange(8, 1024)
+        self.benchmark_size_spin.setValue(64)
+        settings_layout.addWidget(self.benchmark_size_spin, 1, 1)
+        
+        settings_layout.addWidget(QLabel("重复次数:"), 2, 0)
+        self.benchmark_repeat_spin = QSpinBox()
+        self.benchmark_repeat_spin.setRange(1, 20)
+        self.benchmark_repeat_spin.setValue(3)
+        settings_layout.addWidget(self.benchmark_repeat_spin, 2, 1)
+        
+        layout.addWidget(settings_group)
+        
+        btn_layout = QHBoxLayout()
+        self.run_benchmark_btn = QPushButton("开始测试")
+        self.run_benchmark_btn.clicked.connect(self.run_benchmark)
+        self.cancel_benchmark_btn = QPushButton("取消")
+        self.cancel_benchmark_btn.setEnabled(False)
+        self.cancel_benchmark_btn.clicked.connect(self.cancel_benchmark)
+        self.save_benchmark_btn = QPushButton("保存JSON")
+        self.save_benchmark_btn.setEnabled(False)
+        self.save_benchmark_btn.clicked.connect(self.save_benchmark)
+        btn_layout.addWidget(self.run_benchmark_btn)
+        btn_layout.addWidget(self.cancel_benchmark_btn)
+        btn_layout.addWidget(self.save_benchmark_btn)
+        btn_layout.addStretch()
+        layout.addLayout(btn_layout)
+        
+        self.benchmark_progress = QProgressBar()
+        self.benchmark_progress.setRange(0, 100)
+        self.benchmark_progress.setVisible(False)
+        layout.addWidget(self.benchmark_progress)
+        
+        self.benchmark_status = QLabel("")
+        layout.addWidget(self.benchmark_status)
+        
+        self.benchmark_output = QTextEdit()
+        self.benchmark_output.setReadOnly(True)
+        self.benchmark_output.setPlaceholderText("测试结果将显示在这里...")
+        layout.addWidget(self.benchmark_output)
+        
+        self.benchmark_results = None
+        self.benchmark_worker = None
+        return widget
+    
     def select_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "选择文件", "", "所有文件 (*)")
         if file_path:
             self.file_path_input.setText(file_path)
     
+    def select_batch_files(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", "所有文件 (*)")
+        if file_paths:
+            self.batch_files = file_paths
+            self.batch_base_dir = None
+            self.batch_source_label.setText(f"已选择 {len(file_paths)} 个文件")
+    
+    def select_batch_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择文件夹")
+        if directory:
+            self.batch_files = [os.path.join(root, name)
+                                for root, _, files in os.walk(directory) for name in files]
+            self.batch_base_dir = directory
+            self.batch_source_label.setText(f"{directory}（{len(self.batch_files)} 个文件）")
+    
+    def select_batch_output(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择输出目录")
+        if directory:
+            self.batch_output_input.setText(directory)
+    
+    def run_batch(self, operation):
+        password = self.file_password_input.text()
+        if not getattr(self, 'batch_files', None):
+            QMessageBox.warning(self, "警告", "请先选择要处理的文件")
+            return
+        if not password:
+            QMessageBox.warning(self, "警告", "请输入密码")
+            return
+        
+        file_paths = self.batch_files
+        if operation == "decrypt_batch":
+            file_paths = [path for path in file_paths if path.endswith('.encrypted')]
+            if not file_paths:
+                QMessageBox.warning(self, "警告", "所选文件中没有 .encrypted 文件")
+                return
+        
+        self.file_progress.setVisible(True)
+        self.file_progress.setRange(0, 100)
+        self.file_progress.setValue(0)
+        
+        kdf = self.kdf_combo.currentText()
+        self.crypto_worker = CryptoWorker(operation, file_paths=file_paths, password=password,
+                                          output_dir=self.batch_output_input.text().strip() or None,
+                                          base_dir=self.batch_base_dir,
+                                          cipher=self.file_cipher_combo.currentData(),
+                                          kdf=kdf, kdf_params=self.calibrated_kdf_params.get(kdf))
+        self.crypto_worker.progress.connect(self.file_progress.setValue)
+        self.crypto_worker.finished.connect(self.on_crypto_finished)
+        self.crypto_worker.error.connect(self.on_crypto_error)
+        self.crypto_worker.start()
+    
+    def calibrate_kdf(self):
+        self.file_progress.setVisible(True)
+        self.file_progress.setRange(0, 0)
+        
+        self.crypto_worker = CryptoWorker("calibrate_kdf", kdf=self.kdf_combo.currentText(),
+                                          target_ms=self.kdf_target_spin.value())
+        self.crypto_worker.calibrated.connect(self.on_kdf_calibrated)
+        self.crypto_worker.finished.connect(self.on_crypto_finished)
+        self.crypto_worker.error.connect(self.on_crypto_error)
+        self.crypto_worker.start()
+    
+    def on_kdf_calibrated(self, kdf, params):
+        self.calibrated_kdf_params[kdf] = params
+    
+    def verify_manifest(self):
+        manifest_path, _ = QFileDialog.getOpenFileName(self, "选择校验清单", "", "校验清单 (*.json)")
+        if not manifest_path:
+            return
+        
+        self.file_progress.setVisible(True)
+        self.file_progress.setRange(0, 0)
+        
+        # 输入了密码时同时校验解密后的明文
+        self.crypto_worker = CryptoWorker("verify_manifest", manifest_path=manifest_path,
+                                          password=self.file_password_input.text() or None)
+        self.crypto_worker.finished.connect(self.on_crypto_finished)
+        self.crypto_worker.error.connect(self.on_crypto_error)
+        self.crypto_worker.start()
+    
     def select_hash_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "选择文件", "", "所有文件 (*)")
         if file_path:
@@ -317,9 +700,15 @@ class CryptoWindow(QMainWindow):
             return
         
         self.file_progress.setVisible(True)
-        self.file_progress.setRange(0, 0)
-        
-        self.crypto_worker = CryptoWorker("encrypt_file", file_path=file_path, password=password)
+        self.file_progress.setRange(0, 100)
+        self.file_progress.setValue(0)
+        
+        kdf = self.kdf_combo.currentText()
+        self.crypto_worker = CryptoWorker("encrypt_file", file_path=file_path, password=password,
+                                          cipher=self.file_cipher_combo.currentData(),
+                                          workers=self.file_workers_spin.value() or None,
+                                          kdf=kdf, kdf_params=self.calibrated_kdf_params.get(kdf))
+        self.crypto_worker.progress.connect(self.file_progress.setValue)
         self.crypto_worker.finished.connect(self.on_crypto_finished)
         self.crypto_worker.error.connect(self.on_crypto_error)
         self.crypto_worker.start()
@@ -337,9 +726,12 @@ class CryptoWindow(QMainWindow):
             return
         
         self.file_progress.setVisible(True)
-        self.file_progress.setRange(0, 0)
+        self.file_progress.setRange(0, 100)
+        self.file_progress.setValue(0)
         
-        self.crypto_worker = CryptoWorker("decrypt_file", file_path=file_path, password=password)
+        self.crypto_worker = CryptoWorker("decrypt_file", file_path=file_path, password=password,
+                                          workers=self.file_workers_spin.value() or None)
+        self.crypto_worker.progress.connect(self.file_progress.setValue)
         self.crypto_worker.finished.connect(self.on_crypto_finished)
         self.crypto_worker.error.connect(self.on_crypto_error)
         self.crypto_worker.start()
@@ -385,17 +777,23 @@ class CryptoWindow(QMainWindow):
     def calculate_hash(self):
         file_path = self.hash_file_path.text()
         text = self.hash_text_input.toPlainText()
-        algorithm = self.hash_algorithm.currentText()
+        algorithms = [name for name, check in self.hash_algorithm_checks.items() if check.isChecked()]
+        if not algorithms:
+            QMessageBox.warning(self, "警告", "请至少选择一种哈希算法")
+            return
         
         if file_path and os.path.exists(file_path):
-            self.crypto_worker = CryptoWorker("calculate_hash", file_path=file_path, algorithm=algorithm)
+            hash_cache = hash_utils.get_default_hash_cache() if self.use_hash_cache.isChecked() else None
+            self.crypto_worker = CryptoWorker("calculate_hash", file_path=file_path, algorithms=algorithms,
+                                              hash_cache=hash_cache)
             self.crypto_worker.finished.connect(self.on_hash_finished)
             self.crypto_worker.error.connect(self.on_crypto_error)
             self.crypto_worker.start()
         elif text:
             try:
-                hash_value = crypto_utils.calculate_text_hash(text, algorithm)
-                self.hash_result.setPlainText(f"{algorithm}: {hash_value}")
+                lines = [f"{algorithm}: {crypto_utils.calculate_text_hash(text, algorithm)}"
+                         for algorithm in algorithms]
+                self.hash_result.setPlainText("\n".join(lines))
                 self.operation_successful.emit()
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"计算哈希失败: {str(e)}")
@@ -410,29 +808,152 @@ class CryptoWindow(QMainWindow):
         use_symbols = self.use_symbols.isChecked()
         
         try:
-            password = crypto_utils.generate_password(
-                length, use_uppercase, use_lowercase, use_digits, use_symbols
+            passwords, entropy = crypto_utils.generate_passwords(
+                self.password_count.value(), length, use_uppercase, use_lowercase, use_digits, use_symbols,
+                min_per_class=1 if self.require_each_class.isChecked() else 0
             )
-            current_text = self.generated_passwords.toPlainText()
-            if current_text:
-                new_text = current_text + "\n" + password
+            self.last_generated_passwords = (passwords, entropy)
+            self.password_entropy_label.setText(f"每个密码约 {entropy:.1f} 比特熵")
+            if len(passwords) > 1:
+                # 批量生成时只显示本批结果
+                self.generated_passwords.setPlainText("\n".join(passwords))
             else:
-                new_text = password
-            self.generated_passwords.setPlainText(new_text)
+                current_text = self.generated_passwords.toPlainText()
+                if current_text:
+                    new_text = current_text + "\n" + passwords[0]
+                else:
+                    new_text = passwords[0]
+                self.generated_passwords.setPlainText(new_text)
             self.operation_successful.emit()
         except Exception as e:
             QMessageBox.critical(self, "错误", f"生成密码失败: {str(e)}")
     
+    def export_passwords(self):
+        if not getattr(self, 'last_generated_passwords', None):
+            QMessageBox.warning(self, "警告", "请先生成密码")
+            return
+        output_path, _ = QFileDialog.getSaveFileName(self, "导出密码", "passwords.csv",
+                                                     "CSV 文件 (*.csv);;JSON 文件 (*.json)")
+        if not output_path:
+            return
+        passwords, entropy = self.last_generated_passwords
+        try:
+            crypto_utils.export_secrets(passwords, output_path, entropy)
+            QMessageBox.information(self, "完成", f"已导出 {len(passwords)} 个密码: {output_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+    
     def on_crypto_finished(self, result):
         self.file_progress.setVisible(False)
         QMessageBox.information(self, "完成", result)
         self.operation_successful.emit()
     
     def on_hash_finished(self, result):
-        algorithm = self.hash_algorithm.currentText()
-        self.hash_result.setPlainText(f"{algorithm}: {result}")
+        self.hash_result.setPlainText(result)
+        self.operation_successful.emit()
+    
+    def create_checksums(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择要生成校验清单的文件夹")
+        if directory:
+            self.start_checksum_worker("create_checksums", directory=directory,
+                                       algorithm=self.checksum_algorithm.currentText().lower())
+    
+    def verify_checksums(self):
+        manifest_path, _ = QFileDialog.getOpenFileName(self, "选择校验清单", "",
+                                                       "校验清单 (*SUMS *.sha256 *.md5 *.txt);;所有文件 (*)")
+        if manifest_path:
+            self.start_checksum_worker("verify_checksums", manifest_path=manifest_path,
+                                       fail_fast=self.checksum_fail_fast.isChecked())
+    
+    def start_checksum_worker(self, operation, **kwargs):
+        self.checksum_output.clear()
+        self.checksum_progress.setValue(0)
+        self.checksum_progress.setVisible(True)
+        hash_cache = hash_utils.get_default_hash_cache() if self.use_hash_cache.isChecked() else None
+        self.crypto_worker = CryptoWorker(operation, hash_cache=hash_cache, **kwargs)
+        self.crypto_worker.progress.connect(self.checksum_progress.setValue)
+        self.crypto_worker.item_result.connect(self.checksum_output.append)
+        self.crypto_worker.finished.connect(self.on_checksum_finished)
+        self.crypto_worker.error.connect(self.on_checksum_error)
+        self.crypto_worker.start()
+    
+    def on_checksum_finished(self, result):
+        self.checksum_progress.setVisible(False)
+        self.checksum_output.append(result)
         self.operation_successful.emit()
     
+    def on_checksum_error(self, error):
+        self.checksum_progress.setVisible(False)
+        QMessageBox.critical(self, "错误", error)
+    
+    def run_benchmark(self):
+        sections = [name for name, check in self.benchmark_sections.items() if check.isChecked()]
+        if not sections:
+            QMessageBox.warning(self, "警告", "请至少选择一项测试")
+            return
+        
+        self.benchmark_output.clear()
+        self.benchmark_progress.setValue(0)
+        self.benchmark_progress.setVisible(True)
+        self.run_benchmark_btn.setEnabled(False)
+        self.cancel_benchmark_btn.setEnabled(True)
+        
+        self.benchmark_worker = CryptoWorker("benchmark", sections=sections,
+                                             size_mb=self.benchmark_size_spin.value(),
+                                             repeat=self.benchmark_repeat_spin.value(),
+                                             cancel_event=threading.Event())
+        self.benchmark_worker.progress.connect(self.benchmark_progress.setValue)
+        self.benchmark_worker.item_result.connect(lambda case: self.benchmark_status.setText(f"正在测试: {case}"))
+        self.benchmark_worker.benchmarked.connect(self.on_benchmark_results)
+        self.benchmark_worker.finished.connect(self.on_benchmark_finished)
+        self.benchmark_worker.error.connect(self.on_benchmark_error)
+        self.benchmark_worker.start()
+    
+    def cancel_benchmark(self):
+        if self.benchmark_worker is not None:
+            self.benchmark_worker.kwargs['cancel_event'].set()
+            self.benchmark_status.setText("正在取消，当前测试项结束后停止...")
+    
+    def on_benchmark_results(self, results):
+        self.benchmark_results = results
+        self.benchmark_output.setPlainText(benchmark_utils.format_benchmark_results(results))
+        self.save_benchmark_btn.setEnabled(True)
+    
+    def on_benchmark_finished(self, message):
+        self.benchmark_progress.setVisible(False)
+        self.run_benchmark_btn.setEnabled(True)
+        self.cancel_benchmark_btn.setEnabled(False)
+        self.benchmark_status.setText(message)
+        self.operation_successful.emit()
+    
+    def on_benchmark_error(self, error):
+        self.benchmark_progress.setVisible(False)
+        self.run_benchmark_btn.setEnabled(True)
+        self.cancel_benchmark_btn.setEnabled(False)
+        self.benchmark_status.setText(error)
+    
+    def save_benchmark(self):
+        if not self.benchmark_results:
+            return
+        default_path = os.path.join(get_data_dir(), benchmark_utils.BENCHMARK_DIR_NAME)
+        os.makedirs(default_path, exist_ok=True)
+        output_path, _ = QFileDialog.getSaveFileName(
+            self, "保存测试结果",
+            os.path.join(default_path, f"crypto_benchmark_{self.benchmark_results['created_at'][:10]}.json"),
+            "JSON 文件 (*.json)")
+        if output_path:
+            try:
+                benchmark_utils.save_benchmark_results(self.benchmark_results, output_path)
+                self.benchmark_status.setText(f"结果已保存: {output_path}")
+            except OSError as e:
+                QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
+    
+    def closeEvent(self, event):
+        if self.benchmark_worker is not None and self.benchmark_worker.isRunning():
+            self.benchmark_worker.kwargs['cancel_event'].set()
+            self.benchmark_worker.wait()
+        super().closeEvent(event)
+    
     def on_crypto_error(self, error):
         self.file_progress.setVisible(False)
         QMessageBox.critical(self, "错误", error)
\ No newline at end of file
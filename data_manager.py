@@ -1,7 +1,7 @@
 import json
 import os
-import sys
 from typing import Dict, Any
+from utils import get_data_dir
 
 class DataManager:
     """数据持久化管理器，负责工具使用次数的存储和读取"""
@@ -34,12 +34,7 @@ class DataManager:
     
     def _get_data_dir(self) -> str:
         """获取data目录路径，位于exe同级目录"""
-        if getattr(sys, 'frozen', False):
-            # 打包后的exe环境
-            return os.path.join(os.path.dirname(sys.executable), "data")
-        else:
-            # 开发环境
-            return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+        return get_data_dir()
     
     def _ensure_data_dir(self):
         """确保data目录存在"""
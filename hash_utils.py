@@ -0,0 +1,446 @@
+import os
+import time
+import sqlite3
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import get_data_dir
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+MIN_BUFFER_SIZE = 1024 * 1024
+MAX_BUFFER_SIZE = 8 * 1024 * 1024
+
+# 机械硬盘上并发读取会导致磁头来回寻道，每个设备只允许一个读取线程
+ROTATIONAL_DEVICE_CONCURRENCY = 1
+DEFAULT_DEVICE_CONCURRENCY = 4
+
+_HASHLIB_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'sha512': hashlib.sha512,
+    'blake2b': hashlib.blake2b,
+}
+
+def get_available_algorithms():
+    """可用的哈希算法，xxhash系列需要安装xxhash"""
+    algorithms = list(_HASHLIB_ALGORITHMS)
+    if xxhash is not None:
+        algorithms += ['xxh64', 'xxh3_64', 'xxh3_128']
+    return algorithms
+
+def new_hasher(algorithm='md5'):
+    """创建哈希对象"""
+    algorithm = algorithm.lower()
+    if algorithm in _HASHLIB_ALGORITHMS:
+        return _HASHLIB_ALGORITHMS[algorithm]()
+    if xxhash is not None and algorithm in ('xxh64', 'xxh3_64', 'xxh3_128'):
+        return getattr(xxhash, algorithm)()
+    if algorithm.startswith('xx'):
+        raise ValueError(f"哈希算法 {algorithm} 需要安装 xxhash")
+    raise ValueError(f"不支持的哈希算法: {algorithm}")
+
+def _clamp_buffer_size(buffer_size):
+    return max(MIN_BUFFER_SIZE, min(MAX_BUFFER_SIZE, buffer_size))
+
+def hash_file(file_path, algorithm='md5', buffer_size=DEFAULT_BUFFER_SIZE, buffer=None):
+    """用 readinto 读入复用的缓冲区计算文件哈希，hashlib在计算大块数据时会释放GIL"""
+    hasher = new_hasher(algorithm)
+    if buffer is None:
+        buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+# 多个算法同时计算时，文件超过此大小才为每个算法启动独立线程
+MULTI_HASH_THREAD_THRESHOLD = 8 * 1024 * 1024
+MULTI_HASH_BUFFERS = 4
+
+def _hash_file_multi_threaded(f, hashers, buffer_size, progress_callback=None):
+    """读取线程轮流填充若干缓冲区，每个算法一个线程按顺序消费，全部算法用完后缓冲区才被复用"""
+    buffers = [bytearray(buffer_size) for _ in range(MULTI_HASH_BUFFERS)]
+    views = [memoryview(buffer) for buffer in buffers]
+    free_slots = threading.Semaphore(MULTI_HASH_BUFFERS)
+    remaining = [0] * MULTI_HASH_BUFFERS
+    remaining_lock = threading.Lock()
+    queues = [queue.Queue() for _ in hashers]
+    errors = []
+
+    def consume(hasher, q):
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            slot, n = item
+            try:
+                hasher.update(views[slot][:n])
+            except Exception as e:
+                errors.append(e)
+            with remaining_lock:
+                remaining[slot] -= 1
+                if remaining[slot] == 0:
+                    free_slots.release()
+
+    threads = [threading.Thread(target=consume, args=(hasher, q), daemon=True)
+               for hasher, q in zip(hashers, queues)]
+    for thread in threads:
+        thread.start()
+    try:
+        slot = 0
+        while True:
+            free_slots.acquire()
+            n = f.readinto(buffers[slot])
+            if not n:
+                free_slots.release()
+                break
+            remaining[slot] = len(hashers)
+            for q in queues:
+                q.put((slot, n))
+            if progress_callback:
+                progress_callback(n)
+            slot = (slot + 1) % MULTI_HASH_BUFFERS
+    finally:
+        for q in queues:
+            q.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+def hash_file_multi(file_path, algorithms, buffer_size=DEFAULT_BUFFER_SIZE, threaded=None,
+                    progress_callback=None):
+    """只读取一遍文件，同时计算多个算法的哈希，返回 {算法: 哈希值}
+
+    大文件上每个算法在独立线程中更新（hashlib处理大块数据时释放GIL），
+    总耗时接近最慢的单个算法；threaded 为None时按文件大小自动选择。
+    progress_callback(读取字节数) 在每读入一块后调用。
+    """
+    algorithms = list(dict.fromkeys(algorithm.lower() for algorithm in algorithms))
+    if not algorithms:
+        raise ValueError("至少选择一种哈希算法")
+    hashers = [new_hasher(algorithm) for algorithm in algorithms]
+    buffer_size = _clamp_buffer_size(buffer_size)
+
+    with open(file_path, 'rb', buffering=0) as f:
+        if threaded is None:
+            threaded = len(hashers) > 1 and os.fstat(f.fileno()).st_size >= MULTI_HASH_THREAD_THRESHOLD
+        if threaded and len(hashers) > 1:
+            _hash_file_multi_threaded(f, hashers, buffer_size, progress_callback)
+        else:
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                chunk = view[:n]
+                for hasher in hashers:
+                    hasher.update(chunk)
+                if progress_callback:
+                    progress_callback(n)
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in zip(algorithms, hashers)}
+
+def hash_file_multi_cached(file_path, algorithms, cache=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                           progress_callback=None):
+    """多算法哈希，缓存中已有的算法不再计算，其余算法仍然只读取一遍文件"""
+    if cache is None:
+        return hash_file_multi(file_path, algorithms, buffer_size, progress_callback=progress_callback)
+    algorithms = list(dict.fromkeys(algorithm.lower() for algorithm in algorithms))
+    st = os.stat(file_path)
+    digests = {}
+    missing = []
+    for algorithm in algorithms:
+        digest = cache.get(st, algorithm)
+        if digest is None:
+            missing.append(algorithm)
+        else:
+            digests[algorithm] = digest
+    if missing:
+        computed = hash_file_multi(file_path, missing, buffer_size, progress_callback=progress_callback)
+        for algorithm, digest in computed.items():
+            cache.put(st, algorithm, digest)
+        digests.update(computed)
+    return {algorithm: digests[algorithm] for algorithm in algorithms}
+
+_rotational_cache = {}
+_rotational_lock = threading.Lock()
+
+def is_rotational_device(dev):
+    """判断st_dev对应的设备是否为机械硬盘，无法判断时返回False（目前仅支持Linux）"""
+    with _rotational_lock:
+        if dev in _rotational_cache:
+            return _rotational_cache[dev]
+
+    rotational = False
+    try:
+        sys_path = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+        # 分区没有queue目录，需要查看其所属的磁盘
+        for queue_dir in (os.path.join(sys_path, "queue"), os.path.join(sys_path, "..", "queue")):
+            flag_path = os.path.join(queue_dir, "rotational")
+            if os.path.exists(flag_path):
+                with open(flag_path) as f:
+                    rotational = f.read().strip() == "1"
+                break
+    except (AttributeError, OSError, ValueError):
+        rotational = False
+
+    with _rotational_lock:
+        _rotational_cache[dev] = rotational
+    return rotational
+
+class HashCache:
+    """持久化的文件哈希缓存，SQLite保存在data目录
+
+    以 (设备, inode, 算法) 为键，命中时还要求大小和纳秒级修改时间一致，否则视为已变化。
+    按最近使用时间淘汰：超过max_age_days未使用或总条目超过max_entries时删除最旧的记录。
+    """
+
+    CACHE_VERSION = 1
+    CACHE_FILE = "hash_cache.db"
+
+    def __init__(self, db_path=None, max_entries=2000000, max_age_days=180):
+        self.db_path = db_path or os.path.join(get_data_dir(), self.CACHE_FILE)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.hits = 0
+        self.misses = 0
+        self._touched = []
+        self._pending_writes = 0
+        self._init_schema()
+        self.evict()
+
+    def _init_schema(self):
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.CACHE_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS hashes")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    dev INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    algorithm TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (dev, inode, algorithm)
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_hashes_last_used ON hashes(last_used)")
+            self.conn.execute(f"PRAGMA user_version={self.CACHE_VERSION}")
+            self.conn.commit()
+
+    def lookup(self, dev, inode, size, mtime_ns, algorithm):
+        """按文件标识查询缓存的哈希值，未命中返回None"""
+        # 部分平台/文件系统拿不到inode，此时无法安全地识别文件
+        if not inode:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT digest FROM hashes WHERE dev = ? AND inode = ? AND algorithm = ? "
+                "AND size = ? AND mtime_ns = ?",
+                (dev, inode, algorithm, size, mtime_ns)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched.append((time.time(), dev, inode, algorithm))
+            if len(self._touched) >= 1000:
+                self.flush()
+            return row[0]
+
+    def store(self, dev, inode, size, mtime_ns, algorithm, digest):
+        """写入哈希值"""
+        if not inode or not digest:
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (dev, inode, algorithm, size, mtime_ns, digest, time.time())
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= 1000:
+                self.flush()
+
+    def get(self, st, algorithm):
+        """按os.stat结果查询"""
+        return self.lookup(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm)
+
+    def put(self, st, algorithm, digest):
+        """按os.stat结果写入"""
+        self.store(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm, digest)
+
+    def get_entry(self, entry, algorithm):
+        """按扫描得到的FileEntry查询，无需再次stat"""
+        return self.lookup(entry.dev, entry.inode, entry.size, entry.mtime_ns, algorithm)
+
+    def flush(self):
+        """批量写回最近使用时间并提交"""
+        with self.lock:
+            if self._touched:
+                self.conn.executemany(
+                    "UPDATE hashes SET last_used = ? WHERE dev = ? AND inode = ? AND algorithm = ?",
+                    self._touched
+                )
+                self._touched = []
+            self._pending_writes = 0
+            self.conn.commit()
+
+    def evict(self):
+        """按时间和条目数淘汰旧记录"""
+        with self.lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                self.conn.execute("DELETE FROM hashes WHERE last_used < ?", (cutoff,))
+            if self.max_entries:
+                count = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+                if count > self.max_entries:
+                    self.conn.execute(
+                        "DELETE FROM hashes WHERE rowid IN "
+                        "(SELECT rowid FROM hashes ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM hashes")
+            self.conn.commit()
+
+    def get_stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_hash_cache():
+    """系统工具和加密工具共用的哈希缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HashCache()
+        return _default_cache
+
+def hash_file_cached(file_path, algorithm='md5', cache=None, buffer_size=DEFAULT_BUFFER_SIZE, buffer=None):
+    """先查缓存再计算文件哈希，计算结果写回缓存"""
+    if cache is None:
+        return hash_file(file_path, algorithm, buffer_size, buffer)
+    st = os.stat(file_path)
+    digest = cache.get(st, algorithm)
+    if digest is None:
+        digest = hash_file(file_path, algorithm, buffer_size, buffer)
+        cache.put(st, algorithm, digest)
+    return digest
+
+class HashPool:
+    """多线程哈希服务
+
+    - 线程池并行计算，每个线程复用自己的读缓冲区；
+    - 按设备限制并发：机械硬盘每个设备只有一个线程在读，SSD/网络盘允许多个；
+    - 传入HashCache时先查缓存，未变化的文件不再读取。
+    """
+    def __init__(self, algorithm='md5', max_workers=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 device_concurrency=None, cache=None):
+        new_hasher(algorithm)  # 提前检查算法是否可用
+        self.algorithm = algorithm
+        self.cache = cache
+        self.max_workers = max_workers or min(16, (os.cpu_count() or 1) * 2)
+        self.buffer_size = _clamp_buffer_size(buffer_size)
+        self.device_concurrency = device_concurrency
+        self._local = threading.local()
+        self._device_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _get_buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = bytearray(self.buffer_size)
+            self._local.buffer = buffer
+        return buffer
+
+    def _device_semaphore(self, path=None, dev=None):
+        if dev is None:
+            try:
+                dev = os.stat(path).st_dev
+            except OSError:
+                dev = None
+        with self._lock:
+            semaphore = self._device_semaphores.get(dev)
+            if semaphore is None:
+                if self.device_concurrency:
+                    limit = self.device_concurrency
+                elif dev is not None and is_rotational_device(dev):
+                    limit = ROTATIONAL_DEVICE_CONCURRENCY
+                else:
+                    limit = DEFAULT_DEVICE_CONCURRENCY
+                semaphore = threading.Semaphore(limit)
+                self._device_semaphores[dev] = semaphore
+        return semaphore
+
+    def hash_file(self, file_path):
+        """计算单个文件哈希（先查缓存），失败返回None"""
+        try:
+            st = os.stat(file_path)
+            if self.cache is not None:
+                digest = self.cache.get(st, self.algorithm)
+                if digest is not None:
+                    return digest
+            with self._device_semaphore(dev=st.st_dev):
+                digest = hash_file(file_path, self.algorithm, buffer=self._get_buffer())
+            if self.cache is not None:
+                self.cache.put(st, self.algorithm, digest)
+            return digest
+        except (OSError, ValueError):
+            return None
+
+    def run_io_task(self, file_path, func):
+        """在设备并发限制下执行一个读取文件的任务"""
+        with self._device_semaphore(file_path):
+            return func(file_path)
+
+    def map_files(self, func, paths):
+        """并行对每个文件执行func(path)（受设备并发限制），按完成顺序产出 (path, 结果)"""
+        paths = list(paths)
+        if not paths:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            futures = {executor.submit(self.run_io_task, path, func): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception:
+                    result = None
+                yield futures[future], result
+
+    def hash_files(self, paths):
+        """并行计算多个文件的哈希，按完成顺序产出 (path, 哈希值或None)"""
+        paths = list(paths)
+        if not paths:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            futures = {executor.submit(self.hash_file, path): path for path in paths}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
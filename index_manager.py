@@ -0,0 +1,335 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils import get_data_dir
+import scan_utils
+
+class FileIndexManager:
+    """文件元数据索引，SQLite持久化在data目录
+
+    首次扫描建立 路径/大小/修改时间/inode/扩展名 的索引。再次扫描时，目录的修改时间
+    未变化说明其中的条目没有增删，直接复用索引，只对子目录做一次stat；文件内容原地
+    修改不会改变目录修改时间，这部分由 monitor_directory 的事件通过 apply_events 更新。
+    目录的修改时间只在其整个子树都成功扫描后才记录，否则记为 INCOMPLETE_MTIME，下次扫描重新列举。
+    """
+
+    INDEX_VERSION = 2
+    INDEX_FILE = "file_index.db"
+    COMMIT_INTERVAL = 500  # 每处理多少个目录提交一次事务
+    INCOMPLETE_MTIME = -1  # 子树未完整扫描（取消、stat失败、列举出错）的目录，不会与任何修改时间相等
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir(), self.INDEX_FILE)
+        self.lock = threading.RLock()
+        # 监控事件在其他线程写入索引，统一由lock串行化
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.INDEX_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS files")
+                self.conn.execute("DROP TABLE IF EXISTS dirs")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT NOT NULL,
+                    ext TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    size_bucket INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    dev INTEGER NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS dirs (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    scanned_at REAL NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_parent ON files(parent)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_size ON files(size)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent)")
+            self.conn.execute(f"PRAGMA user_version={self.INDEX_VERSION}")
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def _normalize(path):
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _subtree_range(root):
+        """返回root子树内路径的主键范围 [low, high)，可以直接走主键索引"""
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    @staticmethod
+    def _file_row(entry, parent):
+        _, ext = os.path.splitext(entry.name)
+        return (entry.path, parent, ext.lower(), entry.size, scan_utils.size_bucket(entry.size),
+                entry.mtime_ns, entry.inode, entry.dev)
+
+    def _delete_subtree(self, path):
+        low, high = self._subtree_range(path)
+        self.conn.execute("DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    def _load_known_dirs(self, root):
+        low, high = self._subtree_range(root)
+        rows = self.conn.execute(
+            "SELECT path, parent, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (root, low, high)
+        ).fetchall()
+        mtimes = {}
+        children = defaultdict(list)
+        for path, parent, mtime_ns in rows:
+            mtimes[path] = mtime_ns
+            if path != root:
+                children[parent].append(path)
+        return mtimes, children
+
+    def refresh(self, root, progress_callback=None, max_workers=None, cancel_event=None,
+                progress_interval=0.5):
+        """增量扫描root，更新索引，返回扫描统计"""
+        root = self._normalize(root)
+        if not os.path.isdir(root):
+            raise ValueError("目录不存在")
+
+        with self.lock:
+            known_mtimes, known_children = self._load_known_dirs(root)
+
+        def visit(path):
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                return path, None, None
+            if known_mtimes.get(path) == mtime_ns:
+                return path, mtime_ns, None
+            return path, mtime_ns, scan_utils.scan_single_directory(path)
+
+        stats = {
+            'dirs_scanned': 0,
+            'dirs_skipped': 0,
+            'file_count': 0,
+            'total_size': 0,
+            'errors': 0,
+            'current': None
+        }
+        last_report = 0.0
+        processed = 0
+        # 已处理但子树尚未全部完成的目录: 路径 -> [剩余子目录数, 子树是否完整, 修改时间]
+        unfinished = {}
+
+        def finish(path):
+            # 子树全部完成后才写入真实修改时间，并逐级通知父目录
+            while True:
+                _, complete, mtime_ns = unfinished.pop(path)
+                self.conn.execute("UPDATE dirs SET mtime_ns = ? WHERE path = ?",
+                                  (mtime_ns if complete else self.INCOMPLETE_MTIME, path))
+                if path == root or not child_finished(os.path.dirname(path), complete):
+                    return
+                path = os.path.dirname(path)
+
+        def child_finished(parent, complete):
+            """返回父目录是否因此完成"""
+            state = unfinished.get(parent)
+            if state is None:
+                return False
+            state[0] -= 1
+            state[1] = state[1] and complete
+            return state[0] == 0
+
+        executor = ThreadPoolExecutor(max_workers=max_workers or scan_utils.default_scan_workers())
+        pending = {executor.submit(visit, root)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                with self.lock:
+                    for future in done:
+                        path, mtime_ns, listing = future.result()
+                        parent = os.path.dirname(path)
+
+                        if mtime_ns is None:
+                            # 目录已不存在或无法访问，父目录需要重新列举
+                            self._delete_subtree(path)
+                            if path != root and child_finished(parent, False):
+                                finish(parent)
+                            continue
+
+                        if listing is None:
+                            stats['dirs_skipped'] += 1
+                            sub_dirs = known_children.get(path, [])
+                            complete = True
+                        else:
+                            stats['dirs_scanned'] += 1
+                            if listing.error:
+                                stats['errors'] += 1
+                            sub_dirs = listing.dirs
+                            complete = not listing.error
+                            for gone in set(known_children.get(path, [])) - set(sub_dirs):
+                                self._delete_subtree(gone)
+                            self.conn.execute("DELETE FROM files WHERE parent = ?", (path,))
+                            self.conn.executemany(
+                                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                [self._file_row(entry, path) for entry in listing.files]
+                            )
+                            # 先以未完成状态写入，子树完成后由 finish 更新为真实修改时间
+                            self.conn.execute(
+                                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                                (path, parent, self.INCOMPLETE_MTIME, time.time())
+                            )
+                            stats['file_count'] += len(listing.files)
+                            stats['total_size'] += sum(entry.size for entry in listing.files)
+
+                        if cancel_event and cancel_event.is_set():
+                            # 子目录不再访问，该目录的子树不完整
+                            unfinished[path] = [0, complete and not sub_dirs, mtime_ns]
+                        else:
+                            for sub_dir in sub_dirs:
+                                pending.add(executor.submit(visit, sub_dir))
+                            unfinished[path] = [len(sub_dirs), complete, mtime_ns]
+                        if unfinished[path][0] == 0:
+                            finish(path)
+
+                        processed += 1
+                        if processed % self.COMMIT_INTERVAL == 0:
+                            self.conn.commit()
+
+                        now = time.monotonic()
+                        if progress_callback and now - last_report >= progress_interval:
+                            last_report = now
+                            stats['current'] = path
+                            progress_callback(dict(stats))
+
+                if cancel_event and cancel_event.is_set():
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            with self.lock:
+                # 取消或出错时仍未完成的目录，下次扫描重新列举
+                self.conn.executemany("UPDATE dirs SET mtime_ns = ? WHERE path = ?",
+                                      [(self.INCOMPLETE_MTIME, path) for path in unfinished])
+                self.conn.commit()
+
+        stats['current'] = None
+        if progress_callback:
+            progress_callback(dict(stats))
+        return stats
+
+    def is_indexed(self, root):
+        """root是否已建立索引"""
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM dirs WHERE path = ?", (self._normalize(root),)).fetchone()
+        return row is not None
+
+    def get_directory_summary(self, root):
+        """从索引统计目录大小、文件数和子目录数"""
+        root = self._normalize(root)
+        low, high = self._subtree_range(root)
+        with self.lock:
+            total_size, file_count = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM files WHERE path >= ? AND path < ?",
+                (low, high)
+            ).fetchone()
+            dir_count = self.conn.execute(
+                "SELECT COUNT(*) FROM dirs WHERE path >= ? AND path < ?", (low, high)
+            ).fetchone()[0]
+        return {'total_size': total_size, 'file_count': file_count, 'dir_count': dir_count}
+
+    def get_extension_stats(self, root):
+        """从索引按扩展名统计数量和大小"""
+        low, high = self._subtree_range(self._normalize(root))
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ext, COUNT(*), SUM(size) FROM files WHERE path >= ? AND path < ? GROUP BY ext",
+                (low, high)
+            ).fetchall()
+        return {ext: {'count': count, 'size': size} for ext, count, size in rows}
+
+    def get_size_histogram(self, root):
+        """从索引按扩展名统计对数刻度的大小分布"""
+        low, high = self._subtree_range(self._normalize(root))
+        histogram = scan_utils.SizeHistogram()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ext, size_bucket, COUNT(*) FROM files WHERE path >= ? AND path < ? "
+                "GROUP BY ext, size_bucket",
+                (low, high)
+            ).fetchall()
+        for ext, bucket, count in rows:
+            histogram.add_count(ext, bucket, count)
+        return histogram.to_dict()
+
+    def count_large_files(self, root, min_size=10 * 1024 * 1024):
+        """从索引统计超过阈值的文件数"""
+        low, high = self._subtree_range(self._normalize(root))
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM files WHERE size > ? AND path >= ? AND path < ?",
+                (min_size, low, high)
+            ).fetchone()[0]
+
+    def get_large_files(self, root, min_size=10 * 1024 * 1024, limit=None):
+        """从索引查询大文件，按大小降序"""
+        low, high = self._subtree_range(self._normalize(root))
+        sql = "SELECT path, size FROM files WHERE size > ? AND path >= ? AND path < ? ORDER BY size DESC"
+        params = [min_size, low, high]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{'path': path, 'size': size, 'size_mb': round(size / (1024 * 1024), 2)}
+                for path, size in rows]
+
+    def _index_file(self, path):
+        parent = os.path.dirname(path)
+        if not self.conn.execute("SELECT 1 FROM dirs WHERE path = ?", (parent,)).fetchone():
+            return  # 不在已索引的目录中
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            return
+        entry = scan_utils.FileEntry(path, os.path.basename(path), st.st_size,
+                                     st.st_mtime_ns, st.st_ino, st.st_dev)
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          self._file_row(entry, parent))
+
+    def apply_events(self, events):
+        """应用 FileEventPipeline 合并后的原始事件，保持索引与磁盘同步"""
+        with self.lock:
+            for event in events:
+                src = self._normalize(event['src'])
+                if event['type'] == 'deleted':
+                    self.conn.execute("DELETE FROM files WHERE path = ?", (src,))
+                elif event['type'] == 'moved':
+                    self.conn.execute("DELETE FROM files WHERE path = ?", (src,))
+                    if event.get('dest'):
+                        self._index_file(self._normalize(event['dest']))
+                else:
+                    self._index_file(src)
+            self.conn.commit()
+
+    def clear(self, root=None):
+        """清除整个索引或某个目录的索引"""
+        with self.lock:
+            if root is None:
+                self.conn.execute("DELETE FROM files")
+                self.conn.execute("DELETE FROM dirs")
+            else:
+                self._delete_subtree(self._normalize(root))
+            self.conn.commit()
@@ -11,27 +11,216 @@ import pandas as pd
 import pyperclip
 from datetime import datetime
 import threading
+import fnmatch
+from collections import deque
+import scan_utils
+import rename_utils
 
 class FileMonitorHandler(FileSystemEventHandler):
     """文件监控处理器"""
-    def __init__(self, callback):
+    def __init__(self, callback, pipeline=None):
         self.callback = callback
+        self.pipeline = pipeline
+    
+    def _dispatch(self, event_type, event):
+        # 有事件管道时直接投递原始事件，过滤和格式化交给管道
+        if self.pipeline is not None:
+            self.pipeline.submit(event_type, event.src_path, getattr(event, 'dest_path', None))
+        else:
+            self.callback(FileEventPipeline.format_event(event_type, event.src_path,
+                                                         getattr(event, 'dest_path', None)))
         
     def on_created(self, event):
         if not event.is_directory:
-            self.callback(f"创建文件: {event.src_path}")
+            self._dispatch('created', event)
     
     def on_deleted(self, event):
         if not event.is_directory:
-            self.callback(f"删除文件: {event.src_path}")
+            self._dispatch('deleted', event)
     
     def on_modified(self, event):
         if not event.is_directory:
-            self.callback(f"修改文件: {event.src_path}")
+            self._dispatch('modified', event)
     
     def on_moved(self, event):
         if not event.is_directory:
-            self.callback(f"移动文件: {event.src_path} -> {event.dest_path}")
+            self._dispatch('moved', event)
+
+class FileEventPipeline:
+    """文件事件管道：过滤、按路径合并，并按固定节奏批量投递"""
+    EVENT_LABELS = {
+        'created': '创建文件',
+        'deleted': '删除文件',
+        'modified': '修改文件',
+        'moved': '移动文件'
+    }
+    
+    def __init__(self, callback, flush_interval=0.5, coalesce_window=1.0,
+                 include_patterns=None, exclude_patterns=None,
+                 history_size=1000, max_pending=10000, event_listener=None):
+        self.callback = callback
+        # 接收合并后原始事件的监听器，例如文件索引的增量更新
+        self.event_listener = event_listener
+        self.flush_interval = flush_interval
+        self.coalesce_window = coalesce_window
+        # 最长延迟，避免持续修改的文件永远不被投递
+        self.max_delay = max(coalesce_window * 5, flush_interval)
+        self.max_pending = max_pending
+        self.include_regex = self._compile_patterns(include_patterns)
+        self.exclude_regex = self._compile_patterns(exclude_patterns)
+        
+        self.pending = {}
+        self.history = deque(maxlen=history_size)
+        self.stats = {
+            'received': 0,
+            'filtered': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'delivered': 0
+        }
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+    
+    @staticmethod
+    def _compile_patterns(patterns):
+        """把通配符列表编译成一个正则，匹配时只做一次搜索"""
+        if not patterns:
+            return None
+        if isinstance(patterns, str):
+            patterns = patterns.split(',')
+        patterns = [p.strip() for p in patterns if p.strip()]
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in patterns), re.IGNORECASE)
+    
+    @classmethod
+    def format_event(cls, event_type, src_path, dest_path=None, count=1):
+        """格式化事件描述"""
+        label = cls.EVENT_LABELS.get(event_type, event_type)
+        if event_type == 'moved':
+            text = f"{label}: {src_path} -> {dest_path}"
+        else:
+            text = f"{label}: {src_path}"
+        if count > 1:
+            text += f" (合并{count}次)"
+        return text
+    
+    def _accept(self, path):
+        name = os.path.basename(path)
+        if self.include_regex and not (self.include_regex.match(name) or self.include_regex.match(path)):
+            return False
+        if self.exclude_regex and (self.exclude_regex.match(name) or self.exclude_regex.match(path)):
+            return False
+        return True
+    
+    def submit(self, event_type, src_path, dest_path=None):
+        """接收一个原始事件（在watchdog线程中调用）"""
+        now = time.monotonic()
+        with self.lock:
+            self.stats['received'] += 1
+            if not self._accept(src_path):
+                self.stats['filtered'] += 1
+                return
+            
+            item = self.pending.get(src_path)
+            if item is not None:
+                # 同一路径的重复事件合并为一条；新建后修改仍视为新建
+                if not (item['type'] == 'created' and event_type == 'modified'):
+                    item['type'] = event_type
+                item['dest'] = dest_path
+                item['count'] += 1
+                item['last'] = now
+                self.stats['coalesced'] += 1
+                return
+            
+            if len(self.pending) >= self.max_pending:
+                self.stats['dropped'] += 1
+                return
+            
+            self.pending[src_path] = {
+                'type': event_type,
+                'src': src_path,
+                'dest': dest_path,
+                'count': 1,
+                'first': now,
+                'last': now,
+                'time': datetime.now()
+            }
+    
+    def _collect_ready(self, force=False):
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            for path, item in list(self.pending.items()):
+                if (force or now - item['last'] >= self.coalesce_window
+                        or now - item['first'] >= self.max_delay):
+                    ready.append(self.pending.pop(path))
+        return ready
+    
+    def flush(self, force=False):
+        """投递已稳定的事件，返回投递数量"""
+        ready = self._collect_ready(force)
+        if not ready:
+            return 0
+        
+        ready.sort(key=lambda item: item['first'])
+        if self.event_listener:
+            self.event_listener(ready)
+        
+        batch = []
+        for item in ready:
+            timestamp = item['time'].strftime("%Y-%m-%d %H:%M:%S")
+            text = self.format_event(item['type'], item['src'], item['dest'], item['count'])
+            entry = f"[{timestamp}] {text}"
+            self.history.append(entry)
+            batch.append(entry)
+        
+        with self.lock:
+            self.stats['delivered'] += len(batch)
+        
+        if self.callback:
+            self.callback(batch)
+        return len(batch)
+    
+    def _run(self):
+        while self.running:
+            self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"文件事件投递失败: {str(e)}")
+    
+    def start(self):
+        """启动投递线程"""
+        if self.running:
+            return
+        self.running = True
+        self._wakeup.clear()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def stop(self):
+        """停止投递线程，并投递剩余事件"""
+        self.running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=1)
+            self.thread = None
+        self.flush(force=True)
+    
+    def get_recent_events(self):
+        """获取最近投递的事件"""
+        return list(self.history)
+    
+    def get_stats(self):
+        """获取统计计数"""
+        with self.lock:
+            stats = self.stats.copy()
+            stats['pending'] = len(self.pending)
+        return stats
 
 class ClipboardHistory:
     """剪贴板历史管理"""
@@ -190,16 +379,25 @@ def split_excel_file(file_path, output_dir, split_column=None, rows_per_file=100
     
     return output_files
 
-def batch_rename_advanced(directory, pattern_type, pattern_data):
-    """高级批量重命名"""
+def plan_batch_rename_advanced(directory, pattern_type, pattern_data):
+    """计算高级批量重命名计划（不修改任何文件）"""
     if not os.path.exists(directory):
         raise ValueError("目录不存在")
     
-    renamed_files = []
-    files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+    files, existing_names = rename_utils.list_directory(directory)
+    
+    if pattern_type == "replace" and pattern_data.get('use_regex', False):
+        # 正则只编译一次
+        try:
+            regex = re.compile(pattern_data.get('old_text', ''))
+        except re.error as e:
+            raise ValueError(f"正则表达式错误: {str(e)}")
+    else:
+        regex = None
     
-    for i, filename in enumerate(files):
-        old_path = os.path.join(directory, filename)
+    proposals = []
+    for i, entry in enumerate(files):
+        filename = entry.name
         name, ext = os.path.splitext(filename)
         
         if pattern_type == "sequence":
@@ -210,8 +408,8 @@ def batch_rename_advanced(directory, pattern_type, pattern_data):
             new_name = f"{prefix}{str(start_num + i).zfill(digits)}{ext}"
         
         elif pattern_type == "date":
-            # 按文件修改时间重命名
-            mtime = os.path.getmtime(old_path)
+            # 按文件修改时间重命名（使用列举时已取得的stat结果）
+            mtime = entry.mtime_ns / 1e9
             date_format = pattern_data.get('date_format', '%Y%m%d_%H%M%S')
             prefix = pattern_data.get('prefix', '')
             suffix = pattern_data.get('suffix', '')
@@ -223,10 +421,9 @@ def batch_rename_advanced(directory, pattern_type, pattern_data):
             # 替换重命名
             old_text = pattern_data.get('old_text', '')
             new_text = pattern_data.get('new_text', '')
-            use_regex = pattern_data.get('use_regex', False)
             
-            if use_regex:
-                new_name = re.sub(old_text, new_text, name) + ext
+            if regex is not None:
+                new_name = regex.sub(new_text, name) + ext
             else:
                 new_name = name.replace(old_text, new_text) + ext
         
@@ -245,30 +442,45 @@ def batch_rename_advanced(directory, pattern_type, pattern_data):
         else:
             continue
         
-        new_path = os.path.join(directory, new_name)
-        
-        # 避免重名
-        counter = 1
-        while os.path.exists(new_path):
-            name_part, ext_part = os.path.splitext(new_name)
-            new_name = f"{name_part}_{counter}{ext_part}"
-            new_path = os.path.join(directory, new_name)
-            counter += 1
-        
-        try:
-            os.rename(old_path, new_path)
-            renamed_files.append((filename, new_name))
-        except Exception as e:
-            print(f"重命名失败 {filename}: {str(e)}")
+        proposals.append((filename, new_name))
+    
+    # 重名时自动追加序号，冲突在内存中一次性解决
+    return rename_utils.build_rename_plan(directory, proposals, existing_names, on_collision='suffix')
+
+def batch_rename_advanced(directory, pattern_type, pattern_data, dry_run=False):
+    """高级批量重命名
+    
+    先生成完整的重命名计划，再经临时名分两阶段执行，失败时整体回滚，并写入撤销日志。
+    """
+    plan = plan_batch_rename_advanced(directory, pattern_type, pattern_data)
+    if dry_run:
+        return list(plan.items)
+    
+    renamed_files, errors = rename_utils.execute_rename_plan(plan)
+    for error in errors:
+        print(f"重命名失败 {error}")
     
     return renamed_files
 
-def monitor_directory(directory, callback, include_subdirs=False):
-    """监控目录变化"""
+def undo_last_batch_rename(directory):
+    """撤销该目录最近一次批量重命名"""
+    return rename_utils.undo_last_rename(directory)
+
+def monitor_directory(directory, callback, include_subdirs=False, pipeline=None, file_index=None):
+    """监控目录变化
+    
+    传入pipeline时，事件经FileEventPipeline过滤合并后批量投递，callback不再逐条调用；
+    同时传入file_index时，合并后的事件会同步更新文件索引。
+    """
     if not os.path.exists(directory):
         raise ValueError("目录不存在")
     
-    event_handler = FileMonitorHandler(callback)
+    if pipeline is not None:
+        if file_index is not None:
+            pipeline.event_listener = file_index.apply_events
+        pipeline.start()
+    
+    event_handler = FileMonitorHandler(callback, pipeline)
     observer = Observer()
     observer.schedule(event_handler, directory, recursive=include_subdirs)
     observer.start()
@@ -323,46 +535,58 @@ def clean_excel_data(input_file, output_file, operations):
     df.to_excel(output_file, index=False)
     return output_file
 
-def analyze_directory_structure(directory):
-    """分析目录结构"""
+def analyze_directory_structure(directory, progress_callback=None, max_workers=None, file_index=None,
+                                top_k=100, large_file_threshold=10 * 1024 * 1024):
+    """分析目录结构
+    
+    大文件只保留最大的top_k个，另附按扩展名的对数刻度大小分布，结果大小与文件总数无关。
+    传入file_index时先增量刷新索引，再直接从索引查询统计结果。
+    """
     if not os.path.exists(directory):
         raise ValueError("目录不存在")
     
+    if file_index is not None:
+        file_index.refresh(directory, progress_callback=progress_callback, max_workers=max_workers)
+        summary = file_index.get_directory_summary(directory)
+        return {
+            'total_size': summary['total_size'],
+            'total_size_mb': round(summary['total_size'] / (1024 * 1024), 2),
+            'file_count': summary['file_count'],
+            'dir_count': summary['dir_count'],
+            'file_types': file_index.get_extension_stats(directory),
+            'large_files': file_index.get_large_files(directory, large_file_threshold, top_k),
+            'large_file_count': file_index.count_large_files(directory, large_file_threshold),
+            'size_histogram': file_index.get_size_histogram(directory)
+        }
+    
     total_size = 0
     file_count = 0
     dir_count = 0
     file_types = {}
-    large_files = []
+    large_files = scan_utils.TopKTracker(top_k, large_file_threshold)
+    histogram = scan_utils.SizeHistogram()
     
-    for root, dirs, files in os.walk(directory):
-        dir_count += len(dirs)
+    for listing in scan_utils.scan_directory_tree(directory, max_workers=max_workers,
+                                                  progress_callback=progress_callback):
+        dir_count += len(listing.dirs)
         
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                size = os.path.getsize(file_path)
-                total_size += size
-                file_count += 1
-                
-                # 统计文件类型
-                _, ext = os.path.splitext(file)
-                ext = ext.lower()
-                if ext in file_types:
-                    file_types[ext]['count'] += 1
-                    file_types[ext]['size'] += size
-                else:
-                    file_types[ext] = {'count': 1, 'size': size}
-                
-                # 记录大文件（大于10MB）
-                if size > 10 * 1024 * 1024:
-                    large_files.append({
-                        'path': file_path,
-                        'size': size,
-                        'size_mb': round(size / (1024 * 1024), 2)
-                    })
-                
-            except OSError:
-                pass
+        for entry in listing.files:
+            size = entry.size
+            total_size += size
+            file_count += 1
+            
+            # 统计文件类型
+            _, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext in file_types:
+                file_types[ext]['count'] += 1
+                file_types[ext]['size'] += size
+            else:
+                file_types[ext] = {'count': 1, 'size': size}
+            histogram.add(ext, size)
+            
+            # 记录最大的top_k个大文件
+            large_files.add(size, entry.path)
     
     return {
         'total_size': total_size,
@@ -370,5 +594,11 @@ def analyze_directory_structure(directory):
         'file_count': file_count,
         'dir_count': dir_count,
         'file_types': file_types,
-        'large_files': large_files
+        'large_files': [{
+            'path': path,
+            'size': size,
+            'size_mb': round(size / (1024 * 1024), 2)
+        } for size, path in large_files.items()],
+        'large_file_count': large_files.total_count,
+        'size_histogram': histogram.to_dict()
     }
\ No newline at end of file
@@ -7,6 +7,8 @@ from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt6.QtGui import QFont, QIcon
 from utils import resource_path
 import office_utils
+import scan_utils
+from index_manager import FileIndexManager
 import os
 import shutil
 from pathlib import Path
@@ -51,6 +53,13 @@ class OfficeWorker(QThread):
                 )
                 self.finished.emit(f"批量重命名完成，处理了{len(result)}个文件")
             
+            elif self.operation == "undo_rename":
+                restored, errors = office_utils.undo_last_batch_rename(self.kwargs['directory'])
+                message = f"已撤销重命名，恢复了{len(restored)}个文件"
+                if errors:
+                    message += f"\n遇到 {len(errors)} 个错误:\n" + "\n".join(errors[:10])
+                self.finished.emit(message)
+            
             elif self.operation == "convert_format":
                 result = office_utils.convert_file_format(
                     self.kwargs['input_file'],
@@ -69,16 +78,31 @@ class OfficeWorker(QThread):
             
             elif self.operation == "analyze_directory":
                 result = office_utils.analyze_directory_structure(
-                    self.kwargs['directory']
+                    self.kwargs['directory'],
+                    progress_callback=self.emit_scan_progress,
+                    file_index=self.kwargs.get('file_index'),
+                    top_k=self.kwargs.get('top_k', 100),
+                    large_file_threshold=self.kwargs.get('large_file_threshold', 10 * 1024 * 1024)
                 )
                 self.analysis_result.emit(result)
                 self.finished.emit("目录分析完成")
                 
         except Exception as e:
             self.error.emit(str(e))
+    
+    def emit_scan_progress(self, info):
+        size_mb = info['total_size'] / (1024 * 1024)
+        message = f"已扫描 {info['dirs_scanned']} 个目录, {info['file_count']} 个文件, {size_mb:.2f} MB"
+        if 'dirs_skipped' in info:
+            message += f"\n索引中未变化的目录: {info['dirs_skipped']} 个"
+        self.status_update.emit(message)
 
 class OfficeWindow(QMainWindow):
     operation_successful = pyqtSignal()
+    MAX_FILE_TYPE_ROWS = 200
+    MAX_HISTOGRAM_TYPES = 20
+    # 文件事件由管道线程批量发出，经信号转到界面线程处理
+    file_events_ready = pyqtSignal(list)
     
     def __init__(self):
         super().__init__()
@@ -88,6 +112,9 @@ class OfficeWindow(QMainWindow):
         
         # 文件监控和剪贴板历史
         self.file_observer = None
+        self.file_pipeline = None
+        self.file_index = None
+        self.file_events_ready.connect(self.on_file_events)
         self.clipboard_history = office_utils.ClipboardHistory()
         
         self.init_ui()
@@ -208,8 +235,12 @@ class OfficeWindow(QMainWindow):
         self.execute_rename_btn = QPushButton("执行重命名")
         self.execute_rename_btn.clicked.connect(self.execute_rename)
         
+        self.undo_rename_btn = QPushButton("撤销上次重命名")
+        self.undo_rename_btn.clicked.connect(self.undo_rename)
+        
         preview_layout.addWidget(self.preview_rename_btn)
         preview_layout.addWidget(self.execute_rename_btn)
+        preview_layout.addWidget(self.undo_rename_btn)
         preview_layout.addStretch()
         layout.addLayout(preview_layout)
         
@@ -220,6 +251,9 @@ class OfficeWindow(QMainWindow):
         self.rename_preview.horizontalHeader().setStretchLastSection(True)
         layout.addWidget(self.rename_preview)
         
+        self.rename_plan_label = QLabel("")
+        layout.addWidget(self.rename_plan_label)
+        
         # 初始化界面
         self.on_rename_mode_changed("序号重命名")
         return widget
@@ -244,6 +278,25 @@ class OfficeWindow(QMainWindow):
         self.include_subdirs = QCheckBox("包含子目录")
         settings_layout.addWidget(self.include_subdirs, 1, 0, 1, 3)
         
+        settings_layout.addWidget(QLabel("包含模式:"), 2, 0)
+        self.monitor_include_input = QLineEdit()
+        self.monitor_include_input.setPlaceholderText("如: *.py, *.txt（留空表示全部）")
+        settings_layout.addWidget(self.monitor_include_input, 2, 1, 1, 2)
+        
+        settings_layout.addWidget(QLabel("排除模式:"), 3, 0)
+        self.monitor_exclude_input = QLineEdit()
+        self.monitor_exclude_input.setPlaceholderText("如: *.tmp, *~, */.git/*")
+        settings_layout.addWidget(self.monitor_exclude_input, 3, 1, 1, 2)
+        
+        settings_layout.addWidget(QLabel("合并窗口(毫秒):"), 4, 0)
+        self.monitor_coalesce_ms = QSpinBox()
+        self.monitor_coalesce_ms.setRange(0, 10000)
+        self.monitor_coalesce_ms.setValue(1000)
+        settings_layout.addWidget(self.monitor_coalesce_ms, 4, 1, 1, 2)
+        
+        self.monitor_update_index = QCheckBox("同步更新文件索引")
+        settings_layout.addWidget(self.monitor_update_index, 5, 0, 1, 3)
+        
         layout.addWidget(settings_group)
         
         # 监控控制
@@ -266,8 +319,13 @@ class OfficeWindow(QMainWindow):
         self.monitor_log = QTextEdit()
         self.monitor_log.setReadOnly(True)
         self.monitor_log.setMaximumHeight(200)
+        # 限制日志行数，避免长时间监控时文本无限增长
+        self.monitor_log.document().setMaximumBlockCount(5000)
         log_layout.addWidget(self.monitor_log)
         
+        self.monitor_stats_label = QLabel("收到: 0  已合并: 0  已过滤: 0  已丢弃: 0")
+        log_layout.addWidget(self.monitor_stats_label)
+        
         clear_log_btn = QPushButton("清空日志")
         clear_log_btn.clicked.connect(lambda: self.monitor_log.clear())
         log_layout.addWidget(clear_log_btn)
@@ -338,6 +396,27 @@ class OfficeWindow(QMainWindow):
         dir_layout.addWidget(self.select_analysis_dir_btn)
         layout.addWidget(dir_group)
         
+        # 分析选项
+        options_group = QGroupBox("分析选项")
+        options_layout = QGridLayout(options_group)
+        
+        options_layout.addWidget(QLabel("大文件阈值(MB):"), 0, 0)
+        self.large_file_threshold = QSpinBox()
+        self.large_file_threshold.setRange(0, 1024 * 1024)
+        self.large_file_threshold.setValue(10)
+        options_layout.addWidget(self.large_file_threshold, 0, 1)
+        
+        options_layout.addWidget(QLabel("显示最大文件数:"), 1, 0)
+        self.large_file_top_k = QSpinBox()
+        self.large_file_top_k.setRange(1, 10000)
+        self.large_file_top_k.setValue(100)
+        options_layout.addWidget(self.large_file_top_k, 1, 1)
+        
+        self.use_file_index = QCheckBox("使用文件索引（重复分析时只重新扫描有变化的目录）")
+        options_layout.addWidget(self.use_file_index, 2, 0, 1, 2)
+        
+        layout.addWidget(options_group)
+        
         # 分析按钮
         analyze_btn = QPushButton("开始分析")
         analyze_btn.clicked.connect(self.analyze_directory)
@@ -359,9 +438,16 @@ class OfficeWindow(QMainWindow):
         self.file_types_table.setHorizontalHeaderLabels(["文件类型", "数量", "大小(MB)"])
         result_layout.addWidget(self.file_types_table)
         
+        # 大小分布（对数刻度）
+        self.size_histogram_table = QTableWidget()
+        self.size_histogram_table.setColumnCount(3)
+        self.size_histogram_table.setHorizontalHeaderLabels(["文件类型", "大小区间", "数量"])
+        self.size_histogram_table.horizontalHeader().setStretchLastSection(True)
+        result_layout.addWidget(self.size_histogram_table)
+        
         # 大文件列表
-        large_files_label = QLabel("大文件列表 (>10MB):")
-        result_layout.addWidget(large_files_label)
+        self.large_files_label = QLabel("大文件列表 (>10MB):")
+        result_layout.addWidget(self.large_files_label)
         
         self.large_files_table = QTableWidget()
         self.large_files_table.setColumnCount(2)
@@ -878,6 +964,15 @@ class OfficeWindow(QMainWindow):
         self.office_worker.error.connect(self.on_office_error)
         self.office_worker.start()
     
+    def get_rename_pattern_type(self):
+        mode_map = {
+            "序号重命名": "sequence",
+            "时间重命名": "date",
+            "替换重命名": "replace",
+            "大小写转换": "case"
+        }
+        return mode_map[self.rename_mode.currentText()]
+    
     def preview_rename(self):
         directory = self.rename_dir_input.text()
         if not directory or not os.path.exists(directory):
@@ -889,20 +984,21 @@ class OfficeWindow(QMainWindow):
             return
         
         try:
-            # 模拟重命名以获得预览
-            files = [f for f in os.listdir(directory) 
-                    if os.path.isfile(os.path.join(directory, f))]
-            
-            self.rename_preview.setRowCount(len(files))
+            # 直接显示重命名计划，与实际执行的映射完全一致
+            plan = office_utils.plan_batch_rename_advanced(
+                directory, self.get_rename_pattern_type(), pattern_data
+            )
             
-            for i, filename in enumerate(files):
-                old_name = filename
-                # 这里应该调用重命名逻辑获取新名称
-                # 为简化，直接显示原名称
-                new_name = f"预览_{old_name}"  # 实际应该根据模式生成
-                
+            self.rename_preview.setRowCount(len(plan.items))
+            for i, (old_name, new_name) in enumerate(plan.items):
                 self.rename_preview.setItem(i, 0, QTableWidgetItem(old_name))
                 self.rename_preview.setItem(i, 1, QTableWidgetItem(new_name))
+            
+            summary = plan.summary()
+            self.rename_plan_label.setText(
+                f"将重命名 {summary['rename_count']} 个文件，名称不变 {summary['unchanged']} 个，"
+                f"自动解决冲突 {summary['collisions']} 个，链式/循环重命名 {summary['chained']} 个"
+            )
                 
         except Exception as e:
             QMessageBox.critical(self, "错误", str(e))
@@ -917,24 +1013,30 @@ class OfficeWindow(QMainWindow):
         if not pattern_data:
             return
         
-        mode_map = {
-            "序号重命名": "sequence",
-            "时间重命名": "date",
-            "替换重命名": "replace",
-            "大小写转换": "case"
-        }
-        pattern_type = mode_map[self.rename_mode.currentText()]
-        
         self.office_worker = OfficeWorker(
             "batch_rename",
             directory=directory,
-            pattern_type=pattern_type,
+            pattern_type=self.get_rename_pattern_type(),
             pattern_data=pattern_data
         )
         self.office_worker.finished.connect(self.on_office_finished)
         self.office_worker.error.connect(self.on_office_error)
         self.office_worker.start()
     
+    def undo_rename(self):
+        directory = self.rename_dir_input.text()
+        if not directory or not os.path.exists(directory):
+            QMessageBox.warning(self, "警告", "请选择有效的目录")
+            return
+        
+        self.office_worker = OfficeWorker(
+            "undo_rename",
+            directory=directory
+        )
+        self.office_worker.finished.connect(self.on_office_finished)
+        self.office_worker.error.connect(self.on_office_error)
+        self.office_worker.start()
+    
     def get_rename_pattern_data(self):
         mode = self.rename_mode.currentText()
         
@@ -975,8 +1077,16 @@ class OfficeWindow(QMainWindow):
         
         try:
             include_subdirs = self.include_subdirs.isChecked()
+            self.file_pipeline = office_utils.FileEventPipeline(
+                self.file_events_ready.emit,
+                coalesce_window=self.monitor_coalesce_ms.value() / 1000,
+                include_patterns=self.monitor_include_input.text(),
+                exclude_patterns=self.monitor_exclude_input.text()
+            )
+            file_index = self.get_file_index() if self.monitor_update_index.isChecked() else None
             self.file_observer = office_utils.monitor_directory(
-                directory, self.on_file_event, include_subdirs
+                directory, self.on_file_event, include_subdirs,
+                pipeline=self.file_pipeline, file_index=file_index
             )
             
             self.start_monitor_btn.setEnabled(False)
@@ -984,6 +1094,9 @@ class OfficeWindow(QMainWindow):
             self.monitor_log.append(f"开始监控目录: {directory}")
             
         except Exception as e:
+            if self.file_pipeline:
+                self.file_pipeline.stop()
+                self.file_pipeline = None
             QMessageBox.critical(self, "错误", str(e))
     
     def stop_monitor(self):
@@ -992,6 +1105,11 @@ class OfficeWindow(QMainWindow):
             self.file_observer.join()
             self.file_observer = None
             
+            if self.file_pipeline:
+                self.file_pipeline.stop()
+                self.update_monitor_stats()
+                self.file_pipeline = None
+            
             self.start_monitor_btn.setEnabled(True)
             self.stop_monitor_btn.setEnabled(False)
             self.monitor_log.append("监控已停止")
@@ -1001,6 +1119,21 @@ class OfficeWindow(QMainWindow):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.monitor_log.append(f"[{timestamp}] {event_desc}")
     
+    def on_file_events(self, events):
+        # 一批事件只追加一次，避免逐条刷新界面
+        if events:
+            self.monitor_log.append("\n".join(events))
+        self.update_monitor_stats()
+    
+    def update_monitor_stats(self):
+        if not self.file_pipeline:
+            return
+        stats = self.file_pipeline.get_stats()
+        self.monitor_stats_label.setText(
+            f"收到: {stats['received']}  已合并: {stats['coalesced']}  "
+            f"已过滤: {stats['filtered']}  已丢弃: {stats['dropped']}"
+        )
+    
     def start_clipboard_monitor(self):
         self.clipboard_history.start_monitoring(self.on_clipboard_change)
         self.start_clipboard_btn.setEnabled(False)
@@ -1052,13 +1185,22 @@ class OfficeWindow(QMainWindow):
         
         self.office_worker = OfficeWorker(
             "analyze_directory",
-            directory=directory
+            directory=directory,
+            file_index=self.get_file_index() if self.use_file_index.isChecked() else None,
+            top_k=self.large_file_top_k.value(),
+            large_file_threshold=self.large_file_threshold.value() * 1024 * 1024
         )
         self.office_worker.finished.connect(self.on_office_finished)
         self.office_worker.error.connect(self.on_office_error)
         self.office_worker.analysis_result.connect(self.display_analysis_result)
+        self.office_worker.status_update.connect(self.basic_info.setPlainText)
         self.office_worker.start()
     
+    def get_file_index(self):
+        if self.file_index is None:
+            self.file_index = FileIndexManager()
+        return self.file_index
+    
     def display_analysis_result(self, result):
         # 显示基本信息
         info_text = f"总大小: {result['total_size_mb']:.2f} MB\n"
@@ -1066,11 +1208,12 @@ class OfficeWindow(QMainWindow):
         info_text += f"目录数量: {result['dir_count']}"
         self.basic_info.setPlainText(info_text)
         
-        # 显示文件类型统计
-        file_types = result['file_types']
+        # 显示文件类型统计（按总大小排序，只显示前面的类型）
+        file_types = sorted(result['file_types'].items(), key=lambda item: item[1]['size'], reverse=True)
+        file_types = file_types[:self.MAX_FILE_TYPE_ROWS]
         self.file_types_table.setRowCount(len(file_types))
         
-        for i, (ext, data) in enumerate(file_types.items()):
+        for i, (ext, data) in enumerate(file_types):
             ext_display = ext if ext else "无扩展名"
             size_mb = data['size'] / (1024 * 1024)
             
@@ -1078,8 +1221,24 @@ class OfficeWindow(QMainWindow):
             self.file_types_table.setItem(i, 1, QTableWidgetItem(str(data['count'])))
             self.file_types_table.setItem(i, 2, QTableWidgetItem(f"{size_mb:.2f}"))
         
-        # 显示大文件列表
+        # 显示主要文件类型的大小分布
+        histogram = result.get('size_histogram', {})
+        rows = []
+        for ext, _ in file_types[:self.MAX_HISTOGRAM_TYPES]:
+            for bucket, count in histogram.get(ext, {}).items():
+                rows.append((ext if ext else "无扩展名", scan_utils.size_bucket_label(bucket), count))
+        self.size_histogram_table.setRowCount(len(rows))
+        for i, (ext_display, label, count) in enumerate(rows):
+            self.size_histogram_table.setItem(i, 0, QTableWidgetItem(ext_display))
+            self.size_histogram_table.setItem(i, 1, QTableWidgetItem(label))
+            self.size_histogram_table.setItem(i, 2, QTableWidgetItem(str(count)))
+        
+        # 显示大文件列表（只包含最大的K个）
         large_files = result['large_files']
+        self.large_files_label.setText(
+            f"大文件列表 (>{self.large_file_threshold.value()}MB，"
+            f"共 {result.get('large_file_count', len(large_files))} 个，显示最大的 {len(large_files)} 个):"
+        )
         self.large_files_table.setRowCount(len(large_files))
         
         for i, file_info in enumerate(large_files):
@@ -1101,5 +1260,12 @@ class OfficeWindow(QMainWindow):
             self.file_observer.stop()
             self.file_observer.join()
         
+        if self.file_pipeline:
+            self.file_pipeline.callback = None
+            self.file_pipeline.stop()
+        
+        if self.file_index:
+            self.file_index.close()
+        
         self.clipboard_history.stop_monitoring()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,287 @@
+import os
+import json
+import secrets
+from datetime import datetime
+from utils import get_data_dir
+import scan_utils
+
+JOURNAL_DIR_NAME = "rename_journals"
+
+class RenamePlan:
+    """批量重命名计划：完整的 旧名 -> 新名 映射，全部在内存中计算"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.items = []            # [(旧文件名, 新文件名)]
+        self.unchanged = 0         # 新旧名称相同而跳过的文件数
+        self.collisions = 0        # 目标名称冲突的次数
+        self.chained = 0           # 目标名称是另一个待重命名文件的原名（链或环）
+        self.errors = []
+        self.journal_path = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def summary(self):
+        return {
+            'rename_count': len(self.items),
+            'unchanged': self.unchanged,
+            'collisions': self.collisions,
+            'chained': self.chained,
+            'errors': len(self.errors)
+        }
+
+def list_directory(directory):
+    """一次 scandir 列出目录，返回 (文件FileEntry列表, 目录中全部名称集合)"""
+    files = []
+    all_names = set()
+    with os.scandir(directory) as it:
+        for entry in it:
+            all_names.add(entry.name)
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    files.append(scan_utils.FileEntry(entry.path, entry.name, st.st_size,
+                                                      st.st_mtime_ns, st.st_ino, st.st_dev))
+            except OSError:
+                continue
+    files.sort(key=lambda f: f.name)
+    return files, all_names
+
+def _name_key(name):
+    # 大小写不敏感的文件系统上按规范化后的名称判断冲突
+    return os.path.normcase(name)
+
+def build_rename_plan(directory, proposals, existing_names, on_collision='suffix'):
+    """根据 [(旧名, 新名)] 生成无冲突的重命名计划
+
+    on_collision 为 'suffix' 时在冲突名称后追加 _1、_2...；为 'skip' 时记录错误并跳过。
+    冲突检测只用集合运算：被重命名的原名会被释放，未参与重命名的文件和已分配的目标名称占用。
+    """
+    plan = RenamePlan(directory)
+    moving = [(old, new) for old, new in proposals if new and new != old]
+    plan.unchanged = len(proposals) - len(moving)
+
+    sources = {_name_key(old) for old, _ in moving}
+    occupied = {_name_key(name) for name in existing_names} - sources
+    suffix_counters = {}
+    kept = []  # 被跳过而保留原名的文件
+
+    for old, new in moving:
+        if os.sep in new or (os.altsep and os.altsep in new) or new in ('.', '..'):
+            plan.errors.append(f"{old} -> {new}: 文件名无效")
+            occupied.add(_name_key(old))
+            kept.append(_name_key(old))
+            continue
+
+        if _name_key(new) in occupied:
+            plan.collisions += 1
+            if on_collision != 'suffix':
+                plan.errors.append(f"{old} -> {new}: 目标文件已存在")
+                occupied.add(_name_key(old))
+                kept.append(_name_key(old))
+                continue
+            base, ext = os.path.splitext(new)
+            counter = suffix_counters.get(new, 1)
+            candidate = f"{base}_{counter}{ext}"
+            while _name_key(candidate) in occupied:
+                counter += 1
+                candidate = f"{base}_{counter}{ext}"
+            suffix_counters[new] = counter + 1
+            new = candidate
+
+        occupied.add(_name_key(new))
+        plan.items.append((old, new))
+
+    # 保留原名的文件可能占用了先前已分配给其他文件的目标名称，这些文件也只能跳过，依次传递
+    by_target = {_name_key(new): i for i, (_, new) in enumerate(plan.items)}
+    dropped = set()
+    while kept:
+        index = by_target.pop(kept.pop(), None)
+        if index is None or index in dropped:
+            continue
+        old, new = plan.items[index]
+        dropped.add(index)
+        plan.errors.append(f"{old} -> {new}: 目标文件已存在")
+        kept.append(_name_key(old))
+    if dropped:
+        plan.items = [item for i, item in enumerate(plan.items) if i not in dropped]
+
+    remaining_sources = {_name_key(old) for old, _ in plan.items}
+    plan.chained = sum(1 for _, new in plan.items if _name_key(new) in remaining_sources)
+    return plan
+
+def get_journal_dir():
+    journal_dir = os.path.join(get_data_dir(), JOURNAL_DIR_NAME)
+    os.makedirs(journal_dir, exist_ok=True)
+    return journal_dir
+
+def _write_journal(journal_path, journal):
+    tmp_path = journal_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, ensure_ascii=False)
+    os.replace(tmp_path, journal_path)
+
+def _two_phase_rename(directory, pairs, existing_names, journal_path=None, journal=None):
+    """先把所有源文件改为临时名，再改为目标名；任一步失败则回滚全部已完成的操作
+
+    pairs 为 [(当前名, 目标名)]，返回 (成功列表, 错误列表)。
+    """
+    token = secrets.token_hex(4)
+    taken = {_name_key(name) for name in existing_names}
+    steps = []
+    for i, (old, new) in enumerate(pairs):
+        temp = f".__rename_{token}_{i}"
+        while _name_key(temp) in taken:
+            temp = f".__rename_{secrets.token_hex(4)}_{i}"
+        taken.add(_name_key(temp))
+        steps.append((old, temp, new))
+
+    if journal is not None:
+        journal['items'] = steps
+        journal['status'] = 'pending'
+        _write_journal(journal_path, journal)
+
+    def path_of(name):
+        return os.path.join(directory, name)
+
+    # 第一阶段：源文件 -> 临时名
+    moved = []
+    try:
+        for old, temp, new in steps:
+            os.rename(path_of(old), path_of(temp))
+            moved.append((old, temp, new))
+    except OSError as e:
+        for old, temp, _ in reversed(moved):
+            try:
+                os.rename(path_of(temp), path_of(old))
+            except OSError:
+                pass
+        if journal is not None:
+            journal['status'] = 'rolled_back'
+            _write_journal(journal_path, journal)
+        return [], [f"重命名失败，已回滚: {str(e)}"]
+
+    # 第二阶段：临时名 -> 目标名；日志先记录进入第二阶段，中断后撤销时据此判断每个文件的位置
+    if journal is not None:
+        journal['status'] = 'phase2'
+        _write_journal(journal_path, journal)
+    done = []
+    try:
+        for old, temp, new in steps:
+            if os.path.lexists(path_of(new)):
+                raise OSError(f"{new}: 目标文件已存在")
+            os.rename(path_of(temp), path_of(new))
+            done.append((old, temp, new))
+    except OSError as e:
+        for old, temp, new in reversed(done):
+            try:
+                os.rename(path_of(new), path_of(temp))
+            except OSError:
+                pass
+        for old, temp, _ in reversed(steps):
+            try:
+                os.rename(path_of(temp), path_of(old))
+            except OSError:
+                pass
+        if journal is not None:
+            journal['status'] = 'rolled_back'
+            _write_journal(journal_path, journal)
+        return [], [f"重命名失败，已回滚: {str(e)}"]
+
+    if journal is not None:
+        journal['status'] = 'done'
+        _write_journal(journal_path, journal)
+    return [(old, new) for old, _, new in steps], []
+
+def execute_rename_plan(plan, write_journal=True):
+    """执行重命名计划，写入撤销日志，返回 (成功列表, 错误列表)"""
+    if not plan.items:
+        return [], list(plan.errors)
+
+    _, existing_names = list_directory(plan.directory)
+    journal = None
+    if write_journal:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        plan.journal_path = os.path.join(get_journal_dir(), f"rename_{timestamp}.json")
+        journal = {
+            'directory': os.path.abspath(plan.directory),
+            'created_at': datetime.now().isoformat()
+        }
+
+    renamed, errors = _two_phase_rename(plan.directory, plan.items, existing_names,
+                                        plan.journal_path, journal)
+    return renamed, plan.errors + errors
+
+def list_rename_journals(directory=None):
+    """列出撤销日志，最新的在前；指定directory时只返回该目录的日志"""
+    journal_dir = get_journal_dir()
+    journals = []
+    for name in sorted(os.listdir(journal_dir), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(journal_dir, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if directory and journal.get('directory') != os.path.abspath(directory):
+            continue
+        journal['path'] = path
+        journals.append(journal)
+    return journals
+
+# 执行中断（进程退出、断电）的日志状态，可以撤销
+INTERRUPTED_STATUSES = ('pending', 'phase2')
+
+def _locate_journal_item(directory, status, old, temp, new):
+    """判断日志中一个文件当前所在的名称，返回需要改回原名的当前名称，无需恢复时返回 old"""
+    def exists(name):
+        return os.path.lexists(os.path.join(directory, name))
+
+    if status == 'done':
+        return new if exists(new) else (temp if exists(temp) else None)
+    # 中断的操作：仍是临时名的文件直接恢复；第一阶段中未处理的文件仍是原名；
+    # 第二阶段中已完成的文件是目标名（旧日志没有 phase2 状态，原名不存在时按目标名处理）
+    if exists(temp):
+        return temp
+    if status == 'pending' and exists(old):
+        return old
+    return new if exists(new) else None
+
+def undo_rename_journal(journal_path):
+    """按撤销日志把文件恢复为原名，返回 (恢复列表, 错误列表)
+
+    执行中断的日志（第一阶段或第二阶段中途）也能恢复：只撤销已经完成的步骤。
+    """
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        journal = json.load(f)
+
+    status = journal.get('status')
+    if status in ('rolled_back', 'undone'):
+        return [], ["该操作已回滚或撤销"]
+
+    directory = journal['directory']
+    pairs = []
+    errors = []
+    for old, temp, new in journal.get('items', []):
+        current = _locate_journal_item(directory, status, old, temp, new)
+        if current is None:
+            errors.append(f"{new}: 文件不存在，无法恢复")
+        elif current != old:
+            pairs.append((current, old))
+
+    _, existing_names = list_directory(directory)
+    restored, rename_errors = _two_phase_rename(directory, pairs, existing_names)
+    if not rename_errors:
+        journal['status'] = 'undone'
+        _write_journal(journal_path, journal)
+    return restored, errors + rename_errors
+
+def undo_last_rename(directory):
+    """撤销该目录最近一次批量重命名，包括执行中断、文件还停留在临时名的操作"""
+    journals = [j for j in list_rename_journals(directory)
+                if j.get('status') == 'done' or j.get('status') in INTERRUPTED_STATUSES]
+    if not journals:
+        raise ValueError("没有可撤销的重命名记录")
+    return undo_rename_journal(journals[0]['path'])
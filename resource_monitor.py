@@ -0,0 +1,217 @@
+import time
+import threading
+import warnings
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+class RingBuffer:
+    """固定容量的NumPy环形缓冲区，每个样本是一行，满了之后覆盖最旧的样本"""
+    def __init__(self, capacity, width=1):
+        self.capacity = capacity
+        self.width = width
+        self.data = np.full((capacity, width), np.nan)
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.data[self.index] = row
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def values(self):
+        """按时间顺序返回全部样本的副本，形状为 (样本数, width)"""
+        if self.count < self.capacity:
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.index:], self.data[:self.index]))
+
+    def latest(self):
+        return self.data[(self.index - 1) % self.capacity].copy()
+
+    def clear(self):
+        self.data.fill(np.nan)
+        self.index = 0
+        self.count = 0
+
+def aggregate(values):
+    """按列计算 min/max/mean/p95，values 为二维数组"""
+    if len(values) == 0:
+        empty = np.full(values.shape[1] if values.ndim == 2 else 1, np.nan)
+        return {'min': empty, 'max': empty, 'mean': empty, 'p95': empty}
+    with warnings.catch_warnings():
+        # 全为NaN的列（如磁盘计数器不可用）结果为NaN，不需要警告
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {
+            'min': np.nanmin(values, axis=0),
+            'max': np.nanmax(values, axis=0),
+            'mean': np.nanmean(values, axis=0),
+            'p95': np.nanpercentile(values, 95, axis=0)
+        }
+
+class ResourceSampler:
+    """后台资源采样线程
+
+    按 interval 秒采样每个CPU核心的占用率、内存、磁盘读写速率，写入环形缓冲区；
+    进程列表的开销较大，按 process_interval 秒单独采样，只保留CPU占用最高的若干进程。
+    采样线程自身消耗的CPU时间通过 thread_time 统计，可用 get_overhead 查看。
+    """
+
+    SERIES = ('cpu', 'cpu_total', 'memory', 'swap', 'disk_read', 'disk_write')
+
+    def __init__(self, interval=1.0, capacity=3600, process_interval=5.0, top_processes=10):
+        if psutil is None:
+            raise RuntimeError("资源监控需要安装 psutil")
+        self.interval = interval
+        self.process_interval = process_interval
+        self.top_processes = top_processes
+        self.core_count = psutil.cpu_count() or 1
+
+        self.lock = threading.Lock()
+        self.timestamps = RingBuffer(capacity)
+        self.buffers = {
+            'cpu': RingBuffer(capacity, self.core_count),
+            'cpu_total': RingBuffer(capacity),
+            'memory': RingBuffer(capacity),
+            'swap': RingBuffer(capacity),
+            'disk_read': RingBuffer(capacity),
+            'disk_write': RingBuffer(capacity)
+        }
+        self.processes = []
+        self.memory_info = {}
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._cpu_time = 0.0
+        self._wall_time = 0.0
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.interval, self.process_interval) + 1)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_interval(self, interval):
+        self.interval = interval
+
+    def _read_disk_counters(self):
+        try:
+            counters = psutil.disk_io_counters()
+        except (OSError, RuntimeError):
+            counters = None
+        return (counters.read_bytes, counters.write_bytes) if counters else None
+
+    def _run(self):
+        # 首次调用只建立基准值，cpu_percent 之后的调用都是非阻塞的
+        psutil.cpu_percent(percpu=True)
+        last_disk = self._read_disk_counters()
+        last_time = time.monotonic()
+        next_process_sample = 0.0
+        thread_start = time.thread_time()
+        wall_start = time.monotonic()
+
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            elapsed = max(now - last_time, 1e-6)
+            last_time = now
+
+            per_core = psutil.cpu_percent(percpu=True)
+            memory = psutil.virtual_memory()
+            swap = psutil.swap_memory()
+            disk = self._read_disk_counters()
+            if disk and last_disk:
+                read_rate = (disk[0] - last_disk[0]) / elapsed
+                write_rate = (disk[1] - last_disk[1]) / elapsed
+            else:
+                read_rate = write_rate = np.nan
+            last_disk = disk
+
+            processes = None
+            if now >= next_process_sample:
+                next_process_sample = now + self.process_interval
+                processes = self._sample_processes()
+
+            with self.lock:
+                self.timestamps.append(time.time())
+                self.buffers['cpu'].append(per_core[:self.core_count])
+                self.buffers['cpu_total'].append(sum(per_core) / len(per_core))
+                self.buffers['memory'].append(memory.percent)
+                self.buffers['swap'].append(swap.percent)
+                self.buffers['disk_read'].append(read_rate)
+                self.buffers['disk_write'].append(write_rate)
+                self.memory_info = {'total': memory.total, 'used': memory.used,
+                                    'available': memory.available}
+                if processes is not None:
+                    self.processes = processes
+                self._cpu_time = time.thread_time() - thread_start
+                self._wall_time = time.monotonic() - wall_start
+
+    def _sample_processes(self):
+        # process_iter 会缓存 Process 对象，进程的 cpu_percent 因此是相对上次采样的值
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info', 'num_threads']):
+            info = proc.info
+            memory_info = info.get('memory_info')
+            processes.append({
+                'pid': info['pid'],
+                'name': info.get('name') or '',
+                'cpu_percent': info.get('cpu_percent') or 0.0,
+                'memory_rss': memory_info.rss if memory_info else 0,
+                'num_threads': info.get('num_threads') or 0
+            })
+        processes.sort(key=lambda p: (p['cpu_percent'], p['memory_rss']), reverse=True)
+        return processes[:self.top_processes]
+
+    def get_series(self, name, window=None):
+        """返回 (时间戳数组, 样本数组)，window 为最近多少秒，None 表示全部"""
+        with self.lock:
+            timestamps = self.timestamps.values()[:, 0]
+            values = self.buffers[name].values()
+        if window is not None and len(timestamps):
+            mask = timestamps >= timestamps[-1] - window
+            timestamps, values = timestamps[mask], values[mask]
+        return timestamps, values
+
+    def get_aggregates(self, window=None):
+        """各指标在时间窗口内的 min/max/mean/p95，cpu 为每个核心一列"""
+        return {name: aggregate(self.get_series(name, window)[1]) for name in self.SERIES}
+
+    def get_latest(self):
+        with self.lock:
+            if not len(self.timestamps):
+                return None
+            latest = {name: buffer.latest() for name, buffer in self.buffers.items()}
+            latest['memory_info'] = dict(self.memory_info)
+            return latest
+
+    def get_top_processes(self):
+        with self.lock:
+            return list(self.processes)
+
+    def get_overhead(self):
+        """采样线程占用的CPU百分比（相对单个核心）"""
+        with self.lock:
+            if self._wall_time <= 0:
+                return 0.0
+            return self._cpu_time * 100 / self._wall_time
+
+    def clear(self):
+        with self.lock:
+            self.timestamps.clear()
+            for buffer in self.buffers.values():
+                buffer.clear()
@@ -0,0 +1,207 @@
+import os
+import time
+import heapq
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# 单个文件的元数据，来自 DirEntry.stat()，不再额外调用 getsize
+FileEntry = namedtuple('FileEntry', ['path', 'name', 'size', 'mtime_ns', 'inode', 'dev'])
+
+# 一个目录的列举结果，others 为既不是普通文件也不是目录的条目数（符号链接、失效链接等）
+DirListing = namedtuple('DirListing', ['path', 'files', 'dirs', 'error', 'others'], defaults=(0,))
+
+def default_scan_workers():
+    """默认扫描线程数，目录遍历以I/O等待为主，线程数可以多于CPU核数"""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+def scan_single_directory(path):
+    """用 os.scandir 列举一个目录，返回 DirListing"""
+    files = []
+    dirs = []
+    others = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files.append(FileEntry(entry.path, entry.name, st.st_size,
+                                               st.st_mtime_ns, st.st_ino, st.st_dev))
+                    else:
+                        others += 1
+                except OSError:
+                    others += 1
+    except OSError as e:
+        return DirListing(path, files, dirs, str(e), others)
+    return DirListing(path, files, dirs, None, others)
+
+class ScanProgress:
+    """扫描进度汇总，按时间间隔节流回调，避免频繁刷新界面"""
+    def __init__(self, callback=None, interval=0.5):
+        self.callback = callback
+        self.interval = interval
+        self.dir_count = 0
+        self.file_count = 0
+        self.total_size = 0
+        self.error_count = 0
+        self._last_report = 0.0
+
+    def update(self, listing):
+        self.dir_count += 1
+        self.file_count += len(listing.files)
+        self.total_size += sum(f.size for f in listing.files)
+        if listing.error:
+            self.error_count += 1
+
+        now = time.monotonic()
+        if self.callback and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.callback(self.snapshot(listing.path))
+
+    def snapshot(self, current_path=None):
+        return {
+            'dirs_scanned': self.dir_count,
+            'file_count': self.file_count,
+            'total_size': self.total_size,
+            'errors': self.error_count,
+            'current': current_path
+        }
+
+def iter_directory_listings(root, recursive=True, max_workers=None, cancel_event=None):
+    """并行遍历目录树，逐个产出 DirListing
+
+    子目录一经发现就提交到线程池，各子树并行列举；结果在调用方线程中产出，
+    因此汇总逻辑无需加锁。cancel_event 被设置时停止提交新目录。
+    """
+    if not recursive:
+        yield scan_single_directory(root)
+        return
+
+    workers = max_workers or default_scan_workers()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {executor.submit(scan_single_directory, root)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                listing = future.result()
+                if not (cancel_event and cancel_event.is_set()):
+                    for sub_dir in listing.dirs:
+                        pending.add(executor.submit(scan_single_directory, sub_dir))
+                yield listing
+            if cancel_event and cancel_event.is_set():
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+def scan_directory_tree(root, recursive=True, max_workers=None, progress_callback=None,
+                        cancel_event=None, progress_interval=0.5):
+    """遍历目录树并在每个目录列举完成后更新进度，产出 DirListing"""
+    progress = ScanProgress(progress_callback, progress_interval)
+    for listing in iter_directory_listings(root, recursive, max_workers, cancel_event):
+        progress.update(listing)
+        yield listing
+    if progress_callback:
+        progress_callback(progress.snapshot())
+
+def iter_files(root, recursive=True, max_workers=None, progress_callback=None, cancel_event=None):
+    """遍历目录树中的所有文件，产出 FileEntry"""
+    for listing in scan_directory_tree(root, recursive, max_workers, progress_callback, cancel_event):
+        yield from listing.files
+
+def iter_tree_bottom_up(root, combine, max_workers=None, progress_callback=None, cancel_event=None,
+                        progress_interval=0.5, listing_callback=None):
+    """并行遍历目录树，按后序（子目录先于父目录）产出 (DirListing, 汇总结果)
+
+    每个目录只列举一次；所有子目录完成后调用 combine(listing, 子目录结果列表)
+    得到该目录的结果并记住，父目录直接使用，不再重新列举。被取消时未完成的目录不会产出。
+    listing_callback(listing, 父目录) 在每个目录列举完成时调用，可用于在子树完成前汇报部分结果。
+    """
+    parent_of = {}
+    waiting = {}           # 目录 -> [listing, 未完成的子目录数, 子目录结果列表]
+
+    for listing in scan_directory_tree(root, True, max_workers, progress_callback,
+                                       cancel_event, progress_interval):
+        for sub_dir in listing.dirs:
+            parent_of[sub_dir] = listing.path
+        waiting[listing.path] = [listing, len(listing.dirs), []]
+        if listing_callback:
+            listing_callback(listing, parent_of.get(listing.path))
+
+        path = listing.path
+        while path is not None:
+            node = waiting[path]
+            if node[1] > 0:
+                break
+            del waiting[path]
+            result = combine(node[0], node[2])
+            yield node[0], result
+
+            parent = parent_of.pop(path, None)
+            if parent is not None:
+                parent_node = waiting[parent]
+                parent_node[1] -= 1
+                parent_node[2].append(result)
+            path = parent
+
+def size_bucket(size):
+    """对数刻度的大小分桶：0号桶为空文件，第b号桶覆盖 [2^(b-1), 2^b) 字节"""
+    return size.bit_length() if size > 0 else 0
+
+def size_bucket_label(bucket):
+    """大小分桶的显示文本"""
+    if bucket == 0:
+        return "0 B"
+    units = ["B", "KB", "MB", "GB", "TB", "PB"]
+
+    def fmt(value):
+        unit = 0
+        while value >= 1024 and unit < len(units) - 1:
+            value //= 1024
+            unit += 1
+        return f"{value} {units[unit]}"
+
+    return f"{fmt(1 << (bucket - 1))} - {fmt(1 << bucket)}"
+
+class TopKTracker:
+    """用最小堆维护超过阈值的最大K个文件，内存占用与文件总数无关"""
+    def __init__(self, k=100, threshold=0):
+        self.k = k
+        self.threshold = threshold
+        self.heap = []
+        self.total_count = 0
+        self.total_size = 0
+
+    def add(self, size, path):
+        if size <= self.threshold:
+            return
+        self.total_count += 1
+        self.total_size += size
+        if self.k <= 0:
+            return
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (size, path))
+        elif size > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (size, path))
+
+    def items(self):
+        """按大小降序返回 (size, path)"""
+        return sorted(self.heap, reverse=True)
+
+class SizeHistogram:
+    """按扩展名统计对数刻度的文件大小分布"""
+    def __init__(self):
+        self.counts = defaultdict(lambda: defaultdict(int))
+
+    def add(self, ext, size):
+        self.counts[ext][size_bucket(size)] += 1
+
+    def add_count(self, ext, bucket, count):
+        self.counts[ext][bucket] += count
+
+    def to_dict(self):
+        return {ext: dict(sorted(buckets.items())) for ext, buckets in self.counts.items()}
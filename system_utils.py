@@ -1,35 +1,137 @@
 import os
-import hashlib
+import sys
+import stat
 import shutil
 import re
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import scan_utils
+import hash_utils
+import rename_utils
 
-def find_duplicate_files(directory, include_subdirs=True):
-    """查找重复文件"""
+PARTIAL_HASH_SIZE = 64 * 1024
+
+def get_partial_file_hash(file_path, size, block_size=PARTIAL_HASH_SIZE, algorithm='md5'):
+    """只读取文件首尾各block_size字节计算哈希，返回 (哈希值, 读取字节数)"""
+    try:
+        hash_md5 = hash_utils.new_hasher(algorithm)
+        with open(file_path, "rb") as f:
+            if size <= block_size * 2:
+                data = f.read()
+                hash_md5.update(data)
+                return hash_md5.hexdigest(), len(data)
+            head = f.read(block_size)
+            f.seek(-block_size, os.SEEK_END)
+            tail = f.read(block_size)
+            hash_md5.update(head)
+            hash_md5.update(tail)
+            return hash_md5.hexdigest(), len(head) + len(tail)
+    except Exception:
+        return None, 0
+
+def find_duplicate_files(directory, include_subdirs=True, progress_callback=None, stats=None,
+                         algorithm='md5', max_workers=None, hash_cache=None):
+    """查找重复文件
+    
+    分三个阶段，尽量少读数据：
+    1. 按扫描得到的文件大小分组，大小唯一的文件不可能重复，不读取；
+    2. 同大小的文件只读首尾各64KB计算部分哈希（小文件即为全文哈希）；
+    3. 部分哈希仍相同的文件才计算全文哈希。
+    阶段2、3在HashPool线程池中并行执行。传入hash_cache时，未变化的文件直接使用缓存的全文哈希，
+    部分哈希也以单独的键缓存；同大小的组内有未缓存全文哈希的文件时，仍先比较整组的部分哈希，
+    只对部分哈希与组内其他文件相同的文件计算全文哈希，因此重复运行基本只需遍历元数据。
+    传入stats字典时写入 total_bytes（候选文件总字节数）和 bytes_read（实际读取字节数）等统计。
+    """
     try:
+        if stats is None:
+            stats = {}
+        stats.update({'file_count': 0, 'total_bytes': 0, 'bytes_read': 0,
+                      'partial_hashed': 0, 'full_hashed': 0, 'cache_hits': 0})
+        pool = hash_utils.HashPool(algorithm, max_workers=max_workers, cache=hash_cache)
+        
+        # 阶段1：按大小分组
+        size_groups = defaultdict(list)
+        for entry in scan_utils.iter_files(directory, recursive=include_subdirs,
+                                           progress_callback=progress_callback):
+            size_groups[entry.size].append(entry)
+            stats['file_count'] += 1
+            stats['total_bytes'] += entry.size
+        
+        partial_key = f"{algorithm}:partial"
         file_hashes = defaultdict(list)
+        candidates = {}
+        full_cached = set()
+        partial_groups = defaultdict(list)
+        partial_tasks = []
+        full_tasks = []
+        for size, entries in size_groups.items():
+            if len(entries) < 2:
+                continue
+            if size == 0:
+                # 空文件内容必然相同
+                file_hashes[hash_utils.new_hasher(algorithm).hexdigest()].extend(e.path for e in entries)
+                continue
+            
+            full_digests = {}
+            for entry in entries:
+                digest = hash_cache.get_entry(entry, algorithm) if hash_cache is not None else None
+                if digest:
+                    full_digests[entry.path] = digest
+                    file_hashes[digest].append(entry.path)
+                    full_cached.add(entry.path)
+                    stats['cache_hits'] += 1
+            if len(full_digests) == len(entries):
+                continue
+            
+            # 组内所有文件都参与部分哈希比较，已缓存的部分哈希不再读取
+            small = size <= PARTIAL_HASH_SIZE * 2
+            for entry in entries:
+                candidates[entry.path] = entry
+                if small:
+                    # 小文件的部分哈希即全文哈希
+                    partial_hash = full_digests.get(entry.path)
+                elif hash_cache is not None:
+                    partial_hash = hash_cache.get_entry(entry, partial_key)
+                else:
+                    partial_hash = None
+                if partial_hash:
+                    partial_groups[(size, partial_hash)].append(entry.path)
+                else:
+                    partial_tasks.append(entry.path)
+        
+        # 阶段2：首尾部分哈希
+        partial_func = lambda path: get_partial_file_hash(path, candidates[path].size, algorithm=algorithm)
+        for file_path, result in pool.map_files(partial_func, partial_tasks):
+            partial_hash, bytes_read = result if result else (None, 0)
+            stats['bytes_read'] += bytes_read
+            stats['partial_hashed'] += 1
+            if partial_hash:
+                entry = candidates[file_path]
+                partial_groups[(entry.size, partial_hash)].append(file_path)
+                if hash_cache is not None:
+                    key = algorithm if entry.size <= PARTIAL_HASH_SIZE * 2 else partial_key
+                    hash_cache.store(entry.dev, entry.inode, entry.size, entry.mtime_ns, key, partial_hash)
+        
+        for (size, partial_hash), paths in partial_groups.items():
+            uncached = [path for path in paths if path not in full_cached]
+            if len(paths) < 2 or not uncached:
+                continue
+            if size <= PARTIAL_HASH_SIZE * 2:
+                # 小文件的部分哈希已覆盖全部内容
+                file_hashes[partial_hash].extend(uncached)
+            else:
+                full_tasks.extend(uncached)
         
-        if include_subdirs:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        file_hash = get_file_hash(file_path)
-                        if file_hash:
-                            file_hashes[file_hash].append(file_path)
-                    except Exception:
-                        continue
-        else:
-            for file in os.listdir(directory):
-                file_path = os.path.join(directory, file)
-                if os.path.isfile(file_path):
-                    try:
-                        file_hash = get_file_hash(file_path)
-                        if file_hash:
-                            file_hashes[file_hash].append(file_path)
-                    except Exception:
-                        continue
+        # 阶段3：全文哈希
+        for file_path, file_hash in pool.hash_files(full_tasks):
+            stats['full_hashed'] += 1
+            if file_hash:
+                stats['bytes_read'] += candidates[file_path].size
+                file_hashes[file_hash].append(file_path)
+        
+        if hash_cache is not None:
+            hash_cache.flush()
         
         # 只返回有重复的文件
         duplicates = {hash_val: paths for hash_val, paths in file_hashes.items() if len(paths) > 1}
@@ -38,72 +140,94 @@ def find_duplicate_files(directory, include_subdirs=True):
     except Exception as e:
         return None, str(e)
 
-def get_file_hash(file_path, chunk_size=8192):
-    """计算文件MD5哈希值"""
+def get_file_hash(file_path, chunk_size=hash_utils.DEFAULT_BUFFER_SIZE, algorithm='md5'):
+    """计算文件哈希值（默认MD5）"""
     try:
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(chunk_size), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return hash_utils.hash_file(file_path, algorithm, chunk_size)
     except Exception:
         return None
 
-def batch_rename_files(directory, pattern, replacement, use_regex=False, include_extension=False):
-    """批量重命名文件"""
-    try:
-        renamed_files = []
-        errors = []
-        
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if not os.path.isfile(file_path):
-                continue
-            
-            # 获取文件名和扩展名
-            name, ext = os.path.splitext(filename)
-            target_name = filename if include_extension else name
-            
-            # 执行重命名规则
-            if use_regex:
-                try:
-                    new_name = re.sub(pattern, replacement, target_name)
-                except re.error as e:
-                    errors.append(f"{filename}: 正则表达式错误 - {str(e)}")
-                    continue
-            else:
-                new_name = target_name.replace(pattern, replacement)
-            
-            # 如果不包含扩展名，需要重新加上
-            if not include_extension:
-                new_filename = new_name + ext
+def plan_batch_rename_files(directory, pattern, replacement, use_regex=False, include_extension=False):
+    """计算查找替换重命名计划（不修改任何文件），正则表达式错误时抛出 re.error"""
+    files, existing_names = rename_utils.list_directory(directory)
+    
+    if use_regex:
+        # 正则只编译一次
+        regex = re.compile(pattern)
+        substitute = lambda text: regex.sub(replacement, text)
+    else:
+        substitute = lambda text: text.replace(pattern, replacement)
+    
+    proposals = []
+    errors = []
+    for entry in files:
+        filename = entry.name
+        try:
+            if include_extension:
+                new_filename = substitute(filename)
             else:
-                new_filename = new_name
-            
-            # 检查是否有变化
-            if new_filename == filename:
-                continue
-            
-            new_file_path = os.path.join(directory, new_filename)
-            
-            # 检查目标文件是否已存在
-            if os.path.exists(new_file_path):
-                errors.append(f"{filename} -> {new_filename}: 目标文件已存在")
-                continue
-            
-            try:
-                os.rename(file_path, new_file_path)
-                renamed_files.append((filename, new_filename))
-            except Exception as e:
-                errors.append(f"{filename} -> {new_filename}: {str(e)}")
-        
-        return renamed_files, errors
-        
+                name, ext = os.path.splitext(filename)
+                new_filename = substitute(name) + ext
+        except re.error as e:
+            errors.append(f"{filename}: 正则表达式错误 - {str(e)}")
+            continue
+        proposals.append((filename, new_filename))
+    
+    plan = rename_utils.build_rename_plan(directory, proposals, existing_names, on_collision='skip')
+    plan.errors = errors + plan.errors
+    return plan
+
+def _run_rename_plan(plan, dry_run):
+    if dry_run:
+        return list(plan.items), list(plan.errors)
+    return rename_utils.execute_rename_plan(plan)
+
+def batch_rename_files(directory, pattern, replacement, use_regex=False, include_extension=False,
+                       dry_run=False):
+    """批量重命名文件
+    
+    一次 scandir 列出目录，在内存中计算完整的重命名计划，再经临时文件名分两步执行并写入撤销日志。
+    """
+    try:
+        plan = plan_batch_rename_files(directory, pattern, replacement, use_regex, include_extension)
+        return _run_rename_plan(plan, dry_run)
+    except re.error as e:
+        return None, [f"正则表达式错误 - {str(e)}"]
     except Exception as e:
         return None, [str(e)]
 
-def compare_directories(dir1, dir2, compare_content=False):
-    """比较两个目录"""
+COMPARE_CHUNK_SIZE = 1024 * 1024
+
+def compare_file_contents(file1, file2, chunk_size=COMPARE_CHUNK_SIZE):
+    """逐块比较两个文件内容，遇到第一个不同的块立即返回，返回 (是否相同, 读取字节数)"""
+    buffer1 = bytearray(chunk_size)
+    buffer2 = bytearray(chunk_size)
+    bytes_read = 0
+    with open(file1, 'rb', buffering=0) as f1, open(file2, 'rb', buffering=0) as f2:
+        while True:
+            n1 = f1.readinto(buffer1)
+            n2 = f2.readinto(buffer2)
+            bytes_read += n1 + n2
+            if n1 != n2 or buffer1[:n1] != buffer2[:n2]:
+                return False, bytes_read
+            if not n1:
+                return True, bytes_read
+
+def _collect_relative_files(directory):
+    files = {}
+    for entry in scan_utils.iter_files(directory):
+        files[os.path.relpath(entry.path, directory)] = entry
+    return files
+
+def compare_directories(dir1, dir2, compare_content=False, algorithm='md5', hash_cache=None,
+                        quick_check=True, result_callback=None, max_workers=None):
+    """比较两个目录
+    
+    两个目录树并行扫描。比较内容时先用元数据分类：大小不同直接判为不同；
+    quick_check为True时大小和修改时间都相同（或为同一文件）判为相同；只有剩下无法确定的文件才读取，
+    若哈希缓存中两边都有结果则直接比较哈希，否则在线程池中逐块比较并在第一个不同的块处提前结束。
+    result_callback(类别, 相对路径列表) 会在结果产生时分批调用，类别为 same_content 或 different_content。
+    """
     try:
         comparison_result = {
             "only_in_dir1": [],
@@ -113,122 +237,448 @@ def compare_directories(dir1, dir2, compare_content=False):
             "same_content": []
         }
         
-        # 获取所有文件
-        files1 = set()
-        files2 = set()
-        
-        for root, dirs, files in os.walk(dir1):
-            for file in files:
-                rel_path = os.path.relpath(os.path.join(root, file), dir1)
-                files1.add(rel_path)
-        
-        for root, dirs, files in os.walk(dir2):
-            for file in files:
-                rel_path = os.path.relpath(os.path.join(root, file), dir2)
-                files2.add(rel_path)
+        # 并行扫描两个目录
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future1 = executor.submit(_collect_relative_files, dir1)
+            future2 = executor.submit(_collect_relative_files, dir2)
+            files1 = future1.result()
+            files2 = future2.result()
         
         # 分类文件
-        comparison_result["only_in_dir1"] = list(files1 - files2)
-        comparison_result["only_in_dir2"] = list(files2 - files1)
-        comparison_result["common_files"] = list(files1 & files2)
+        names1 = set(files1)
+        names2 = set(files2)
+        comparison_result["only_in_dir1"] = list(names1 - names2)
+        comparison_result["only_in_dir2"] = list(names2 - names1)
+        comparison_result["common_files"] = list(names1 & names2)
         
         # 如果需要比较内容
         if compare_content:
+            stats = {'size_differs': 0, 'quick_check_same': 0, 'cache_compared': 0,
+                     'content_compared': 0, 'bytes_read': 0}
+            comparison_result["compare_stats"] = stats
+            
+            def report(category, files):
+                comparison_result[category].extend(files)
+                if result_callback and files:
+                    result_callback(category, files)
+            
+            ambiguous = []
+            same = []
+            different = []
             for file in comparison_result["common_files"]:
-                file1_path = os.path.join(dir1, file)
-                file2_path = os.path.join(dir2, file)
-                
-                try:
-                    hash1 = get_file_hash(file1_path)
-                    hash2 = get_file_hash(file2_path)
-                    
-                    if hash1 == hash2:
-                        comparison_result["same_content"].append(file)
+                entry1 = files1[file]
+                entry2 = files2[file]
+                if entry1.size != entry2.size:
+                    stats['size_differs'] += 1
+                    different.append(file)
+                elif (entry1.inode and entry1.inode == entry2.inode and entry1.dev == entry2.dev) or \
+                        (quick_check and entry1.mtime_ns == entry2.mtime_ns):
+                    stats['quick_check_same'] += 1
+                    same.append(file)
+                elif hash_cache is not None:
+                    digest1 = hash_cache.get_entry(entry1, algorithm)
+                    digest2 = hash_cache.get_entry(entry2, algorithm) if digest1 else None
+                    if digest1 and digest2:
+                        stats['cache_compared'] += 1
+                        (same if digest1 == digest2 else different).append(file)
                     else:
-                        comparison_result["different_content"].append(file)
-                except Exception:
-                    comparison_result["different_content"].append(file)  # 无法比较，归为不同
+                        ambiguous.append(file)
+                else:
+                    ambiguous.append(file)
+            report("same_content", same)
+            report("different_content", different)
+            
+            # 逐块比较剩余的文件
+            pool = hash_utils.HashPool(algorithm, max_workers=max_workers, cache=hash_cache)
+            pairs = {files1[file].path: file for file in ambiguous}
+            
+            def compare_pair(path1):
+                return compare_file_contents(path1, files2[pairs[path1]].path)
+            
+            batch = {"same_content": [], "different_content": []}
+            for path1, result in pool.map_files(compare_pair, pairs):
+                equal, bytes_read = result if result else (False, 0)  # 无法比较，归为不同
+                stats['content_compared'] += 1
+                stats['bytes_read'] += bytes_read
+                batch["same_content" if equal else "different_content"].append(pairs[path1])
+                if len(batch["same_content"]) + len(batch["different_content"]) >= 100:
+                    for category, files in batch.items():
+                        report(category, files)
+                    batch = {"same_content": [], "different_content": []}
+            for category, files in batch.items():
+                report(category, files)
+            
+            if hash_cache is not None:
+                hash_cache.flush()
         
         return comparison_result, None
         
     except Exception as e:
         return None, str(e)
 
-def find_empty_directories(root_directory, remove_empty=False):
-    """查找空文件夹"""
+SYNC_BLOCK_SIZE = 1024 * 1024
+DELTA_COPY_THRESHOLD = 64 * 1024 * 1024
+
+def plan_directory_sync(dir1, dir2, mode='one_way', delete_extra=False, quick_check=True,
+                        hash_cache=None, max_workers=None):
+    """根据 compare_directories 的结果生成同步计划
+    
+    mode 为 'one_way' 时以目录1为准同步到目录2，delete_extra 为True时删除目录2中多出的文件；
+    mode 为 'two_way' 时双向补齐缺失文件，内容不同的文件以修改时间较新的一方为准（双向模式不删除文件）。
+    返回动作列表，每项为 {'action': 'copy'/'delete', 'src', 'dst', 'path', 'size'}。
+    """
+    result, error = compare_directories(dir1, dir2, compare_content=True, hash_cache=hash_cache,
+                                        quick_check=quick_check, max_workers=max_workers)
+    if error:
+        raise RuntimeError(error)
+    
+    actions = []
+    
+    def add_copy(rel_path, src_dir, dst_dir):
+        src = os.path.join(src_dir, rel_path)
+        try:
+            size = os.path.getsize(src)
+        except OSError:
+            return
+        actions.append({'action': 'copy', 'path': rel_path, 'src': src,
+                        'dst': os.path.join(dst_dir, rel_path), 'size': size})
+    
+    for rel_path in sorted(result["only_in_dir1"]):
+        add_copy(rel_path, dir1, dir2)
+    
+    if mode == 'two_way':
+        for rel_path in sorted(result["only_in_dir2"]):
+            add_copy(rel_path, dir2, dir1)
+        for rel_path in sorted(result["different_content"]):
+            try:
+                newer_is_1 = (os.stat(os.path.join(dir1, rel_path)).st_mtime_ns >=
+                              os.stat(os.path.join(dir2, rel_path)).st_mtime_ns)
+            except OSError:
+                continue
+            if newer_is_1:
+                add_copy(rel_path, dir1, dir2)
+            else:
+                add_copy(rel_path, dir2, dir1)
+    else:
+        for rel_path in sorted(result["different_content"]):
+            add_copy(rel_path, dir1, dir2)
+        if delete_extra:
+            for rel_path in sorted(result["only_in_dir2"]):
+                path = os.path.join(dir2, rel_path)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = 0
+                actions.append({'action': 'delete', 'path': rel_path, 'src': None,
+                                'dst': path, 'size': size})
+    
+    return actions
+
+def can_delta_copy(dst):
+    """目标是普通文件且没有其他硬链接时才适合原地增量复制"""
+    try:
+        st = os.lstat(dst)
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_nlink == 1
+
+def delta_copy_file(src, dst, block_size=SYNC_BLOCK_SIZE):
+    """只重写目标文件中与源文件不同的块，返回 (读取字节数, 写入字节数)
+    
+    直接在目标文件上原地修改，不是崩溃安全的：中途中断或出错会留下新旧内容混合的文件，
+    并且会写穿指向同一inode的其他硬链接。调用前应先用 can_delta_copy 检查。
+    """
+    bytes_read = 0
+    bytes_written = 0
+    src_buffer = bytearray(block_size)
+    dst_buffer = bytearray(block_size)
+    with open(src, 'rb', buffering=0) as fsrc, open(dst, 'r+b', buffering=0) as fdst:
+        offset = 0
+        while True:
+            n = fsrc.readinto(src_buffer)
+            if not n:
+                break
+            m = fdst.readinto(dst_buffer)
+            bytes_read += n + m
+            if n != m or src_buffer[:n] != dst_buffer[:n]:
+                fdst.seek(offset)
+                fdst.write(memoryview(src_buffer)[:n])
+                bytes_written += n
+            offset += n
+            fdst.seek(offset)
+        fdst.truncate(offset)
+    shutil.copystat(src, dst)
+    return bytes_read, bytes_written
+
+def copy_file_atomic(src, dst):
+    """复制到同目录的临时文件后替换目标，shutil.copyfile 在支持的平台上使用 sendfile 等零拷贝方式"""
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp_path = f"{dst}.sync-tmp"
+    try:
+        shutil.copyfile(src, tmp_path)
+        shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return os.path.getsize(dst)
+
+def sync_directories(dir1, dir2, mode='one_way', delete_extra=False, dry_run=True, quick_check=True,
+                     hash_cache=None, max_workers=4, delta_threshold=DELTA_COPY_THRESHOLD,
+                     progress_callback=None):
+    """同步两个目录
+    
+    复制在线程池中并行执行；目标已存在且不小于delta_threshold的大文件只重写变化的块，
+    目标为符号链接或有其他硬链接时改为复制到临时文件后替换。
+    dry_run为True时只返回同步计划和预计字节数。
+    """
+    try:
+        start_time = time.time()
+        actions = plan_directory_sync(dir1, dir2, mode, delete_extra, quick_check, hash_cache)
+        copy_actions = [a for a in actions if a['action'] == 'copy']
+        delete_actions = [a for a in actions if a['action'] == 'delete']
+        
+        report = {
+            "dry_run": dry_run,
+            "mode": mode,
+            "actions": actions,
+            "copy_count": len(copy_actions),
+            "delete_count": len(delete_actions),
+            "bytes_planned": sum(a['size'] for a in copy_actions),
+            "copied": [],
+            "deleted": [],
+            "errors": [],
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "delta_copied": 0,
+            "elapsed": 0.0,
+            "throughput_mb_s": 0.0
+        }
+        if dry_run:
+            report["elapsed"] = time.time() - start_time
+            return report, None
+        
+        def run_copy(action):
+            src, dst = action['src'], action['dst']
+            if action['size'] >= delta_threshold and can_delta_copy(dst):
+                bytes_read, bytes_written = delta_copy_file(src, dst)
+                return bytes_read, bytes_written, True
+            size = copy_file_atomic(src, dst)
+            return size, size, False
+        
+        done_bytes = 0
+        last_report = 0.0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_copy, action): action for action in copy_actions}
+            for future in as_completed(futures):
+                action = futures[future]
+                try:
+                    bytes_read, bytes_written, delta = future.result()
+                    report["copied"].append(action['path'])
+                    report["bytes_read"] += bytes_read
+                    report["bytes_written"] += bytes_written
+                    if delta:
+                        report["delta_copied"] += 1
+                except (OSError, shutil.Error) as e:
+                    report["errors"].append(f"{action['path']}: {str(e)}")
+                
+                done_bytes += action['size']
+                now = time.time()
+                if progress_callback and now - last_report >= 0.5:
+                    last_report = now
+                    progress_callback(int(done_bytes * 100 / max(report["bytes_planned"], 1)))
+        
+        for action in delete_actions:
+            try:
+                os.remove(action['dst'])
+                report["deleted"].append(action['path'])
+            except OSError as e:
+                report["errors"].append(f"{action['path']}: {str(e)}")
+        
+        elapsed = time.time() - start_time
+        report["elapsed"] = elapsed
+        if elapsed > 0:
+            report["throughput_mb_s"] = round(report["bytes_read"] / (1024 * 1024) / elapsed, 2)
+        if progress_callback:
+            progress_callback(100)
+        return report, None
+        
+    except Exception as e:
+        return None, str(e)
+
+def find_empty_directories(root_directory, remove_empty=False, progress_callback=None,
+                           max_workers=None, cancel_event=None):
+    """查找空文件夹
+    
+    自底向上一次遍历：每个目录只列举一次，子目录是否为空的结果直接用于判断父目录，
+    只包含空目录的嵌套目录也视为空。remove_empty为True时先删除叶子目录，整条空目录链一次删完。
+    """
     try:
         empty_dirs = []
         removed_dirs = []
+        errors = []
+        
+        def is_empty(listing, child_results):
+            # 列举失败或包含任何非目录条目时都不视为空
+            return (listing.error is None and not listing.files and not listing.others
+                    and all(child_results))
         
-        # 从底层开始遍历，这样可以正确处理嵌套的空目录
-        for root, dirs, files in os.walk(root_directory, topdown=False):
+        for listing, empty in scan_utils.iter_tree_bottom_up(
+                root_directory, is_empty, max_workers, progress_callback, cancel_event):
             # 跳过根目录本身
-            if root == root_directory:
+            if not empty or listing.path == root_directory:
                 continue
             
-            # 检查目录是否为空
-            try:
-                if not os.listdir(root):  # 目录为空
-                    empty_dirs.append(root)
-                    if remove_empty:
-                        os.rmdir(root)
-                        removed_dirs.append(root)
-            except (OSError, PermissionError):
-                continue
+            empty_dirs.append(listing.path)
+            if remove_empty:
+                try:
+                    os.rmdir(listing.path)
+                    removed_dirs.append(listing.path)
+                except OSError as e:
+                    errors.append(f"{listing.path}: {str(e)}")
         
         if remove_empty:
-            return {"empty_dirs": empty_dirs, "removed_dirs": removed_dirs}, None
+            return {"empty_dirs": empty_dirs, "removed_dirs": removed_dirs, "errors": errors}, None
         else:
             return {"empty_dirs": empty_dirs}, None
         
     except Exception as e:
         return None, str(e)
 
-def clean_system_temp(dry_run=True):
-    """清理系统临时文件"""
+TEMP_MAX_AGE = 86400  # 超过1天未修改的临时文件才清理
+
+def get_system_temp_dirs():
+    """系统临时目录列表，已去重"""
+    if os.name == 'nt':  # Windows
+        candidates = [
+            os.environ.get('TEMP', ''),
+            os.environ.get('TMP', ''),
+            os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Temp'),
+        ]
+    else:  # Unix/Linux/Mac
+        candidates = ['/tmp', '/var/tmp']
+    
+    temp_dirs = []
+    seen = set()
+    for temp_dir in candidates:
+        if not temp_dir or not os.path.isdir(temp_dir):
+            continue
+        key = os.path.normcase(os.path.realpath(temp_dir))
+        if key not in seen:
+            seen.add(key)
+            temp_dirs.append(temp_dir)
+    return temp_dirs
+
+def _collect_old_temp_items(temp_dir, cutoff_ns, max_workers=None, progress_callback=None):
+    """自底向上遍历一个临时目录，返回 (可删除项目列表, 错误列表)
+    
+    每个目录汇总递归大小和子树中最新的修改时间；整个子树都早于cutoff_ns的目录作为一项删除，
+    其中的内容不再单独列出。含有符号链接、套接字等特殊条目或无法列举的目录不会被整体删除；
+    指向文件的符号链接不计入文件，不统计大小也不删除。
+    """
+    items = []
+    errors = []
+    
+    def combine(listing, children):
+        try:
+            newest = os.stat(listing.path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            newest = None
+        if listing.error:
+            errors.append(f"{listing.path}: {listing.error}")
+        
+        # scandir 的 is_file() 跟随符号链接，链接本身按特殊条目处理
+        files = [f for f in listing.files if not os.path.islink(f.path)]
+        has_links = len(files) < len(listing.files)
+        size = sum(f.size for f in files) + sum(child['size'] for child in children)
+        is_old = (newest is not None and listing.error is None and not listing.others
+                  and not has_links and all(child['old'] for child in children))
+        if is_old:
+            for f in files:
+                newest = max(newest, f.mtime_ns)
+            for child in children:
+                newest = max(newest, child['newest'])
+            is_old = newest < cutoff_ns
+        
+        if not is_old or listing.path == temp_dir:
+            # 本目录保留，其中整体过期的子目录和过期文件分别删除
+            items.extend({'path': child['path'], 'size': child['size'], 'is_dir': True}
+                         for child in children if child['old'])
+            items.extend({'path': f.path, 'size': f.size, 'is_dir': False}
+                         for f in files if f.mtime_ns < cutoff_ns)
+        
+        return {'path': listing.path, 'size': size, 'newest': newest or 0, 'old': is_old}
+    
+    for _ in scan_utils.iter_tree_bottom_up(temp_dir, combine, max_workers, progress_callback):
+        pass
+    return items, errors
+
+def _remove_temp_item(item):
+    if not item['is_dir']:
+        os.remove(item['path'])
+        return []
+    
+    failures = []
+    
+    def on_error(func, path, exc):
+        # onerror 传入 exc_info 元组，onexc 直接传入异常
+        if isinstance(exc, tuple):
+            exc = exc[1]
+        failures.append(f"{path}: {exc}")
+    
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(item['path'], onexc=on_error)
+    else:
+        shutil.rmtree(item['path'], onerror=on_error)
+    return failures
+
+def clean_system_temp(dry_run=True, max_age=TEMP_MAX_AGE, temp_dirs=None, max_workers=None,
+                      progress_callback=None):
+    """清理系统临时文件
+    
+    各临时目录并行扫描，只删除整个子树都超过max_age秒未修改的文件和目录，删除也在线程池中并行执行。
+    预览和实际清理使用同一份清单，cleaned_size 为递归统计的真实大小。
+    """
     try:
         cleaned_files = []
         cleaned_size = 0
         errors = []
         
-        # Windows临时目录
-        temp_dirs = []
-        if os.name == 'nt':  # Windows
-            temp_dirs = [
-                os.environ.get('TEMP', ''),
-                os.environ.get('TMP', ''),
-                os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Temp'),
-            ]
-        else:  # Unix/Linux/Mac
-            temp_dirs = ['/tmp', '/var/tmp']
-        
-        for temp_dir in temp_dirs:
-            if not temp_dir or not os.path.exists(temp_dir):
-                continue
-            
-            try:
-                for item in os.listdir(temp_dir):
-                    item_path = os.path.join(temp_dir, item)
-                    
-                    # 跳过正在使用的文件
+        if temp_dirs is None:
+            temp_dirs = get_system_temp_dirs()
+        cutoff_ns = time.time_ns() - int(max_age * 1e9)
+        
+        items = []
+        with ThreadPoolExecutor(max_workers=max(1, len(temp_dirs))) as executor:
+            futures = [executor.submit(_collect_old_temp_items, temp_dir, cutoff_ns, max_workers,
+                                       progress_callback)
+                       for temp_dir in temp_dirs if os.path.isdir(temp_dir)]
+            for future in futures:
+                temp_items, temp_errors = future.result()
+                items.extend(temp_items)
+                errors.extend(temp_errors)
+        
+        if dry_run:
+            cleaned_files = [item['path'] for item in items]
+            cleaned_size = sum(item['size'] for item in items)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers or 8) as executor:
+                futures = {executor.submit(_remove_temp_item, item): item for item in items}
+                for future in as_completed(futures):
+                    item = futures[future]
                     try:
-                        if os.path.isfile(item_path):
-                            # 检查文件是否超过1天未修改
-                            if time.time() - os.path.getmtime(item_path) > 86400:
-                                file_size = os.path.getsize(item_path)
-                                if not dry_run:
-                                    os.remove(item_path)
-                                cleaned_files.append(item_path)
-                                cleaned_size += file_size
-                        elif os.path.isdir(item_path):
-                            # 对于目录，递归删除（谨慎操作）
-                            if not dry_run:
-                                shutil.rmtree(item_path, ignore_errors=True)
-                            cleaned_files.append(item_path)
-                    except (OSError, PermissionError) as e:
-                        errors.append(f"{item_path}: {str(e)}")
-            except (OSError, PermissionError):
-                continue
+                        failures = future.result()
+                    except OSError as e:
+                        errors.append(f"{item['path']}: {str(e)}")
+                        continue
+                    if failures:
+                        errors.extend(failures)
+                        continue
+                    cleaned_files.append(item['path'])
+                    cleaned_size += item['size']
         
         return {
             "cleaned_files": cleaned_files,
@@ -257,67 +707,63 @@ def generate_numbered_names(base_name, count, start_num=1, padding=3):
     except Exception as e:
         return None, str(e)
 
-def batch_rename_with_sequence(directory, base_name, start_num=1, padding=3):
+def plan_batch_rename_with_sequence(directory, base_name, start_num=1, padding=3):
+    """计算序列重命名计划（不修改任何文件）"""
+    files, existing_names = rename_utils.list_directory(directory)  # 按名称排序
+    
+    # 获取扩展名（使用第一个文件的扩展名，或者允许用户指定）
+    if files:
+        _, default_ext = os.path.splitext(files[0].name)
+    else:
+        default_ext = ""
+    
+    name_base, ext = os.path.splitext(base_name)
+    if not ext:
+        ext = default_ext
+    
+    proposals = [(entry.name, f"{name_base}_{str(start_num + i).zfill(padding)}{ext}")
+                 for i, entry in enumerate(files)]
+    # 序列名称与待重命名文件的原名重叠时由两阶段执行处理，只有被其他条目占用时才跳过
+    return rename_utils.build_rename_plan(directory, proposals, existing_names, on_collision='skip')
+
+def batch_rename_with_sequence(directory, base_name, start_num=1, padding=3, dry_run=False):
     """批量重命名为有序序列"""
     try:
-        files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
-        files.sort()  # 按名称排序
-        
-        renamed_files = []
-        errors = []
-        
-        # 获取扩展名（使用第一个文件的扩展名，或者允许用户指定）
-        if files:
-            _, default_ext = os.path.splitext(files[0])
-        else:
-            default_ext = ""
-        
-        name_base, ext = os.path.splitext(base_name)
-        if not ext:
-            ext = default_ext
-        
-        for i, old_filename in enumerate(files):
-            old_path = os.path.join(directory, old_filename)
-            
-            # 生成新文件名
-            num = start_num + i
-            padded_num = str(num).zfill(padding)
-            new_filename = f"{name_base}_{padded_num}{ext}"
-            new_path = os.path.join(directory, new_filename)
-            
-            # 检查目标文件是否已存在
-            if os.path.exists(new_path):
-                errors.append(f"{old_filename} -> {new_filename}: 目标文件已存在")
-                continue
-            
-            try:
-                os.rename(old_path, new_path)
-                renamed_files.append((old_filename, new_filename))
-            except Exception as e:
-                errors.append(f"{old_filename} -> {new_filename}: {str(e)}")
-        
-        return renamed_files, errors
-        
+        plan = plan_batch_rename_with_sequence(directory, base_name, start_num, padding)
+        return _run_rename_plan(plan, dry_run)
+    except Exception as e:
+        return None, [str(e)]
+
+def undo_last_rename(directory):
+    """撤销该目录最近一次批量重命名，返回 (恢复列表, 错误列表)"""
+    try:
+        return rename_utils.undo_last_rename(directory)
     except Exception as e:
         return None, [str(e)]
 
-def get_directory_size(directory):
-    """计算目录大小"""
+def get_directory_size(directory, progress_callback=None, file_index=None):
+    """计算目录大小，传入file_index时增量刷新索引后从索引统计"""
     try:
+        if file_index is not None:
+            file_index.refresh(directory, progress_callback=progress_callback)
+            summary = file_index.get_directory_summary(directory)
+            total_size = summary['total_size']
+            return {
+                "total_size": total_size,
+                "file_count": summary['file_count'],
+                "dir_count": summary['dir_count'],
+                "size_mb": round(total_size / (1024 * 1024), 2),
+                "size_gb": round(total_size / (1024 * 1024 * 1024), 3)
+            }, None
+        
         total_size = 0
         file_count = 0
         dir_count = 0
         
-        for root, dirs, files in os.walk(directory):
-            dir_count += len(dirs)
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    file_size = os.path.getsize(file_path)
-                    total_size += file_size
-                    file_count += 1
-                except (OSError, FileNotFoundError):
-                    continue
+        for listing in scan_utils.scan_directory_tree(directory, progress_callback=progress_callback):
+            dir_count += len(listing.dirs)
+            file_count += len(listing.files)
+            total_size += sum(entry.size for entry in listing.files)
         
         return {
             "total_size": total_size,
@@ -330,6 +776,127 @@ def get_directory_size(directory):
     except Exception as e:
         return None, str(e)
 
+def scan_disk_usage(root, update_callback=None, progress_callback=None, cancel_event=None,
+                    max_workers=None, update_interval=0.5):
+    """自底向上一次遍历统计每个目录的递归大小，返回 ({'root', 'nodes', 'cancelled'}, error)
+    
+    nodes 为 路径 -> {'path', 'name', 'parent', 'size', 'files_size', 'file_count', 'children', 'complete'}。
+    每个目录列举完成时就把本目录文件大小累加到所有上级目录，子树尚未完成时也能看到部分合计；
+    update_callback 按 update_interval 收到有变化的节点副本列表。结果可缓存，逐级查看时不再访问磁盘。
+    """
+    try:
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            return None, "目录不存在"
+        
+        nodes = {}
+        dirty = set()
+        last_update = 0.0
+        
+        def flush_updates():
+            if update_callback and dirty:
+                update_callback([dict(nodes[path], children=list(nodes[path]['children']))
+                                 for path in dirty])
+            dirty.clear()
+        
+        def on_listing(listing, parent):
+            nonlocal last_update
+            files_size = sum(f.size for f in listing.files)
+            nodes[listing.path] = {
+                'path': listing.path,
+                'name': os.path.basename(listing.path) or listing.path,
+                'parent': parent,
+                'size': files_size,
+                'files_size': files_size,
+                'file_count': len(listing.files),
+                'children': list(listing.dirs),
+                'complete': False
+            }
+            dirty.add(listing.path)
+            # 上级目录都还在等待这个子目录，部分合计沿父链向上累加
+            ancestor = parent
+            while ancestor is not None and files_size:
+                node = nodes[ancestor]
+                node['size'] += files_size
+                dirty.add(ancestor)
+                ancestor = node['parent']
+            
+            now = time.monotonic()
+            if now - last_update >= update_interval:
+                last_update = now
+                flush_updates()
+        
+        def combine(listing, child_results):
+            node = nodes[listing.path]
+            node['file_count'] += sum(child_results)
+            node['complete'] = True
+            dirty.add(listing.path)
+            return node['file_count']
+        
+        for _ in scan_utils.iter_tree_bottom_up(root, combine, max_workers, progress_callback,
+                                                cancel_event, listing_callback=on_listing):
+            pass
+        flush_updates()
+        
+        cancelled = bool(cancel_event and cancel_event.is_set())
+        return {"root": root, "nodes": nodes, "cancelled": cancelled}, None
+        
+    except Exception as e:
+        return None, str(e)
+
+def squarify_layout(sizes, x, y, width, height):
+    """squarified treemap 布局，返回与sizes同序的 (x, y, w, h) 列表
+    
+    sizes 应按降序排列；每次沿短边放置一行，只要加入下一个矩形能改善该行最差的长宽比就继续加入。
+    """
+    rects = [(x, y, 0.0, 0.0)] * len(sizes)
+    total = sum(size for size in sizes if size > 0)
+    if total <= 0 or width <= 0 or height <= 0:
+        return rects
+    
+    scale = width * height / total
+    items = [(i, size * scale) for i, size in enumerate(sizes) if size > 0]
+    
+    def worst_ratio(row_sum, row_min, row_max, side):
+        return max(row_max * side * side / (row_sum * row_sum),
+                   row_sum * row_sum / (side * side * row_min))
+    
+    start = 0
+    while start < len(items):
+        side = min(width, height)
+        row_sum = row_min = row_max = items[start][1]
+        end = start + 1
+        while end < len(items):
+            area = items[end][1]
+            new_sum = row_sum + area
+            if (worst_ratio(new_sum, min(row_min, area), max(row_max, area), side) >
+                    worst_ratio(row_sum, row_min, row_max, side)):
+                break
+            row_sum, row_min, row_max = new_sum, min(row_min, area), max(row_max, area)
+            end += 1
+        
+        if width >= height:
+            # 竖排在左侧
+            column_width = row_sum / height
+            offset = y
+            for i, area in items[start:end]:
+                rects[i] = (x, offset, column_width, area / column_width)
+                offset += area / column_width
+            x += column_width
+            width -= column_width
+        else:
+            # 横排在顶部
+            row_height = row_sum / width
+            offset = x
+            for i, area in items[start:end]:
+                rects[i] = (offset, y, area / row_height, row_height)
+                offset += area / row_height
+            y += row_height
+            height -= row_height
+        start = end
+    
+    return rects
+
 def format_file_size(size_bytes):
     """格式化文件大小显示"""
     if size_bytes < 1024:
@@ -2,52 +2,230 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLabel, QLineEdi
                              QGroupBox, QHBoxLayout, QFileDialog, QMessageBox,
                              QTabWidget, QCheckBox, QSpinBox, QTextEdit, QProgressBar,
                              QTreeWidget, QTreeWidgetItem, QGridLayout, QComboBox,
-                             QSplitter, QHeaderView)
-from PyQt6.QtGui import QIcon, QFont
-from PyQt6.QtCore import pyqtSignal, QThread, pyqtSlot, Qt
+                             QSplitter, QHeaderView, QTableWidget, QTableWidgetItem,
+                             QDoubleSpinBox)
+from PyQt6.QtGui import QIcon, QFont, QPainter, QPen, QColor, QPolygonF
+from PyQt6.QtCore import pyqtSignal, QThread, pyqtSlot, Qt, QTimer, QPointF, QRectF
 from utils import resource_path
 import system_utils
+import hash_utils
+import resource_monitor
+import numpy as np
+import threading
 import os
 
 class SystemWorker(QThread):
     finished = pyqtSignal(object, str)
     progress = pyqtSignal(int)
     status = pyqtSignal(str)
+    partial_result = pyqtSignal(str, list)
     
     def __init__(self, operation, **kwargs):
         super().__init__()
         self.operation = operation
         self.kwargs = kwargs
+        self.cancel_event = threading.Event()
         
     def run(self):
         try:
             if self.operation == "find_duplicates":
                 self.status.emit("正在扫描文件...")
-                result, error = system_utils.find_duplicate_files(**self.kwargs)
+                self.dedup_stats = {}
+                result, error = system_utils.find_duplicate_files(
+                    progress_callback=self.emit_scan_progress, stats=self.dedup_stats, **self.kwargs)
             elif self.operation == "batch_rename":
                 self.status.emit("正在重命名文件...")
-                result, error = system_utils.batch_rename_files(**self.kwargs)
+                result, error = self.rename_result(system_utils.batch_rename_files(**self.kwargs))
             elif self.operation == "batch_rename_sequence":
                 self.status.emit("正在按序列重命名...")
-                result, error = system_utils.batch_rename_with_sequence(**self.kwargs)
+                result, error = self.rename_result(system_utils.batch_rename_with_sequence(**self.kwargs))
+            elif self.operation == "undo_rename":
+                self.status.emit("正在撤销重命名...")
+                result, error = self.rename_result(system_utils.undo_last_rename(**self.kwargs))
             elif self.operation == "compare_dirs":
                 self.status.emit("正在比较目录...")
-                result, error = system_utils.compare_directories(**self.kwargs)
+                result, error = system_utils.compare_directories(
+                    result_callback=self.partial_result.emit, **self.kwargs)
+            elif self.operation == "sync_dirs":
+                self.status.emit("正在同步目录...")
+                result, error = system_utils.sync_directories(
+                    progress_callback=self.emit_sync_progress, **self.kwargs)
+            elif self.operation == "disk_usage":
+                self.status.emit("正在统计磁盘占用...")
+                result, error = system_utils.scan_disk_usage(
+                    update_callback=lambda nodes: self.partial_result.emit("disk_usage", nodes),
+                    progress_callback=self.emit_scan_progress,
+                    cancel_event=self.cancel_event, **self.kwargs)
             elif self.operation == "find_empty_dirs":
                 self.status.emit("正在查找空文件夹...")
-                result, error = system_utils.find_empty_directories(**self.kwargs)
+                result, error = system_utils.find_empty_directories(
+                    progress_callback=self.emit_scan_progress, **self.kwargs)
             elif self.operation == "clean_temp":
                 self.status.emit("正在清理临时文件...")
-                result, error = system_utils.clean_system_temp(**self.kwargs)
+                result, error = system_utils.clean_system_temp(
+                    progress_callback=self.emit_scan_progress, **self.kwargs)
             elif self.operation == "dir_size":
                 self.status.emit("正在计算目录大小...")
-                result, error = system_utils.get_directory_size(**self.kwargs)
+                result, error = system_utils.get_directory_size(
+                    progress_callback=self.emit_scan_progress, **self.kwargs)
             else:
                 result, error = None, "未知操作"
                 
             self.finished.emit(result, error or "")
         except Exception as e:
             self.finished.emit(None, str(e))
+    
+    @staticmethod
+    def rename_result(outcome):
+        # 重命名函数返回 (成功列表, 错误列表)，整体失败时成功列表为None
+        renamed, errors = outcome
+        if renamed is None:
+            return None, "; ".join(errors)
+        return (renamed, errors), None
+    
+    def emit_scan_progress(self, info):
+        message = (f"已扫描 {info['dirs_scanned']} 个目录, {info['file_count']} 个文件, "
+                   f"{system_utils.format_file_size(info['total_size'])}")
+        if 'dirs_skipped' in info:
+            message += f", 索引中未变化的目录 {info['dirs_skipped']} 个"
+        self.status.emit(message)
+
+    def emit_sync_progress(self, percent):
+        self.progress.emit(percent)
+        self.status.emit(f"正在同步目录... {percent}%")
+
+class SeriesChart(QWidget):
+    """简单折线图，直接用QPainter绘制若干条NumPy序列"""
+    def __init__(self, title, fixed_max=None, value_formatter=None):
+        super().__init__()
+        self.title = title
+        self.fixed_max = fixed_max
+        self.value_formatter = value_formatter or (lambda value: f"{value:.0f}")
+        self.series = []  # [(名称, 数值数组, 颜色)]
+        self.setMinimumHeight(140)
+    
+    def set_series(self, series):
+        self.series = series
+        self.update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = self.rect().adjusted(40, 20, -10, -10)
+        painter.fillRect(self.rect(), QColor(255, 255, 255))
+        painter.setPen(QPen(QColor(200, 200, 200)))
+        painter.drawRect(rect)
+        
+        peak = self.fixed_max
+        if peak is None:
+            peaks = [np.nanmax(values) for _, values, _ in self.series
+                     if len(values) and not np.all(np.isnan(values))]
+            peak = max(peaks + [1.0])
+        
+        painter.setPen(QPen(QColor(80, 80, 80)))
+        painter.drawText(4, 14, self.title)
+        painter.drawText(2, rect.top() + 10, self.value_formatter(peak))
+        painter.drawText(2, rect.bottom(), "0")
+        
+        legend_x = rect.right() - 10
+        for name, values, color in reversed(self.series):
+            legend_x -= painter.fontMetrics().horizontalAdvance(name) + 16
+            painter.setPen(QPen(color))
+            painter.drawText(legend_x, 14, name)
+            
+            if len(values) < 2:
+                continue
+            # 向量化计算坐标，NaN按0绘制
+            ys = np.nan_to_num(np.asarray(values, dtype=float))
+            xs = rect.left() + np.arange(len(ys)) * rect.width() / (len(ys) - 1)
+            ys = rect.bottom() - np.clip(ys / peak, 0, 1) * rect.height()
+            polygon = QPolygonF([QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+            painter.setPen(QPen(color, 1.5))
+            painter.drawPolyline(polygon)
+        painter.end()
+
+class TreemapWidget(QWidget):
+    """磁盘占用矩形树图，显示当前目录下各子目录和本目录文件的占比，点击子目录进入下一级"""
+    directory_activated = pyqtSignal(str)
+    MAX_ITEMS = 200
+    
+    def __init__(self):
+        super().__init__()
+        self.nodes = {}
+        self.current = None
+        self.item_rects = []  # [(矩形, 目录路径或None, 提示文本)]
+        self.setMinimumHeight(300)
+        self.setMouseTracking(True)
+    
+    def set_view(self, nodes, current):
+        self.nodes = nodes
+        self.current = current
+        self.update()
+    
+    def _items(self, node):
+        items = []
+        for child_path in node['children']:
+            child = self.nodes.get(child_path)
+            if child is not None:
+                items.append((child['size'], child['name'], child_path, child['complete']))
+        if node['files_size']:
+            items.append((node['files_size'], f"[{node['file_count'] if node['complete'] else ''}文件]",
+                          None, True))
+        items.sort(key=lambda item: item[0], reverse=True)
+        if len(items) > self.MAX_ITEMS:
+            rest = items[self.MAX_ITEMS - 1:]
+            items = items[:self.MAX_ITEMS - 1]
+            items.append((sum(item[0] for item in rest), f"其他 {len(rest)} 项", None, True))
+        return items
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(255, 255, 255))
+        self.item_rects = []
+        node = self.nodes.get(self.current)
+        if node is None:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "选择目录并开始扫描")
+            painter.end()
+            return
+        
+        items = self._items(node)
+        layout = system_utils.squarify_layout([item[0] for item in items], 0, 0,
+                                              self.width() - 1, self.height() - 1)
+        for (size, name, path, complete), (x, y, w, h) in zip(items, layout):
+            if w < 1 or h < 1:
+                continue
+            rect = QRectF(x, y, w, h)
+            hue = (sum(name.encode('utf-8')) * 37) % 360
+            # 尚未扫描完成的子目录颜色较浅
+            color = QColor.fromHsv(hue, 90 if complete else 40, 230) if path else QColor(200, 200, 200)
+            painter.fillRect(rect, color)
+            painter.setPen(QPen(QColor(255, 255, 255)))
+            painter.drawRect(rect)
+            
+            label = f"{name}\n{system_utils.format_file_size(size)}"
+            if not complete:
+                label += " (扫描中)"
+            if w > 60 and h > 30:
+                painter.setPen(QPen(QColor(30, 30, 30)))
+                painter.drawText(rect.adjusted(4, 2, -4, -2),
+                                 Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, label)
+            self.item_rects.append((rect, path, label))
+        painter.end()
+    
+    def _item_at(self, pos):
+        for rect, path, label in self.item_rects:
+            if rect.contains(QPointF(pos)):
+                return path, label
+        return None, None
+    
+    def mouseMoveEvent(self, event):
+        _, label = self._item_at(event.position().toPoint())
+        self.setToolTip(label or "")
+    
+    def mousePressEvent(self, event):
+        path, _ = self._item_at(event.position().toPoint())
+        if path and path in self.nodes:
+            self.directory_activated.emit(path)
 
 class SystemWindow(QWidget):
     operation_successful = pyqtSignal()
@@ -78,6 +256,12 @@ class SystemWindow(QWidget):
         # 系统清理标签页
         self.setup_cleanup_tab()
         
+        # 资源监控标签页
+        self.setup_monitor_tab()
+        
+        # 磁盘占用标签页
+        self.setup_disk_usage_tab()
+        
         # 状态栏
         self.status_label = QLabel("就绪")
         main_layout.addWidget(self.status_label)
@@ -160,8 +344,12 @@ class SystemWindow(QWidget):
         replace_rename_btn.clicked.connect(self.execute_replace_rename)
         sequence_rename_btn.clicked.connect(self.execute_sequence_rename)
         
+        undo_rename_btn = QPushButton("撤销上次重命名")
+        undo_rename_btn.clicked.connect(self.undo_last_rename)
+        
         btn_layout.addWidget(replace_rename_btn)
         btn_layout.addWidget(sequence_rename_btn)
+        btn_layout.addWidget(undo_rename_btn)
         layout.addLayout(btn_layout)
         
         layout.addStretch()
@@ -189,6 +377,15 @@ class SystemWindow(QWidget):
         dir_group_layout.addWidget(select_duplicate_dir_btn, 0, 2)
         dir_group_layout.addWidget(self.include_subdirs, 1, 0, 1, 3)
         
+        self.duplicate_algorithm = QComboBox()
+        self.duplicate_algorithm.addItems(hash_utils.get_available_algorithms())
+        dir_group_layout.addWidget(QLabel("哈希算法:"), 2, 0)
+        dir_group_layout.addWidget(self.duplicate_algorithm, 2, 1, 1, 2)
+        
+        self.duplicate_use_cache = QCheckBox("使用哈希缓存（未变化的文件不再读取）")
+        self.duplicate_use_cache.setChecked(True)
+        dir_group_layout.addWidget(self.duplicate_use_cache, 3, 0, 1, 3)
+        
         top_layout.addWidget(dir_group)
         
         scan_btn = QPushButton("开始扫描")
@@ -231,6 +428,19 @@ class SystemWindow(QWidget):
         dirs_layout.addWidget(select_dir2_btn, 1, 2)
         dirs_layout.addWidget(self.compare_content, 2, 0, 1, 3)
         
+        self.compare_algorithm = QComboBox()
+        self.compare_algorithm.addItems(hash_utils.get_available_algorithms())
+        dirs_layout.addWidget(QLabel("哈希算法:"), 3, 0)
+        dirs_layout.addWidget(self.compare_algorithm, 3, 1, 1, 2)
+        
+        self.compare_use_cache = QCheckBox("使用哈希缓存")
+        self.compare_use_cache.setChecked(True)
+        dirs_layout.addWidget(self.compare_use_cache, 4, 0, 1, 3)
+        
+        self.compare_quick_check = QCheckBox("快速检查（大小和修改时间都相同的文件视为相同）")
+        self.compare_quick_check.setChecked(True)
+        dirs_layout.addWidget(self.compare_quick_check, 5, 0, 1, 3)
+        
         layout.addWidget(dirs_group)
         
         # 比较按钮
@@ -238,6 +448,28 @@ class SystemWindow(QWidget):
         compare_btn.clicked.connect(self.compare_directories)
         layout.addWidget(compare_btn)
         
+        # 目录同步
+        sync_group = QGroupBox("目录同步")
+        sync_layout = QGridLayout(sync_group)
+        
+        sync_layout.addWidget(QLabel("同步方式:"), 0, 0)
+        self.sync_mode = QComboBox()
+        self.sync_mode.addItem("单向同步（目录1 → 目录2）", "one_way")
+        self.sync_mode.addItem("双向同步（以较新的文件为准）", "two_way")
+        sync_layout.addWidget(self.sync_mode, 0, 1, 1, 2)
+        
+        self.sync_delete_extra = QCheckBox("删除目录2中多出的文件（仅单向同步）")
+        sync_layout.addWidget(self.sync_delete_extra, 1, 0, 1, 3)
+        
+        sync_preview_btn = QPushButton("预览同步")
+        sync_preview_btn.clicked.connect(lambda: self.sync_directories(True))
+        sync_execute_btn = QPushButton("执行同步")
+        sync_execute_btn.clicked.connect(lambda: self.sync_directories(False))
+        sync_layout.addWidget(sync_preview_btn, 2, 0)
+        sync_layout.addWidget(sync_execute_btn, 2, 1)
+        
+        layout.addWidget(sync_group)
+        
         # 结果显示
         self.compare_result = QTextEdit()
         self.compare_result.setReadOnly(True)
@@ -302,6 +534,263 @@ class SystemWindow(QWidget):
         
         self.tab_widget.addTab(tab, "系统清理")
 
+    MONITOR_WINDOWS = [("最近1分钟", 60), ("最近5分钟", 300), ("最近15分钟", 900), ("全部", None)]
+    
+    def setup_monitor_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.resource_sampler = None
+        
+        # 采样设置
+        settings_group = QGroupBox("采样设置")
+        settings_layout = QHBoxLayout(settings_group)
+        
+        self.monitor_interval = QDoubleSpinBox()
+        self.monitor_interval.setRange(0.2, 10.0)
+        self.monitor_interval.setSingleStep(0.5)
+        self.monitor_interval.setValue(1.0)
+        self.monitor_interval.setSuffix(" 秒")
+        self.monitor_interval.valueChanged.connect(self.on_monitor_interval_changed)
+        
+        self.monitor_window = QComboBox()
+        for label, seconds in self.MONITOR_WINDOWS:
+            self.monitor_window.addItem(label, seconds)
+        
+        self.monitor_start_btn = QPushButton("开始监控")
+        self.monitor_start_btn.clicked.connect(self.toggle_resource_monitor)
+        
+        settings_layout.addWidget(QLabel("采样间隔:"))
+        settings_layout.addWidget(self.monitor_interval)
+        settings_layout.addWidget(QLabel("统计窗口:"))
+        settings_layout.addWidget(self.monitor_window)
+        settings_layout.addWidget(self.monitor_start_btn)
+        settings_layout.addStretch()
+        layout.addWidget(settings_group)
+        
+        if resource_monitor.psutil is None:
+            self.monitor_start_btn.setEnabled(False)
+            layout.addWidget(QLabel("资源监控需要安装 psutil"))
+        
+        # 曲线
+        self.cpu_memory_chart = SeriesChart("CPU / 内存 (%)", fixed_max=100)
+        self.disk_chart = SeriesChart(
+            "磁盘读写", value_formatter=lambda value: f"{system_utils.format_file_size(int(value))}/s")
+        layout.addWidget(self.cpu_memory_chart)
+        layout.addWidget(self.disk_chart)
+        
+        self.monitor_summary = QLabel("未开始监控")
+        layout.addWidget(self.monitor_summary)
+        
+        # 每个核心的统计和进程列表
+        tables_splitter = QSplitter(Qt.Orientation.Horizontal)
+        
+        self.core_table = QTableWidget()
+        self.core_table.setColumnCount(6)
+        self.core_table.setHorizontalHeaderLabels(["核心", "当前", "最小", "最大", "平均", "P95"])
+        self.core_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.core_table.verticalHeader().setVisible(False)
+        tables_splitter.addWidget(self.core_table)
+        
+        self.process_table = QTableWidget()
+        self.process_table.setColumnCount(5)
+        self.process_table.setHorizontalHeaderLabels(["PID", "进程名", "CPU %", "内存", "线程数"])
+        self.process_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.process_table.verticalHeader().setVisible(False)
+        tables_splitter.addWidget(self.process_table)
+        
+        layout.addWidget(tables_splitter, 1)
+        
+        # 界面只按采样间隔从缓冲区读取数据，采样在后台线程进行
+        self.monitor_timer = QTimer(self)
+        self.monitor_timer.timeout.connect(self.refresh_resource_monitor)
+        
+        self.tab_widget.addTab(tab, "资源监控")
+    
+    def toggle_resource_monitor(self):
+        if self.resource_sampler is not None and self.resource_sampler.is_running():
+            self.resource_sampler.stop()
+            self.monitor_timer.stop()
+            self.monitor_start_btn.setText("开始监控")
+            return
+        
+        try:
+            if self.resource_sampler is None:
+                self.resource_sampler = resource_monitor.ResourceSampler(
+                    interval=self.monitor_interval.value())
+            self.resource_sampler.start()
+        except RuntimeError as e:
+            QMessageBox.critical(self, "错误", str(e))
+            return
+        self.monitor_timer.start(int(self.monitor_interval.value() * 1000))
+        self.monitor_start_btn.setText("停止监控")
+    
+    def on_monitor_interval_changed(self, value):
+        if self.resource_sampler is not None:
+            self.resource_sampler.set_interval(value)
+        if self.monitor_timer.isActive():
+            self.monitor_timer.start(int(value * 1000))
+    
+    def refresh_resource_monitor(self):
+        sampler = self.resource_sampler
+        latest = sampler.get_latest() if sampler else None
+        if latest is None:
+            return
+        window = self.monitor_window.currentData()
+        aggregates = sampler.get_aggregates(window)
+        
+        self.cpu_memory_chart.set_series([
+            ("CPU", sampler.get_series('cpu_total', window)[1][:, 0], QColor(33, 150, 243)),
+            ("内存", sampler.get_series('memory', window)[1][:, 0], QColor(76, 175, 80))
+        ])
+        self.disk_chart.set_series([
+            ("读取", sampler.get_series('disk_read', window)[1][:, 0], QColor(255, 152, 0)),
+            ("写入", sampler.get_series('disk_write', window)[1][:, 0], QColor(156, 39, 176))
+        ])
+        
+        def fmt_rate(value):
+            return "-" if np.isnan(value) else f"{system_utils.format_file_size(int(value))}/s"
+        
+        memory_info = latest['memory_info']
+        cpu_total = aggregates['cpu_total']
+        disk_read = aggregates['disk_read']
+        disk_write = aggregates['disk_write']
+        self.monitor_summary.setText(
+            f"CPU {latest['cpu_total'][0]:.1f}% (P95 {cpu_total['p95'][0]:.1f}%, 最高 {cpu_total['max'][0]:.1f}%)    "
+            f"内存 {latest['memory'][0]:.1f}% ({system_utils.format_file_size(memory_info['used'])} / "
+            f"{system_utils.format_file_size(memory_info['total'])})    "
+            f"磁盘读 {fmt_rate(latest['disk_read'][0])} (P95 {fmt_rate(disk_read['p95'][0])})    "
+            f"磁盘写 {fmt_rate(latest['disk_write'][0])} (P95 {fmt_rate(disk_write['p95'][0])})    "
+            f"采样开销 {sampler.get_overhead():.2f}%"
+        )
+        
+        cpu = aggregates['cpu']
+        self.core_table.setRowCount(len(latest['cpu']))
+        for core, current in enumerate(latest['cpu']):
+            row = [f"CPU {core}", current, cpu['min'][core], cpu['max'][core],
+                   cpu['mean'][core], cpu['p95'][core]]
+            for column, value in enumerate(row):
+                text = value if column == 0 else f"{value:.1f}%"
+                self.core_table.setItem(core, column, QTableWidgetItem(text))
+        
+        processes = sampler.get_top_processes()
+        self.process_table.setRowCount(len(processes))
+        for row, proc in enumerate(processes):
+            values = [str(proc['pid']), proc['name'], f"{proc['cpu_percent']:.1f}",
+                      system_utils.format_file_size(proc['memory_rss']), str(proc['num_threads'])]
+            for column, text in enumerate(values):
+                self.process_table.setItem(row, column, QTableWidgetItem(text))
+    
+    def setup_disk_usage_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.disk_usage_worker = None
+        self.disk_usage_nodes = {}
+        self.disk_usage_root = None
+        self.disk_usage_current = None
+        
+        controls_layout = QHBoxLayout()
+        self.disk_usage_dir_label = QLabel("未选择目录")
+        select_btn = QPushButton("选择目录")
+        select_btn.clicked.connect(self.select_disk_usage_directory)
+        self.disk_usage_scan_btn = QPushButton("开始扫描")
+        self.disk_usage_scan_btn.clicked.connect(self.start_disk_usage_scan)
+        self.disk_usage_cancel_btn = QPushButton("取消")
+        self.disk_usage_cancel_btn.setEnabled(False)
+        self.disk_usage_cancel_btn.clicked.connect(self.cancel_disk_usage_scan)
+        up_btn = QPushButton("上一级")
+        up_btn.clicked.connect(self.disk_usage_go_up)
+        
+        controls_layout.addWidget(QLabel("目录:"))
+        controls_layout.addWidget(self.disk_usage_dir_label, 1)
+        controls_layout.addWidget(select_btn)
+        controls_layout.addWidget(self.disk_usage_scan_btn)
+        controls_layout.addWidget(self.disk_usage_cancel_btn)
+        controls_layout.addWidget(up_btn)
+        layout.addLayout(controls_layout)
+        
+        self.disk_usage_path_label = QLabel("")
+        layout.addWidget(self.disk_usage_path_label)
+        
+        self.treemap = TreemapWidget()
+        self.treemap.directory_activated.connect(self.show_disk_usage_directory)
+        layout.addWidget(self.treemap, 1)
+        
+        self.tab_widget.addTab(tab, "磁盘占用")
+    
+    def select_disk_usage_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择要统计的目录")
+        if directory:
+            self.disk_usage_directory = directory
+            self.disk_usage_dir_label.setText(directory)
+    
+    def start_disk_usage_scan(self):
+        if not hasattr(self, 'disk_usage_directory'):
+            QMessageBox.warning(self, "错误", "请先选择目录")
+            return
+        if self.disk_usage_worker is not None and self.disk_usage_worker.isRunning():
+            return
+        
+        self.disk_usage_nodes = {}
+        self.disk_usage_root = os.path.abspath(self.disk_usage_directory)
+        self.disk_usage_current = self.disk_usage_root
+        self.disk_usage_worker = SystemWorker("disk_usage", root=self.disk_usage_root)
+        self.disk_usage_worker.partial_result.connect(self.on_disk_usage_partial)
+        self.disk_usage_worker.finished.connect(self.on_disk_usage_finished)
+        self.disk_usage_worker.status.connect(self.status_label.setText)
+        self.disk_usage_scan_btn.setEnabled(False)
+        self.disk_usage_cancel_btn.setEnabled(True)
+        self.disk_usage_worker.start()
+    
+    def cancel_disk_usage_scan(self):
+        if self.disk_usage_worker is not None:
+            self.disk_usage_worker.cancel_event.set()
+    
+    @pyqtSlot(str, list)
+    def on_disk_usage_partial(self, category, nodes):
+        for node in nodes:
+            self.disk_usage_nodes[node['path']] = node
+        self.refresh_disk_usage_view()
+    
+    @pyqtSlot(object, str)
+    def on_disk_usage_finished(self, result, error):
+        self.disk_usage_scan_btn.setEnabled(True)
+        self.disk_usage_cancel_btn.setEnabled(False)
+        if error:
+            QMessageBox.critical(self, "错误", f"统计失败: {error}")
+        else:
+            # 完整结果缓存在内存中，逐级查看不再访问磁盘
+            self.disk_usage_nodes = result['nodes']
+            self.refresh_disk_usage_view()
+            if result['cancelled']:
+                self.status_label.setText("扫描已取消，显示已完成的部分")
+                return
+        self.status_label.setText("就绪")
+    
+    def show_disk_usage_directory(self, path):
+        self.disk_usage_current = path
+        self.refresh_disk_usage_view()
+    
+    def disk_usage_go_up(self):
+        if self.disk_usage_current and self.disk_usage_current != self.disk_usage_root:
+            self.show_disk_usage_directory(os.path.dirname(self.disk_usage_current))
+    
+    def refresh_disk_usage_view(self):
+        node = self.disk_usage_nodes.get(self.disk_usage_current)
+        if node is not None:
+            self.disk_usage_path_label.setText(
+                f"{node['path']}    {system_utils.format_file_size(node['size'])}"
+                f"{'' if node['complete'] else '（扫描中）'}")
+        self.treemap.set_view(self.disk_usage_nodes, self.disk_usage_current)
+    
+    def closeEvent(self, event):
+        if self.disk_usage_worker is not None and self.disk_usage_worker.isRunning():
+            self.disk_usage_worker.cancel_event.set()
+            self.disk_usage_worker.wait()
+        if self.resource_sampler is not None:
+            self.resource_sampler.stop()
+        self.monitor_timer.stop()
+        super().closeEvent(event)
+
     def select_rename_directory(self):
         directory = QFileDialog.getExistingDirectory(self, "选择要重命名文件的目录")
         if directory:
@@ -377,6 +866,16 @@ class SystemWindow(QWidget):
         self.worker.status.connect(self.status_label.setText)
         self.worker.start()
 
+    def undo_last_rename(self):
+        if not hasattr(self, 'rename_directory'):
+            QMessageBox.warning(self, "错误", "请先选择目录")
+            return
+        
+        self.worker = SystemWorker("undo_rename", directory=self.rename_directory)
+        self.worker.finished.connect(self.on_rename_finished)
+        self.worker.status.connect(self.status_label.setText)
+        self.worker.start()
+
     def scan_duplicates(self):
         if not hasattr(self, 'duplicate_directory'):
             QMessageBox.warning(self, "错误", "请先选择目录")
@@ -387,7 +886,9 @@ class SystemWindow(QWidget):
         self.worker = SystemWorker(
             "find_duplicates",
             directory=self.duplicate_directory,
-            include_subdirs=self.include_subdirs.isChecked()
+            include_subdirs=self.include_subdirs.isChecked(),
+            algorithm=self.duplicate_algorithm.currentText(),
+            hash_cache=hash_utils.get_default_hash_cache() if self.duplicate_use_cache.isChecked() else None
         )
         self.worker.finished.connect(self.on_duplicates_found)
         self.worker.status.connect(self.status_label.setText)
@@ -402,12 +903,50 @@ class SystemWindow(QWidget):
             "compare_dirs",
             dir1=self.compare_directory1,
             dir2=self.compare_directory2,
-            compare_content=self.compare_content.isChecked()
+            compare_content=self.compare_content.isChecked(),
+            algorithm=self.compare_algorithm.currentText(),
+            hash_cache=hash_utils.get_default_hash_cache() if self.compare_use_cache.isChecked() else None,
+            quick_check=self.compare_quick_check.isChecked()
         )
+        self.compare_result.clear()
+        self.worker.partial_result.connect(self.on_compare_partial)
         self.worker.finished.connect(self.on_compare_finished)
         self.worker.status.connect(self.status_label.setText)
         self.worker.start()
 
+    def sync_directories(self, dry_run):
+        if not hasattr(self, 'compare_directory1') or not hasattr(self, 'compare_directory2'):
+            QMessageBox.warning(self, "错误", "请先选择两个要同步的目录")
+            return
+        
+        mode = self.sync_mode.currentData()
+        delete_extra = mode == "one_way" and self.sync_delete_extra.isChecked()
+        if not dry_run:
+            message = "确定要同步目录吗？目标中内容不同的文件将被覆盖。"
+            if delete_extra:
+                message += "\n目录2中多出的文件将被删除，此操作不可撤销。"
+            reply = QMessageBox.question(
+                self, "确认同步", message,
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        
+        self.worker = SystemWorker(
+            "sync_dirs",
+            dir1=self.compare_directory1,
+            dir2=self.compare_directory2,
+            mode=mode,
+            delete_extra=delete_extra,
+            dry_run=dry_run,
+            quick_check=self.compare_quick_check.isChecked(),
+            hash_cache=hash_utils.get_default_hash_cache() if self.compare_use_cache.isChecked() else None
+        )
+        self.compare_result.clear()
+        self.worker.finished.connect(self.on_sync_finished)
+        self.worker.status.connect(self.status_label.setText)
+        self.worker.start()
+
     def find_empty_directories(self, remove_empty):
         if not hasattr(self, 'cleanup_directory'):
             QMessageBox.warning(self, "错误", "请先选择目录")
@@ -490,10 +1029,21 @@ class SystemWindow(QWidget):
                         file_item.setText(2, file_path)
             
             self.duplicate_tree.expandAll()
-            QMessageBox.information(self, "完成", f"找到 {total_duplicates} 个重复文件")
+            message = f"找到 {total_duplicates} 个重复文件"
+            stats = getattr(self.worker, 'dedup_stats', None)
+            if stats:
+                message += (f"\n实际读取 {system_utils.format_file_size(stats['bytes_read'])}，"
+                            f"共 {system_utils.format_file_size(stats['total_bytes'])}，"
+                            f"缓存命中 {stats['cache_hits']} 个文件")
+            QMessageBox.information(self, "完成", message)
         
         self.status_label.setText("就绪")
 
+    @pyqtSlot(str, list)
+    def on_compare_partial(self, category, files):
+        label = "内容相同" if category == "same_content" else "内容不同"
+        self.compare_result.append("\n".join(f"[{label}] {file}" for file in files))
+        
     @pyqtSlot(object, str)
     def on_compare_finished(self, result, error):
         if error:
@@ -519,6 +1069,14 @@ class SystemWindow(QWidget):
 
 内容不同的文件 ({len(result['different_content'])} 个):
 {chr(10).join(result['different_content']) if result['different_content'] else '无'}
+"""
+            
+            if 'compare_stats' in result:
+                stats = result['compare_stats']
+                compare_text += f"""
+比较统计: 大小不同 {stats['size_differs']} 个, 快速检查相同 {stats['quick_check_same']} 个, \
+哈希缓存比较 {stats['cache_compared']} 个, 逐块比较 {stats['content_compared']} 个, \
+读取 {system_utils.format_file_size(stats['bytes_read'])}
 """
             
             self.compare_result.setText(compare_text)
@@ -526,6 +1084,41 @@ class SystemWindow(QWidget):
         
         self.status_label.setText("就绪")
 
+    @pyqtSlot(object, str)
+    def on_sync_finished(self, result, error):
+        if error:
+            QMessageBox.critical(self, "错误", f"同步失败: {error}")
+        else:
+            lines = []
+            for action in result['actions']:
+                if action['action'] == 'copy':
+                    lines.append(f"[复制] {action['src']} -> {action['dst']} "
+                                 f"({system_utils.format_file_size(action['size'])})")
+                else:
+                    lines.append(f"[删除] {action['dst']}")
+            
+            sync_text = f"""目录同步{'预览' if result['dry_run'] else '结果'}:
+================================================
+
+待复制文件: {result['copy_count']} 个, 共 {system_utils.format_file_size(result['bytes_planned'])}
+待删除文件: {result['delete_count']} 个
+
+{chr(10).join(lines) if lines else '两个目录已同步，无需操作'}
+"""
+            if not result['dry_run']:
+                sync_text += f"""
+已复制 {len(result['copied'])} 个文件（其中增量更新 {result['delta_copied']} 个）, 已删除 {len(result['deleted'])} 个文件
+读取 {system_utils.format_file_size(result['bytes_read'])}, 写入 {system_utils.format_file_size(result['bytes_written'])}, \
+耗时 {result['elapsed']:.2f} 秒, 吞吐量 {result['throughput_mb_s']} MB/s
+"""
+                if result['errors']:
+                    sync_text += f"\n错误 ({len(result['errors'])} 个):\n" + "\n".join(result['errors'])
+            
+            self.compare_result.setText(sync_text)
+            QMessageBox.information(self, "完成", "同步预览完成" if result['dry_run'] else "目录同步完成")
+        
+        self.status_label.setText("就绪")
+
     @pyqtSlot(object, str)
     def on_cleanup_finished(self, result, error):
         if error:
@@ -543,6 +1136,10 @@ class SystemWindow(QWidget):
                 if 'removed_dirs' in result:
                     cleanup_text += f"\n\n已删除: {len(result['removed_dirs'])} 个"
                 
+                if result.get('errors'):
+                    cleanup_text += f"\n删除失败: {len(result['errors'])} 个\n"
+                    cleanup_text += "\n".join(result['errors'][:10])
+                
             elif 'cleaned_files' in result:
                 # 临时文件清理结果
                 cleanup_text = f"临时文件清理结果:\n"
@@ -0,0 +1,84 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scan_utils
+from index_manager import FileIndexManager
+
+class FileIndexManagerTest(unittest.TestCase):
+    """增量扫描中断或出错后，再次扫描必须补全未扫描到的子树，而不是当作未变化跳过"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.work_dir, "tree")
+        for i in range(50):
+            sub_dir = os.path.join(self.root, f"d{i}", "sub")
+            os.makedirs(sub_dir)
+            with open(os.path.join(sub_dir, "f.txt"), "w") as f:
+                f.write("x" * i)
+        self.db_path = os.path.join(self.work_dir, "index.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def expected_summary(self):
+        manager = FileIndexManager(os.path.join(self.work_dir, "fresh.db"))
+        try:
+            manager.refresh(self.root)
+            return manager.get_directory_summary(self.root)
+        finally:
+            manager.close()
+
+    def test_refresh_after_cancel_completes_index(self):
+        manager = FileIndexManager(self.db_path)
+        try:
+            cancel_event = threading.Event()
+            manager.refresh(self.root, max_workers=1, cancel_event=cancel_event, progress_interval=0,
+                            progress_callback=lambda stats: cancel_event.set())
+            self.assertLess(manager.get_directory_summary(self.root)['file_count'], 50)
+
+            manager.refresh(self.root)
+            self.assertEqual(manager.get_directory_summary(self.root), self.expected_summary())
+
+            # 完整扫描之后，目录未变化时应全部跳过
+            stats = manager.refresh(self.root)
+            self.assertEqual(stats['dirs_scanned'], 0)
+            self.assertEqual(manager.get_directory_summary(self.root), self.expected_summary())
+        finally:
+            manager.close()
+
+    def test_refresh_after_listing_error(self):
+        blocked = os.path.join(self.root, "d0")
+        original = scan_utils.scan_single_directory
+
+        def failing_scan(path):
+            if path == blocked:
+                return scan_utils.DirListing(path, [], [], "Permission denied")
+            return original(path)
+
+        manager = FileIndexManager(self.db_path)
+        try:
+            with mock.patch.object(scan_utils, "scan_single_directory", failing_scan):
+                manager.refresh(self.root)
+            manager.refresh(self.root)
+            self.assertEqual(manager.get_directory_summary(self.root), self.expected_summary())
+        finally:
+            manager.close()
+
+    def test_get_large_files_limit_zero(self):
+        manager = FileIndexManager(self.db_path)
+        try:
+            manager.refresh(self.root)
+            self.assertEqual(manager.get_large_files(self.root, min_size=0, limit=0), [])
+            self.assertEqual(len(manager.get_large_files(self.root, min_size=0)), 49)
+        finally:
+            manager.close()
+
+if __name__ == "__main__":
+    unittest.main()
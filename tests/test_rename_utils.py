@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rename_utils
+
+class InterruptedRenameUndoTest(unittest.TestCase):
+    """重命名执行到一半进程退出时，日志停留在中断状态，撤销应只回退已完成的步骤"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.work_dir, "files")
+        self.journal_dir = os.path.join(self.work_dir, "journals")
+        os.makedirs(self.directory)
+        os.makedirs(self.journal_dir)
+        # 包含交换和链式重命名
+        self.contents = {"a.txt": "A", "b.txt": "B", "c.txt": "C", "d.txt": "D"}
+        for name, content in self.contents.items():
+            with open(os.path.join(self.directory, name), "w") as f:
+                f.write(content)
+        self.proposals = [("a.txt", "b.txt"), ("b.txt", "a.txt"), ("c.txt", "d.txt"), ("d.txt", "e.txt")]
+        patcher = mock.patch.object(rename_utils, "get_journal_dir", return_value=self.journal_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def current_contents(self):
+        result = {}
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name)) as f:
+                result[name] = f.read()
+        return result
+
+    def run_interrupted(self, fail_at):
+        _, existing_names = rename_utils.list_directory(self.directory)
+        plan = rename_utils.build_rename_plan(self.directory, self.proposals, existing_names)
+        real_rename = os.rename
+        calls = []
+
+        def crashing_rename(src, dst):
+            calls.append(src)
+            if len(calls) == fail_at:
+                raise KeyboardInterrupt()
+            real_rename(src, dst)
+
+        with mock.patch("os.rename", crashing_rename):
+            with self.assertRaises(KeyboardInterrupt):
+                rename_utils.execute_rename_plan(plan)
+        with open(plan.journal_path, encoding="utf-8") as f:
+            return json.load(f)['status']
+
+    def test_undo_interrupted_in_each_phase(self):
+        # 第一阶段 4 次、第二阶段 4 次重命名，在每一步中断后都能恢复原状
+        for fail_at in range(1, 9):
+            with self.subTest(fail_at=fail_at):
+                status = self.run_interrupted(fail_at)
+                self.assertIn(status, rename_utils.INTERRUPTED_STATUSES)
+                _, errors = rename_utils.undo_last_rename(self.directory)
+                self.assertEqual(errors, [])
+                self.assertEqual(self.current_contents(), self.contents)
+
+if __name__ == "__main__":
+    unittest.main()
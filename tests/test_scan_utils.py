@@ -0,0 +1,25 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_utils import TopKTracker
+
+class TopKTrackerTest(unittest.TestCase):
+
+    def test_keeps_largest_k(self):
+        tracker = TopKTracker(2)
+        for size, path in [(5, 'a'), (1, 'b'), (9, 'c'), (7, 'd')]:
+            tracker.add(size, path)
+        self.assertEqual(tracker.items(), [(9, 'c'), (7, 'd')])
+        self.assertEqual((tracker.total_count, tracker.total_size), (4, 22))
+
+    def test_zero_k_only_counts(self):
+        tracker = TopKTracker(0)
+        tracker.add(5, 'a')
+        self.assertEqual(tracker.items(), [])
+        self.assertEqual((tracker.total_count, tracker.total_size), (1, 5))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import system_utils
+from hash_utils import HashCache
+
+class FindDuplicateFilesCacheTest(unittest.TestCase):
+    """带缓存重复运行时读取的数据不应多于首次运行"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.work_dir, "files")
+        os.makedirs(self.root)
+        size = system_utils.PARTIAL_HASH_SIZE * 4
+        for i in range(11):
+            with open(os.path.join(self.root, f"f{i}.bin"), "wb") as f:
+                f.write(os.urandom(size))
+        shutil.copyfile(os.path.join(self.root, "f0.bin"), os.path.join(self.root, "copy.bin"))
+        self.cache = HashCache(os.path.join(self.work_dir, "hash_cache.db"))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run_find(self):
+        stats = {}
+        duplicates, error = system_utils.find_duplicate_files(self.root, stats=stats,
+                                                              hash_cache=self.cache)
+        self.assertIsNone(error)
+        return {digest: sorted(paths) for digest, paths in duplicates.items()}, stats
+
+    def test_warm_run_reads_no_more_than_cold_run(self):
+        cold, cold_stats = self.run_find()
+        warm, warm_stats = self.run_find()
+        self.assertEqual(len(cold), 1)
+        self.assertEqual(warm, cold)
+        self.assertEqual(cold_stats['full_hashed'], 2)
+        self.assertLessEqual(warm_stats['bytes_read'], cold_stats['bytes_read'])
+        self.assertEqual(warm_stats['bytes_read'], 0)
+
+    def test_new_file_in_cached_group_only_partial_hashed(self):
+        self.run_find()
+        with open(os.path.join(self.root, "new.bin"), "wb") as f:
+            f.write(os.urandom(system_utils.PARTIAL_HASH_SIZE * 4))
+        duplicates, stats = self.run_find()
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(stats['partial_hashed'], 1)
+        self.assertEqual(stats['full_hashed'], 0)
+
+class SyncDeltaCopyTest(unittest.TestCase):
+    """增量复制不能写穿目标文件的其他硬链接"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.src_dir = os.path.join(self.work_dir, "src")
+        self.dst_dir = os.path.join(self.work_dir, "dst")
+        os.makedirs(self.src_dir)
+        os.makedirs(self.dst_dir)
+        self.old_data = os.urandom(system_utils.SYNC_BLOCK_SIZE * 2)
+        self.new_data = os.urandom(system_utils.SYNC_BLOCK_SIZE * 2)
+        with open(os.path.join(self.src_dir, "f.bin"), "wb") as f:
+            f.write(self.new_data)
+        with open(os.path.join(self.dst_dir, "f.bin"), "wb") as f:
+            f.write(self.old_data)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def sync(self):
+        report, error = system_utils.sync_directories(self.src_dir, self.dst_dir, dry_run=False,
+                                                      quick_check=False, delta_threshold=1)
+        self.assertIsNone(error)
+        with open(os.path.join(self.dst_dir, "f.bin"), "rb") as f:
+            self.assertEqual(f.read(), self.new_data)
+        return report
+
+    def test_single_link_target_is_delta_copied(self):
+        self.assertEqual(self.sync()['delta_copied'], 1)
+
+    def test_hard_linked_target_is_replaced(self):
+        other = os.path.join(self.work_dir, "other.bin")
+        os.link(os.path.join(self.dst_dir, "f.bin"), other)
+        self.assertEqual(self.sync()['delta_copied'], 0)
+        with open(other, "rb") as f:
+            self.assertEqual(f.read(), self.old_data)
+
+class CleanSystemTempTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.temp_dir = os.path.join(self.work_dir, "temp")
+        self.old_dir = os.path.join(self.temp_dir, "old")
+        os.makedirs(self.old_dir)
+        with open(os.path.join(self.old_dir, "a.txt"), "wb") as f:
+            f.write(b"x" * 100)
+        self.target = os.path.join(self.work_dir, "target.bin")
+        with open(self.target, "wb") as f:
+            f.write(b"y" * 5000)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def age(self, *paths):
+        for path in paths:
+            os.utime(path, (1, 1), follow_symlinks=False)
+
+    def clean(self, dry_run):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            result, error = system_utils.clean_system_temp(dry_run=dry_run, max_age=60,
+                                                           temp_dirs=[self.temp_dir])
+        self.assertIsNone(error)
+        return result
+
+    def test_old_subtree_removed_whole(self):
+        self.age(os.path.join(self.old_dir, "a.txt"), self.old_dir)
+        result = self.clean(dry_run=False)
+        self.assertEqual(result['cleaned_files'], [self.old_dir])
+        self.assertEqual(result['cleaned_size'], 100)
+        self.assertFalse(os.path.exists(self.old_dir))
+
+    def test_file_symlink_not_counted(self):
+        link = os.path.join(self.old_dir, "link.bin")
+        os.symlink(self.target, link)
+        self.age(self.target, link, os.path.join(self.old_dir, "a.txt"), self.old_dir)
+        result = self.clean(dry_run=False)
+        self.assertEqual(result['cleaned_files'], [os.path.join(self.old_dir, "a.txt")])
+        self.assertEqual(result['cleaned_size'], 100)
+        self.assertTrue(os.path.islink(link))
+        self.assertTrue(os.path.exists(self.target))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,22 +1,350 @@
+import os
+import json
+import time
+import hmac
+import zlib
+import struct
+import hashlib
 import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
+from utils import get_data_dir
 
-def crack_zip_password(zip_file_path, password_list_path):
+CHECKPOINT_DIR_NAME = "zip_crack_checkpoints"
+DEFAULT_BATCH_SIZE = 5000
+CHECKPOINT_INTERVAL = 5.0  # seconds between checkpoint writes
+QUICK_CHECK_MEMBERS = 3    # each extra ZipCrypto member cuts false positives by 256x
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_AES_METHOD = 99
+_AES_STRENGTHS = {1: (8, 16), 2: (12, 24), 3: (16, 32)}  # strength -> (salt size, key size)
+_AES_VERIFIER_SIZE = 2
+_AES_AUTH_SIZE = 10
+
+def _build_crc_table():
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ 0xEDB88320 if c & 1 else c >> 1
+        table.append(c)
+    return table
+
+_CRC_TABLE = _build_crc_table()
+
+def _zipcrypto_keys(password):
+    """Initial ZipCrypto key state after feeding the password."""
+    crc = _CRC_TABLE
+    k0, k1, k2 = 0x12345678, 0x23456789, 0x34567890
+    for b in password:
+        k0 = (k0 >> 8) ^ crc[(k0 ^ b) & 0xFF]
+        k1 = ((k1 + (k0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xFF]
+    return k0, k1, k2
+
+def _zipcrypto_check(keys, header, check_byte):
+    """Decrypt the 12-byte encryption header and compare its last byte with the check byte."""
+    crc = _CRC_TABLE
+    k0, k1, k2 = keys
+    p = 0
+    for c in header:
+        t = k2 | 2
+        p = c ^ (((t * (t ^ 1)) >> 8) & 0xFF)
+        k0 = (k0 >> 8) ^ crc[(k0 ^ p) & 0xFF]
+        k1 = ((k1 + (k0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xFF]
+    return p == check_byte
+
+def _parse_aes_extra(extra):
+    """Return the AES strength from the WinZip 0x9901 extra field, or None."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[pos:pos + 4])
+        if header_id == 0x9901 and size >= 7:
+            return extra[pos + 8]
+        pos += 4 + size
+    return None
+
+def load_zip_target(zip_file_path):
     """
-    Attempts to crack a ZIP file password using a password list.
+    Read everything needed to test passwords without touching the archive again:
+    the 12-byte ZipCrypto headers of the smallest encrypted members (for the check-byte
+    test) or, for WinZip AES, the salt, password verifier, ciphertext and auth code
+    of the smallest member.
     """
+    with zipfile.ZipFile(zip_file_path) as zf:
+        encrypted = [info for info in zf.infolist() if info.flag_bits & 0x1]
+    if not encrypted:
+        raise ValueError("ZIP file is not encrypted")
+    encrypted.sort(key=lambda info: info.compress_size)
+
+    target = {'zip_path': os.path.abspath(zip_file_path), 'zipcrypto': [], 'aes': None,
+              'trial_member': None}
+    with open(zip_file_path, "rb") as f:
+        for info in encrypted:
+            f.seek(info.header_offset)
+            fields = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+            f.seek(fields[10] + fields[11], os.SEEK_CUR)
+
+            if info.compress_type == _AES_METHOD:
+                if target['aes'] is not None:
+                    continue
+                strength = _parse_aes_extra(info.extra)
+                if strength not in _AES_STRENGTHS:
+                    raise ValueError(f"Unsupported AES encryption in member {info.filename}")
+                salt_size, key_size = _AES_STRENGTHS[strength]
+                data = f.read(info.compress_size)
+                target['aes'] = {
+                    'salt': data[:salt_size],
+                    'verifier': data[salt_size:salt_size + _AES_VERIFIER_SIZE],
+                    'ciphertext': data[salt_size + _AES_VERIFIER_SIZE:-_AES_AUTH_SIZE],
+                    'auth_code': data[-_AES_AUTH_SIZE:],
+                    'key_size': key_size
+                }
+            elif len(target['zipcrypto']) < QUICK_CHECK_MEMBERS:
+                if info.flag_bits & 0x8:
+                    check_byte = (info._raw_time >> 8) & 0xFF
+                else:
+                    check_byte = (info.CRC >> 24) & 0xFF
+                target['zipcrypto'].append((f.read(12), check_byte))
+                if target['trial_member'] is None:
+                    target['trial_member'] = info.filename
+    return target
+
+class _PasswordTester:
+    """Tests candidate passwords against a loaded target; one instance per worker process."""
+    def __init__(self, target):
+        self.target = target
+        self.zip_file = None
+
+    def _full_zipcrypto_trial(self, password):
+        # Decompress the smallest member in memory; zipfile verifies the CRC at EOF
+        if self.zip_file is None:
+            self.zip_file = zipfile.ZipFile(self.target['zip_path'])
+        try:
+            self.zip_file.read(self.target['trial_member'], pwd=password)
+            return True
+        except (RuntimeError, zipfile.BadZipFile, zlib.error, EOFError, ValueError, OSError):
+            return False
+
+    def _aes_matches(self, password):
+        aes = self.target['aes']
+        key_size = aes['key_size']
+        derived = hashlib.pbkdf2_hmac('sha1', password, aes['salt'], 1000, 2 * key_size + 2)
+        if derived[-_AES_VERIFIER_SIZE:] != aes['verifier']:
+            return False
+        # The HMAC-SHA1 over the ciphertext authenticates the password-derived key
+        auth = hmac.new(derived[key_size:2 * key_size], aes['ciphertext'], hashlib.sha1).digest()
+        return hmac.compare_digest(auth[:_AES_AUTH_SIZE], aes['auth_code'])
+
+    def test(self, password):
+        if self.target['zipcrypto']:
+            keys = _zipcrypto_keys(password)
+            for header, check_byte in self.target['zipcrypto']:
+                if not _zipcrypto_check(keys, header, check_byte):
+                    return False
+        if self.target['aes'] is not None and not self._aes_matches(password):
+            return False
+        if self.target['trial_member'] is not None:
+            return self._full_zipcrypto_trial(password)
+        return True
+
+    def test_batch(self, passwords):
+        for password in passwords:
+            if self.test(password):
+                return password
+        return None
+
+_worker_tester = None
+
+def _init_worker(target):
+    global _worker_tester
+    _worker_tester = _PasswordTester(target)
+
+def _test_batch(passwords):
+    return _worker_tester.test_batch(passwords)
+
+def _iter_batches(wordlist, batch_size):
+    """Yield (candidates, offset after the batch) reading the wordlist line by line."""
+    batch = []
+    for line in wordlist:
+        password = line.rstrip(b"\r\n")
+        if password:
+            batch.append(password)
+        if len(batch) >= batch_size:
+            yield batch, wordlist.tell()
+            batch = []
+    if batch:
+        yield batch, wordlist.tell()
+
+def _file_signature(path):
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+def _default_checkpoint_path(zip_file_path, password_list_path):
+    key = json.dumps([os.path.abspath(zip_file_path), os.path.abspath(password_list_path)])
+    checkpoint_dir = os.path.join(get_data_dir(), CHECKPOINT_DIR_NAME)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return os.path.join(checkpoint_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+def _load_checkpoint(checkpoint_path, signature):
     try:
-        with open(password_list_path, "r", errors="ignore") as password_list:
-            passwords = password_list.read().splitlines()
-    except FileNotFoundError:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0, 0
+    if checkpoint.get('signature') != signature:
+        return 0, 0
+    return checkpoint.get('offset', 0), checkpoint.get('tested', 0)
+
+def _save_checkpoint(checkpoint_path, signature, offset, tested):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({'signature': signature, 'offset': offset, 'tested': tested}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+class _Done:
+    """Already-computed result with the Future interface used by find_zip_password."""
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+    def cancel(self):
+        return False
+
+def find_zip_password(zip_file_path, password_list_path, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                      checkpoint_path=None, resume=True, progress_callback=None, cancel_event=None):
+    """
+    Dictionary attack on an encrypted ZIP archive.
+
+    The wordlist is streamed in batches that are spread over a process pool. Each candidate
+    first goes through the cheap header test (ZipCrypto check byte or AES password verifier);
+    only survivors get the full trial, which decompresses the smallest member in memory and
+    checks its CRC (or the HMAC for AES). Nothing is written to disk except the checkpoint:
+    the wordlist offset up to which every candidate has been tested, saved every few seconds
+    so an interrupted run continues where it stopped.
+
+    Returns a dict with 'password' (bytes or None), 'tested', 'elapsed', 'rate' and 'cancelled'.
+    """
+    target = load_zip_target(zip_file_path)
+    workers = workers or os.cpu_count() or 1
+    checkpoint_path = checkpoint_path or _default_checkpoint_path(zip_file_path, password_list_path)
+    signature = [_file_signature(zip_file_path), _file_signature(password_list_path)]
+    total_bytes = signature[1][1]
+
+    offset, tested = _load_checkpoint(checkpoint_path, signature) if resume else (0, 0)
+    start_tested = tested
+    start_time = time.monotonic()
+    last_checkpoint = start_time
+    found = None
+    cancelled = False
+
+    def report():
+        if progress_callback:
+            elapsed = time.monotonic() - start_time
+            progress_callback({
+                'tested': tested,
+                'offset': offset,
+                'total_bytes': total_bytes,
+                'percent': offset * 100 // total_bytes if total_bytes else 100,
+                'rate': (tested - start_tested) / elapsed if elapsed > 0 else 0.0
+            })
+
+    with open(password_list_path, "rb") as wordlist:
+        wordlist.seek(offset)
+        batches = _iter_batches(wordlist, batch_size)
+
+        executor = None
+        if workers <= 1:
+            tester = _PasswordTester(target)
+
+            def run_batch(batch):
+                return _Done(tester.test_batch(batch))
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(target,))
+
+            def run_batch(batch):
+                return executor.submit(_test_batch, batch)
+
+        # Results are consumed in submission order, so the checkpoint offset always
+        # marks a prefix of the wordlist that has been fully tested
+        pending = deque()
+        try:
+            exhausted = False
+            while not exhausted or pending:
+                while not exhausted and len(pending) < workers * 2:
+                    item = next(batches, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    batch, batch_end = item
+                    pending.append((run_batch(batch), len(batch), batch_end))
+                if not pending:
+                    break
+
+                future, count, batch_end = pending.popleft()
+                found = future.result()
+                tested += count
+                offset = batch_end
+                if found is not None:
+                    break
+                if cancel_event and cancel_event.is_set():
+                    cancelled = True
+                    break
+
+                now = time.monotonic()
+                if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    last_checkpoint = now
+                    _save_checkpoint(checkpoint_path, signature, offset, tested)
+                    report()
+        finally:
+            for future, _, _ in pending:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    if cancelled:
+        _save_checkpoint(checkpoint_path, signature, offset, tested)
+    else:
+        try:
+            os.remove(checkpoint_path)
+        except OSError:
+            pass
+    report()
+
+    elapsed = time.monotonic() - start_time
+    return {
+        'password': found,
+        'tested': tested,
+        'elapsed': elapsed,
+        'rate': (tested - start_tested) / elapsed if elapsed > 0 else 0.0,
+        'cancelled': cancelled
+    }
+
+def crack_zip_password(zip_file_path, password_list_path, workers=None, resume=True):
+    """
+    Attempts to crack a ZIP file password using a password list.
+    """
+    if not os.path.exists(password_list_path):
         return f"Error: Password list not found at {password_list_path}"
 
-    zip_file = zipfile.ZipFile(zip_file_path)
-    
-    for password in tqdm(passwords, desc="Cracking Password"):
+    total = os.path.getsize(password_list_path)
+    with tqdm(total=total, unit="B", unit_scale=True, desc="Cracking Password") as bar:
+        def update(progress):
+            bar.n = progress['offset']
+            bar.set_postfix(tested=progress['tested'], rate=f"{progress['rate']:.0f}/s")
+            bar.refresh()
+
         try:
-            zip_file.extractall(pwd=password.encode())
-            return f"Success! Password found: {password}"
-        except (RuntimeError, zipfile.BadZipFile):
-            continue
+            result = find_zip_password(zip_file_path, password_list_path, workers=workers,
+                                       resume=resume, progress_callback=update)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return f"Error: {e}"
+
+    if result['password'] is not None:
+        return f"Success! Password found: {result['password'].decode('utf-8', errors='replace')}"
     return "Password not found in the list."